@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:25
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        # pg_trgm is installed there
+        ("courses", "0008_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="users_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -78,6 +79,11 @@ class User(AbstractUser):
     class Meta:
         db_table = "users"
         verbose_name_plural = "Users"
+        indexes = [
+            GinIndex(
+                fields=["name"], name="users_name_trgm", opclasses=["gin_trgm_ops"]
+            )
+        ]
 
     def __str__(self):
         return f"{self.username}: {self.name}"
@@ -0,0 +1,76 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:24
+
+import html
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils.html import strip_tags
+
+
+def html_to_text(content):
+    # copy of blog.models.html_to_text as of this migration
+    text = html.unescape(
+        strip_tags(re.sub(r"<(br|/p|/div|/li|/h\d)\b", r" \g<0>", content))
+    )
+    return " ".join(text.split())
+
+
+def backfill_search_vector(apps, schema_editor):
+    Article = apps.get_model("blog", "Article")
+    Category = apps.get_model("courses", "Category")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    articles = []
+    for article in (
+        Article.objects.only("pk", "content").order_by().iterator(chunk_size=500)
+    ):
+        article.plain_text = html_to_text(article.content or "")
+        articles.append(article)
+        if len(articles) == 500:
+            Article.objects.bulk_update(articles, ["plain_text"])
+            articles = []
+    Article.objects.bulk_update(articles, ["plain_text"])
+
+    category_title = Category.objects.filter(pk=OuterRef("category_id")).values("title")
+    author_name = User.objects.filter(pk=OuterRef("author_id")).values("name")
+    Article.objects.update(
+        search_vector=SearchVector("title", weight="A", config="english")
+        + SearchVector(Subquery(category_title), weight="B", config="english")
+        + SearchVector(Subquery(author_name), weight="B", config="english")
+        + SearchVector("plain_text", weight="C", config="english")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0002_article_category_articlehit_created_articlehit_hit_and_more"),
+        ("courses", "0007_course_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="plain_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="blog_articles_search_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0003_article_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="hit_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="articlehit",
+            index=models.Index(fields=["created"], name="article_hits_created_idx"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0004_article_hit_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="articlehit",
+            name="view_window",
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
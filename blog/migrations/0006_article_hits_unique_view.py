@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0005_articlehit_view_window"),
+        # backfills view_window and removes the duplicate views
+        ("courses", "0013_hit_visitor_key"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="articlehit",
+            constraint=models.UniqueConstraint(
+                fields=("hit", "article", "view_window"),
+                name="article_hits_unique_view",
+            ),
+        ),
+    ]
@@ -1,13 +1,33 @@
+import html
+import re
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.urls import reverse
+from django.utils.html import strip_tags
 from django_resized import ResizedImageField
 from tinymce.models import HTMLField
 
-from utils.utils import slug_generator
+from utils.search import SEARCH_CONFIG
+from utils.utils import SlugMixin
+
+SEARCH_FIELDS = {"title", "content", "category", "author"}
+
+
+def html_to_text(content):
+    """
+    Plain text of TinyMCE HTML: tags stripped, entities decoded, whitespace collapsed.
+    """
+    text = html.unescape(
+        strip_tags(re.sub(r"<(br|/p|/div|/li|/h\d)\b", r" \g<0>", content))
+    )
+    return " ".join(text.split())
 
 
-class Article(models.Model):
+class Article(SlugMixin, models.Model):
     author = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True)
     title = models.CharField(max_length=255)
     category = models.ForeignKey(
@@ -21,18 +41,28 @@ class Article(models.Model):
         size=[600, 400], upload_to="blog/images/", default="blog/images/placeholder.png"
     )
     content = HTMLField()
+    plain_text = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
     is_draft = models.BooleanField("Draft", default=False)
+    # views (see HIT_UNIQUE_VIEW_WINDOW), added by `courses.rollups`
+    hit_count = models.PositiveIntegerField(default=0, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "blog_articles"
         ordering = ["-created"]
+        indexes = [GinIndex(fields=["search_vector"], name="blog_articles_search_idx")]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slug_generator(self)
+        self.allocate_slug()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "content" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "plain_text"}
+        self.plain_text = html_to_text(self.content or "")
         super(Article, self).save(*args, **kwargs)
+        if update_fields is None or SEARCH_FIELDS.intersection(update_fields):
+            Article.update_search_vectors(pk=self.pk)
 
     def __str__(self):
         return f"{self.title[:20]}... by {self.author}"
@@ -40,6 +70,35 @@ class Article(models.Model):
     def get_absolute_url(self):
         return reverse("article_detail", kwargs={"article_slug": self.slug})
 
+    @staticmethod
+    def search_vector_expression():
+        """
+        Weighted document: title (A), category and author name (B), body text (C).
+        """
+        from courses.models import Category
+
+        category_title = Category.objects.filter(pk=OuterRef("category_id")).values(
+            "title"
+        )
+        author_name = (
+            get_user_model().objects.filter(pk=OuterRef("author_id")).values("name")
+        )
+        return (
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(Subquery(category_title), weight="B", config=SEARCH_CONFIG)
+            + SearchVector(Subquery(author_name), weight="B", config=SEARCH_CONFIG)
+            + SearchVector("plain_text", weight="C", config=SEARCH_CONFIG)
+        )
+
+    @classmethod
+    def update_search_vectors(cls, **filters):
+        """
+        Rebuild the stored search vector of the matching articles in one query.
+        """
+        return cls.objects.filter(**filters).update(
+            search_vector=cls.search_vector_expression()
+        )
+
 
 class ArticleTag(models.Model):
     article = models.ForeignKey(
@@ -81,10 +140,19 @@ class ArticleHit(models.Model):
     hit = models.ForeignKey(
         "courses.HitDetail", on_delete=models.CASCADE, null=True, blank=True
     )
+    # view counting window the hit was counted in (see `courses.hits.view_window`)
+    view_window = models.PositiveIntegerField(null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "article_hits"
+        indexes = [models.Index(fields=["created"], name="article_hits_created_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hit", "article", "view_window"],
+                name="article_hits_unique_view",
+            )
+        ]
 
     def __str__(self):
         return f"{self.hit} for {self.article}"
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from courses.models import Category
+
+from .models import Article
+
+
+@receiver(post_save, sender=Category)
+def update_article_search_on_category_save(sender, instance, created, **kwargs):
+    if not created:
+        Article.update_search_vectors(category_id=instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def update_article_search_on_author_save(sender, instance, created, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    Article.update_search_vectors(author_id=instance.pk)
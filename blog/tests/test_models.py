@@ -34,6 +34,13 @@ class ArticleModelTests(TestCase):
     def test_article_is_not_draft_by_default(self):
         self.assertIs(self.article.is_draft, False)
 
+    def test_plain_text_strips_markup(self):
+        self.article.content = (
+            "<h2>Intro</h2><p>Tips &amp; <b>tricks</b></p><p>Next</p>"
+        )
+        self.article.save()
+        self.assertEqual(self.article.plain_text, "Intro Tips & tricks Next")
+
     def test_object_name_is_part_of_title_and_name_of_author(self):
         author = User.objects.create(
             email="example@mail.com", name="John Doe", username="john_doe"
@@ -180,3 +180,55 @@ class ArticleDetailViewTests(TestCase):
 
         self.assertEqual(response.status_code, 302)
         self.assertEqual(self.article_1.comments.count(), 0)
+
+
+class ArticleSearchViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse("article_search")
+        self.author = User.objects.create_user(
+            name="ada lovelace",
+            username="testauthor",
+            email="test@author.com",
+            password="secret",
+        )
+        self.category = Category.objects.create(title="Careers")
+        self.tables = Article.objects.create(
+            author=self.author,
+            title="Styling tables",
+            content='<table class="striped"><tr><td>Cells</td></tr></table>',
+            thumbnail="blog/images/default.jpeg",
+        )
+        self.interview = Article.objects.create(
+            author=self.author,
+            title="Preparing for an interview",
+            category=self.category,
+            content="<p>Practise <em>algorithms</em> and talk about tables.</p>",
+            thumbnail="blog/images/default.jpeg",
+        )
+
+    def test_search_ignores_markup(self):
+        response = self.client.get(self.url, {"search": "striped"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["articles"]), 0)
+
+    def test_search_orders_by_relevance(self):
+        response = self.client.get(self.url, {"search": "tables"})
+        self.assertEqual(
+            list(response.context["articles"]), [self.tables, self.interview]
+        )
+
+    def test_search_matches_author_and_category(self):
+        response = self.client.get(self.url, {"search": "lovelace"})
+        self.assertEqual(response.context["articles"].paginator.count, 2)
+        response = self.client.get(self.url, {"search": "careers"})
+        self.assertEqual(list(response.context["articles"]), [self.interview])
+
+    def test_search_excludes_drafts(self):
+        self.tables.is_draft = True
+        self.tables.save()
+        response = self.client.get(self.url, {"search": "tables"})
+        self.assertEqual(list(response.context["articles"]), [self.interview])
+
+    def test_search_shows_highlighted_excerpt(self):
+        response = self.client.get(self.url, {"search": "algorithms"})
+        self.assertContains(response, "Practise <mark>algorithms</mark> and talk")
@@ -1,14 +1,15 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
 from courses.models import Category, Tag
-from courses.views import get_user_agent_details
+from courses.hits import ARTICLE, record_hit
+from utils.pagination import paginate
+from utils.search import search_headline, search_query, search_rank
 
-from .models import Article, ArticleHit, Comment
+from .models import Article, Comment
 
 
 def articles(request):
@@ -18,14 +19,7 @@ def articles(request):
             num_articles__gte=1
         )[:5]
         tags = Tag.objects.only("title")[:8]
-        page = request.GET.get("page")
-        paginator = Paginator(articles, 4)
-        try:
-            articles = paginator.page(page)
-        except PageNotAnInteger:
-            articles = paginator.page(1)
-        except (EmptyPage, InvalidPage):
-            articles = paginator.page(paginator.num_pages)
+        articles = paginate(request, articles, 4, ["-created", "-pk"])
         return render(
             request,
             "articles.html",
@@ -55,9 +49,7 @@ def articleDetail(request, article_slug):
             num_articles__gte=1
         )[:5]
         tags = Tag.objects.only("title", "slug")[:8]
-        ArticleHit.objects.get_or_create(
-            hit=get_user_agent_details(request), article=article
-        )
+        record_hit(request, ARTICLE, article.pk)
 
         return render(
             request,
@@ -95,25 +87,16 @@ def articleSearch(request):
             query = request.GET.get("search")
             if query == "":
                 return redirect(request.META.get("HTTP_REFERER"))
+            keywords = search_query(query)
             articles = (
-                Article.objects.filter(is_draft=False)
-                .filter(
-                    Q(title__icontains=query)
-                    | Q(content__icontains=query)
-                    | Q(category__title__icontains=query)
-                    | Q(slug__icontains=query)
-                    | Q(author__name__icontains=query)
+                Article.objects.select_related("author")
+                .filter(is_draft=False, search_vector=keywords)
+                .annotate(
+                    rank=search_rank(keywords),
+                    excerpt=search_headline("plain_text", keywords),
                 )
-                .distinct()
             )
-            page = request.GET.get("page")
-            paginator = Paginator(articles, 6)
-            try:
-                articles = paginator.page(page)
-            except PageNotAnInteger:
-                articles = paginator.page(1)
-            except (EmptyPage, InvalidPage):
-                articles = paginator.page(paginator.num_pages)
+            articles = paginate(request, articles, 6, ["-rank", "-created", "-pk"])
             return render(
                 request,
                 "article-search-results.html",
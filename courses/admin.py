@@ -8,12 +8,15 @@ from .models import (
     CourseContent,
     CourseHit,
     CourseReviewRating,
+    CourseStats,
     CourseTag,
     CourseWeek,
     HitDetail,
+    HitRollup,
     Member,
     Tag,
     TeacherReviewRating,
+    TeacherStats,
     WeeklyCourseContent,
 )
 
@@ -56,10 +59,26 @@ class CourseReviewRatingAdmin(admin.ModelAdmin):
     ]
 
 
+class CourseStatsAdmin(admin.ModelAdmin):
+    list_display = ["course", "rating_count", "rating_average", "bayesian_rating"]
+    readonly_fields = [f.name for f in CourseStats._meta.fields]
+
+
+class TeacherStatsAdmin(admin.ModelAdmin):
+    list_display = ["teacher", "rating_average", "courses_owned", "student_count"]
+    readonly_fields = [f.name for f in TeacherStats._meta.fields]
+
+
 class CourseHitAdmin(admin.ModelAdmin):
     list_display = ["hit", "course"]
 
 
+class HitRollupAdmin(admin.ModelAdmin):
+    list_display = ["kind", "object_id", "period", "bucket", "views", "unique_ips"]
+    list_filter = ["kind", "period"]
+    readonly_fields = [f.name for f in HitRollup._meta.fields]
+
+
 class CourseContentAdmin(admin.ModelAdmin):
     list_display = ["content_type", "title", "length", "created"]
 
@@ -73,11 +92,14 @@ admin.site.register(Tag, TagAdmin)
 admin.site.register(CourseTag)
 admin.site.register(Course, CourseAdmin)
 admin.site.register(CourseReviewRating, CourseReviewRatingAdmin)
+admin.site.register(CourseStats, CourseStatsAdmin)
 admin.site.register(TeacherReviewRating)
+admin.site.register(TeacherStats, TeacherStatsAdmin)
 admin.site.register(Audience)
 admin.site.register(CourseAudience)
 admin.site.register(HitDetail, HitDetailAdmin)
 admin.site.register(CourseHit, CourseHitAdmin)
+admin.site.register(HitRollup, HitRollupAdmin)
 admin.site.register(Member)
 admin.site.register(CourseWeek)
 admin.site.register(CourseContent, CourseContentAdmin)
@@ -0,0 +1,175 @@
+"""
+Archival of raw hits to compressed files, and re-import of archived days.
+
+`archive_hits` streams the `CourseHit`, `ArticleHit` and orphaned `HitDetail`
+rows created before a cutoff out of Postgres with server-side cursors, one
+local day at a time, into gzip-compressed CSV files partitioned by date:
+
+    <directory>/<table>/date=<YYYY-MM-DD>/part-<run>.csv.gz
+
+A file is written under a temporary name and read back, and its row count
+checked against the database, before it is renamed and its rows deleted in
+chunks of HIT_PURGE_CHUNK_SIZE. Memory use does not depend on table size.
+Hits of days that have not been completely rolled up yet (see
+`courses.rollups`) are never archived.
+
+`load_archive` copies the files of a date range into `archived_<table>`
+tables, shaped like the live ones, for ad-hoc queries.
+"""
+import csv
+import gzip
+import io
+import os
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from blog.models import ArticleHit
+
+from .models import CourseHit, HitDetail
+from .rollups import complete_days_until, delete_in_chunks
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archived_rows():
+    """
+    Rows of each archived table that may be archived. Visitors go last, once
+    their hits are gone.
+    """
+    return [
+        CourseHit.objects.all(),
+        ArticleHit.objects.all(),
+        HitDetail.objects.filter(coursehit__isnull=True, articlehit__isnull=True),
+    ]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def write_part(path, rows, fields):
+    """
+    Stream `rows` into a new gzip-compressed CSV file. Returns the number of
+    rows written and the highest primary key among them.
+    """
+    pk_index = fields.index(rows.model._meta.pk.attname)
+    count = last_pk = 0
+    with open(path, "xb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as compressed, io.TextIOWrapper(
+            compressed, encoding="utf-8", newline=""
+        ) as text:
+            writer = csv.writer(text)
+            writer.writerow(fields)
+            for row in (
+                rows.values_list(*fields)
+                .order_by("pk")
+                .iterator(chunk_size=settings.HIT_PURGE_CHUNK_SIZE)
+            ):
+                writer.writerow(row)
+                count += 1
+                last_pk = row[pk_index]
+        raw.flush()
+        os.fsync(raw.fileno())
+    return count, last_pk
+
+
+def count_rows(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as text:
+        return sum(1 for _ in csv.reader(text)) - 1
+
+
+def archive_day(directory, rows, start, end, run):
+    """
+    Archive and delete `rows` created in [start, end). Returns the number of
+    rows archived.
+    """
+    rows = rows.filter(created__gte=start, created__lt=end)
+    if not rows.exists():
+        return 0
+    model = rows.model
+    fields = [field.attname for field in model._meta.concrete_fields]
+    folder = (
+        Path(directory)
+        / model._meta.db_table
+        / f"date={timezone.localtime(start):%Y-%m-%d}"
+    )
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"part-{run:%Y%m%dT%H%M%S%f}.csv.gz"
+    temporary = path.with_name(f"{path.name}.tmp")
+
+    count, last_pk = write_part(temporary, rows, fields)
+    rows = rows.filter(pk__lte=last_pk)
+    if count_rows(temporary) != count or rows.count() != count:
+        temporary.unlink()
+        raise ArchiveError(f"{path}: row counts do not match, nothing was deleted")
+    os.replace(temporary, path)
+    delete_in_chunks(rows)
+    return count
+
+
+def archive_hits(directory, before):
+    """
+    Archive and delete the raw hits created before `before`. Returns the
+    number of rows archived.
+    """
+    cutoff = complete_days_until()
+    if cutoff is None or before is None:
+        return 0
+    cutoff = min(cutoff, before)
+    run = timezone.now()
+    archived = 0
+    for rows in archived_rows():
+        first = rows.filter(created__lt=cutoff).aggregate(first=Min("created"))
+        if first["first"] is None:
+            continue
+        day = timezone.localtime(first["first"]).date()
+        while (start := day_start(day)) < cutoff:
+            day += timedelta(days=1)
+            archived += archive_day(
+                directory, rows, start, min(day_start(day), cutoff), run
+            )
+    return archived
+
+
+def archive_files(directory, table, start, end):
+    for path in sorted(Path(directory, table).glob("date=*/part-*.csv.gz")):
+        if start <= date.fromisoformat(path.parent.name[len("date=") :]) <= end:
+            yield path
+
+
+def load_archive(directory, start, end, replace=False):
+    """
+    Copy the archived hits of the days from `start` to `end` into
+    `archived_<table>` tables, emptied first if `replace`. Returns the number
+    of rows loaded.
+    """
+    loaded = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (HitDetail, CourseHit, ArticleHit):
+            table = model._meta.db_table
+            target = f"archived_{table}"
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {target} (LIKE {table})")
+            if replace:
+                cursor.execute(f"TRUNCATE {target}")
+            not_null = {
+                field.column for field in model._meta.concrete_fields if not field.null
+            }
+            for path in archive_files(directory, table, start, end):
+                with gzip.open(path, "rt", encoding="utf-8", newline="") as text:
+                    # the header names the columns, whatever the current model
+                    columns = next(csv.reader([text.readline()]))
+                    force_not_null = ", ".join(c for c in columns if c in not_null)
+                    cursor.copy_expert(
+                        f"COPY {target} ({', '.join(columns)}) FROM STDIN "
+                        f"WITH (FORMAT csv, FORCE_NOT_NULL ({force_not_null}))",
+                        text,
+                    )
+                    loaded += cursor.rowcount
+    return loaded
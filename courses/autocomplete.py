@@ -0,0 +1,137 @@
+"""
+Search box suggestions for course titles, tags, categories and teachers.
+
+Every source is matched on a trigram (gin_trgm_ops) index, either by substring
+or by word similarity so that misspelled keywords still find something.
+Substrings are matched with `ILIKE`, which the index supports, rather than
+`__icontains`, whose `UPPER(...) LIKE UPPER(...)` it cannot serve.
+Responses are cached per normalized prefix.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db.models import CharField, Lookup, Q
+from django.urls import reverse
+
+from .models import Category, Course, Tag
+
+COURSE = "course"
+TAG = "tag"
+CATEGORY = "category"
+TEACHER = "teacher"
+
+
+@CharField.register_lookup
+class ILike(Lookup):
+    """
+    Case-insensitive substring match, `field ILIKE '%term%'`.
+    """
+
+    lookup_name = "ilike"
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def normalize(prefix):
+    return " ".join((prefix or "").lower().split())[: settings.AUTOCOMPLETE_MAX_LENGTH]
+
+
+def get_sources():
+    """
+    (kind, queryset, matched field, url name, url kwarg, url field) per source.
+    """
+    return (
+        (
+            COURSE,
+            Course.objects.filter(is_active=True),
+            "title",
+            "course_detail",
+            "course_slug",
+            "slug",
+        ),
+        (TAG, Tag.objects.all(), "title", "tag", "tag_slug", "slug"),
+        (
+            CATEGORY,
+            Category.objects.all(),
+            "title",
+            "category",
+            "category_slug",
+            "slug",
+        ),
+        (
+            TEACHER,
+            get_user_model().objects.filter(is_student=False, is_active=True),
+            "name",
+            "team_detail",
+            "username",
+            "username",
+        ),
+    )
+
+
+def lookup(term, limit):
+    """
+    Best matches for an already normalized term, closest first within each kind.
+    """
+    suggestions = []
+    for kind, queryset, field, url_name, url_kwarg, url_field in get_sources():
+        matches = (
+            queryset.filter(
+                Q(**{f"{field}__ilike": term})
+                | Q(**{f"{field}__trigram_word_similar": term})
+            )
+            .annotate(similarity=TrigramWordSimilarity(term, field))
+            .order_by("-similarity", field)
+            .values_list(field, url_field, "similarity")[:limit]
+        )
+        suggestions.extend(
+            {
+                "kind": kind,
+                "text": text,
+                "url": reverse(url_name, kwargs={url_kwarg: url_value}),
+                "similarity": similarity,
+            }
+            for text, url_value, similarity in matches
+        )
+    return suggestions
+
+
+def autocomplete(prefix):
+    term = normalize(prefix)
+    if len(term) < settings.AUTOCOMPLETE_MIN_LENGTH:
+        return []
+    key = f"autocomplete:{hashlib.md5(term.encode()).hexdigest()}"
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = [
+            {"kind": s["kind"], "text": s["text"], "url": s["url"]}
+            for s in lookup(term, settings.AUTOCOMPLETE_LIMIT)
+        ]
+        cache.set(key, suggestions, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return suggestions
+
+
+def did_you_mean(query, limit=3):
+    """
+    Closest course, tag, category or teacher names for a search without results.
+    """
+    term = normalize(query)
+    if len(term) < settings.AUTOCOMPLETE_MIN_LENGTH:
+        return []
+    suggestions = sorted(
+        lookup(term, limit), key=lambda s: s["similarity"], reverse=True
+    )
+    texts = []
+    for suggestion in suggestions:
+        if suggestion["text"].lower() != term and suggestion["text"] not in texts:
+            texts.append(suggestion["text"])
+    return texts[:limit]
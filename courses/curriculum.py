@@ -0,0 +1,87 @@
+"""
+Cached curriculum snapshot for the course detail page.
+
+Weeks, their contents, tags and target audience are compiled into plain
+dicts once and cached under the course's `updated` time. Saving or deleting
+one of the rows they were built from touches `updated` in the same
+transaction (see `courses.signals`), so every process, whatever its cache,
+looks the new snapshot up under a new key once the change commits. Old
+snapshots expire after CURRICULUM_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Course, CourseAudience, CourseTag, CourseWeek, WeeklyCourseContent
+
+
+def cache_key(course):
+    return f"curriculum:{course.pk}:{course.updated.timestamp()}"
+
+
+def compile_curriculum(course_id):
+    weeks = {
+        week.pk: {"week": week.week, "contents": [], "length": 0, "questions": 0}
+        for week in CourseWeek.objects.filter(course_id=course_id)
+    }
+    weekly_contents = WeeklyCourseContent.objects.filter(
+        course_week__course_id=course_id
+    ).select_related("content")
+    for weekly_content in weekly_contents.order_by("created", "pk"):
+        content = weekly_content.content
+        week = weeks[weekly_content.course_week_id]
+        week["contents"].append(
+            {
+                "title": content.title,
+                "content_type": content.content_type,
+                "url": content.file.url if content.file else "",
+                "length": content.length,
+                "questions": content.questions,
+            }
+        )
+        week["length"] += content.length or 0
+        week["questions"] += content.questions
+
+    weeks = sorted(weeks.values(), key=lambda week: int(week["week"]))
+    content_types = {}
+    for week in weeks:
+        for content in week["contents"]:
+            content_types[content["content_type"]] = (
+                content_types.get(content["content_type"], 0) + 1
+            )
+    return {
+        "weeks": weeks,
+        "content_types": content_types,
+        "contents": sum(len(week["contents"]) for week in weeks),
+        "questions": sum(week["questions"] for week in weeks),
+        "length": sum(week["length"] for week in weeks),
+        "tags": [
+            {"title": course_tag.tag.title, "url": course_tag.tag.get_absolute_url()}
+            for course_tag in CourseTag.objects.filter(course_id=course_id)
+            .select_related("tag")
+            .order_by("pk")
+        ],
+        "audience": list(
+            CourseAudience.objects.filter(course_id=course_id).values_list(
+                "audience__name", flat=True
+            )
+        ),
+    }
+
+
+def get_curriculum(course):
+    key = cache_key(course)
+    curriculum = cache.get(key)
+    if curriculum is None:
+        curriculum = compile_curriculum(course.pk)
+        cache.set(key, curriculum, settings.CURRICULUM_CACHE_TIMEOUT)
+    return curriculum
+
+
+def invalidate_curriculum(*course_ids):
+    """
+    Move the courses to a new snapshot key by touching their `updated` time.
+    """
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(updated=timezone.now())
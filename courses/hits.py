@@ -0,0 +1,465 @@
+"""
+Write-behind recording of course and article hits.
+
+Views push a compact event onto a buffer instead of writing `HitDetail`,
+`CourseHit` and `ArticleHit` rows while the page renders. Buffered events
+carry the time they were recorded and are written in batches by the tasks in
+`courses.tasks`, with inserts that skip rows already there, so concurrent
+batches never create duplicates.
+
+A view is counted once per visitor and object per HIT_UNIQUE_VIEW_WINDOW
+seconds. Repeat views are recognised by a rotating Bloom filter (see
+`utils.bloom`) before anything is queried; with a window of None a visitor
+is only counted once per object.
+
+Crawlers (see `is_bot`) are never buffered, only counted per day with an
+INCR on the Redis server of HIT_BUFFER_REDIS_URL, shared by all processes.
+"""
+import atexit
+import functools
+import ipaddress
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.models import Article, ArticleHit
+from utils.bloom import RedisRotatingBloomFilter, RotatingBloomFilter
+from utils.user_agents import parse_user_agent
+
+from .models import Course, CourseHit, HitDetail
+
+logger = logging.getLogger(__name__)
+
+COURSE = "course"
+ARTICLE = "article"
+
+
+def get_client_ip(request):
+    if x_forwarded_for := request.META.get("HTTP_X_FORWARDED_FOR"):
+        return x_forwarded_for.split(",")[0]
+    return request.META.get("REMOTE_ADDR")
+
+
+def get_user_agent_details(user_agent_string):
+    """
+    HitDetail fields for a raw user agent string.
+    """
+    details = parse_user_agent(user_agent_string)
+    return {
+        "device_type": details.device_type,
+        "browser_type": details.browser_type,
+        "browser_version": details.browser_version,
+        "os_type": details.os_type,
+        "os_version": details.os_version,
+    }
+
+
+class MemoryHitBuffer:
+    """
+    Per-process buffer.
+    A background thread hands the batch to the Celery worker in a single
+    message once it holds `max_size` events or `max_age` seconds after the
+    first one was pushed, and again when the process exits, so requests
+    never wait on the broker. A batch the broker did not take is kept and
+    retried, up to `max_batches` batches.
+    """
+
+    max_batches = 100
+
+    def __init__(self, max_size, max_age):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.pending = threading.Event()
+        self.full = threading.Event()
+        self.thread = None
+        atexit.register(self.flush)
+
+    def push(self, event):
+        with self.lock:
+            self.events.append(event)
+            self.pending.set()
+            if len(self.events) == self.max_size:
+                self.full.set()
+            # threads do not survive a fork, start one in every process
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name="hit-buffer", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.pending.wait()
+            self.full.wait(self.max_age)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch = list(self.events)
+            self.events.clear()
+            self.pending.clear()
+            self.full.clear()
+        if batch and not dispatch_hits(batch):
+            self.restore(batch)
+
+    def restore(self, batch):
+        """
+        Put back a batch that could not be dispatched, ahead of newer events.
+        """
+        with self.lock:
+            self.events.extendleft(reversed(batch))
+            dropped = len(self.events) - self.max_size * self.max_batches
+            for _ in range(dropped):
+                self.events.popleft()
+            self.pending.set()
+        if dropped > 0:
+            logger.warning("Hit buffer full, dropped the %d oldest hits", dropped)
+
+    def pop(self, count):
+        with self.lock:
+            return [self.events.popleft() for _ in range(min(count, len(self.events)))]
+
+    def __len__(self):
+        return len(self.events)
+
+
+class RedisHitBuffer:
+    """
+    Buffer shared by all web processes, drained by `drain_hit_buffer`.
+    """
+
+    key = "hits:buffer"
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def push(self, event):
+        self.client.rpush(self.key, json.dumps(event))
+
+    def pop(self, count):
+        with self.client.pipeline() as pipe:
+            pipe.lrange(self.key, 0, count - 1)
+            pipe.ltrim(self.key, count, -1)
+            events, _ = pipe.execute()
+        return [json.loads(event) for event in events]
+
+    def __len__(self):
+        return self.client.llen(self.key)
+
+
+_buffer = None
+
+
+def get_hit_buffer():
+    global _buffer
+    if _buffer is None:
+        if settings.HIT_BUFFER_BACKEND == "redis":
+            _buffer = RedisHitBuffer(settings.HIT_BUFFER_REDIS_URL)
+        else:
+            _buffer = MemoryHitBuffer(
+                settings.HIT_BUFFER_MAX_SIZE, settings.HIT_BUFFER_MAX_AGE
+            )
+    return _buffer
+
+
+_view_filter = None
+
+
+def get_view_filter():
+    global _view_filter
+    if _view_filter is None:
+        options = {
+            "window": settings.HIT_UNIQUE_VIEW_WINDOW,
+            "generations": settings.HIT_VIEW_FILTER_GENERATIONS,
+            "capacity": settings.HIT_VIEW_FILTER_CAPACITY,
+            "error_rate": settings.HIT_VIEW_FILTER_ERROR_RATE,
+        }
+        if settings.HIT_VIEW_FILTER_BACKEND == "redis":
+            _view_filter = RedisRotatingBloomFilter(
+                settings.HIT_VIEW_FILTER_REDIS_URL, prefix="hits:views", **options
+            )
+        else:
+            _view_filter = RotatingBloomFilter(**options)
+    return _view_filter
+
+
+def event_time(event):
+    """
+    When the hit was recorded; events buffered before they carried a time
+    are taken as recorded now.
+    """
+    return event.get("ts") or time.time()
+
+
+def new_views(events):
+    """
+    The events that are not repeat views within HIT_UNIQUE_VIEW_WINDOW, as of
+    the time each was recorded.
+    """
+    if not settings.HIT_UNIQUE_VIEW_WINDOW:
+        return events
+    view_filter = get_view_filter()
+    generations = {}
+    for event in events:
+        generations.setdefault(view_filter.generation(event_time(event)), []).append(
+            event
+        )
+    new = []
+    for batch in generations.values():
+        seen = view_filter.seen(
+            [f"{e['kind']}:{e['id']}:{e['ip']}" for e in batch],
+            now=event_time(batch[0]),
+        )
+        new.extend(event for event, repeat in zip(batch, seen) if not repeat)
+    return new
+
+
+def dispatch_hits(events):
+    """
+    Queue a batch for the worker. Returns whether the broker took it.
+    """
+    from .tasks import record_hits
+
+    try:
+        record_hits.delay(events)
+    except Exception:
+        logger.exception("Could not queue %d hits", len(events))
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def bot_rules(user_agents, ip_ranges):
+    """
+    Crawler signatures compiled into one regex, and the crawler networks.
+    """
+    pattern = re.compile("|".join(f"(?:{ua})" for ua in user_agents), re.IGNORECASE)
+    return pattern, [ipaddress.ip_network(r, strict=False) for r in ip_ranges]
+
+
+def is_bot(ip, user_agent):
+    """
+    Whether a request comes from a crawler: no user agent, a user agent
+    matching HIT_BOT_USER_AGENTS or parsed as a bot, or an IP address in
+    HIT_BOT_IP_RANGES. The cheap checks go first.
+    """
+    if not user_agent:
+        return True
+    pattern, networks = bot_rules(
+        tuple(settings.HIT_BOT_USER_AGENTS), tuple(settings.HIT_BOT_IP_RANGES)
+    )
+    if settings.HIT_BOT_USER_AGENTS and pattern.search(user_agent):
+        return True
+    if networks:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            address = None
+        if address and any(address in network for network in networks):
+            return True
+    return parse_user_agent(user_agent).is_bot
+
+
+def bot_hits_key(day):
+    return f"hits:bots:{day}"
+
+
+_bot_counter = None
+
+
+def get_bot_counter():
+    global _bot_counter
+    if _bot_counter is None:
+        _bot_counter = redis.Redis.from_url(settings.HIT_BUFFER_REDIS_URL)
+    return _bot_counter
+
+
+def count_bot_hit():
+    key = bot_hits_key(timezone.localdate())
+    try:
+        with get_bot_counter().pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, 60 * 60 * 24 * 7)
+            pipe.execute()
+    except redis.RedisError as e:
+        # a lost count must not fail the request
+        logger.warning("Could not count a crawler hit: %s", e)
+
+
+def bot_hit_count(day=None):
+    """
+    Crawler hits dropped on `day` (today by default).
+    """
+    return int(get_bot_counter().get(bot_hits_key(day or timezone.localdate())) or 0)
+
+
+def record_hit(request, kind, object_id):
+    """
+    Buffer a hit on a course or an article. Nothing is written to the database.
+    """
+    ip = get_client_ip(request)
+    user_agent = request.META.get("HTTP_USER_AGENT", "")
+    if is_bot(ip, user_agent):
+        count_bot_hit()
+        return
+    get_hit_buffer().push(
+        {"kind": kind, "id": object_id, "ip": ip, "ua": user_agent, "ts": time.time()}
+    )
+
+
+def view_window(now=None):
+    """
+    The HIT_UNIQUE_VIEW_WINDOW long period a view falls in: always 0 when
+    visitors are counted once, None when every view counts. Hit rows are
+    unique per visitor, object and period, so a repeat view that got past
+    the filter (e.g. in another worker) is not counted twice.
+    """
+    window = settings.HIT_UNIQUE_VIEW_WINDOW
+    if window is None:
+        return 0
+    if not window:
+        return None
+    return int((time.time() if now is None else now) // window)
+
+
+VISITOR_COLUMNS = [
+    "visitor_key",
+    "ip",
+    "device_type",
+    "browser_type",
+    "browser_version",
+    "os_type",
+    "os_version",
+    "created",
+    "updated",
+]
+
+
+def upsert_visitors(events, created):
+    """
+    HitDetail ids by IP for the events, inserting new visitors, in a single
+    INSERT ... ON CONFLICT round trip. `created` holds the time of each event.
+    """
+    visitors = {}
+    for event, at in zip(events, created):
+        if event["ip"] not in visitors:
+            visitors[event["ip"]] = {
+                "visitor_key": HitDetail.key_for(event["ip"] or ""),
+                "ip": event["ip"] or "",
+                **get_user_agent_details(event["ua"]),
+                "created": at,
+                "updated": at,
+            }
+        else:
+            visitor = visitors[event["ip"]]
+            visitor["created"] = min(visitor["created"], at)
+            visitor["updated"] = max(visitor["updated"], at)
+    # rows are locked in key order, so concurrent batches cannot deadlock
+    rows = sorted(visitors.values(), key=lambda visitor: visitor["visitor_key"])
+    values = ", ".join(["(%s)" % ", ".join(["%s"] * len(VISITOR_COLUMNS))] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {HitDetail._meta.db_table} ({', '.join(VISITOR_COLUMNS)}) "
+            f"VALUES {values} ON CONFLICT (visitor_key) "
+            "DO UPDATE SET updated = GREATEST(EXCLUDED.updated, "
+            f"{HitDetail._meta.db_table}.updated) RETURNING visitor_key, id",
+            [row[column] for row in rows for column in VISITOR_COLUMNS],
+        )
+        ids = dict(cursor.fetchall())
+    return {ip: ids[visitor["visitor_key"]] for ip, visitor in visitors.items()}
+
+
+def insert_hits(hit_model, hits):
+    """
+    Insert unsaved `hits`, skipping views already there. Unlike bulk_create
+    this keeps their `created` time.
+    """
+    fields = [
+        field for field in hit_model._meta.concrete_fields if not field.primary_key
+    ]
+    values = ", ".join(["(%s)" % ", ".join(["%s"] * len(fields))] * len(hits))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {hit_model._meta.db_table} "
+            f"({', '.join(field.column for field in fields)}) "
+            f"VALUES {values} ON CONFLICT DO NOTHING",
+            [
+                field.get_db_prep_save(getattr(hit, field.attname), connection)
+                for hit in hits
+                for field in fields
+            ],
+        )
+
+
+def write_hits(events):
+    """
+    Write a batch of hit events with a constant number of queries: one for
+    the end of the rolled up hours, one upsert of the visitors, then per kind
+    of object one query for the objects and one insert of the counted views,
+    skipping any already there.
+
+    Hits are dated and counted in the view window of the time they were
+    recorded, however long they were buffered. Hits recorded in an hour that
+    was rolled up in the meantime are dated at the end of the rolled up hours
+    instead, so the rollups still count them.
+    """
+    from .rollups import rolled_up_until
+
+    events = new_views(events)
+    if not events:
+        return
+    closed = rolled_up_until()
+    created = []
+    for event in events:
+        at = datetime.fromtimestamp(event_time(event), dt_timezone.utc)
+        created.append(max(at, closed) if closed else at)
+    # visitors are locked until their hits are in, see `rollups.delete_in_chunks`
+    with transaction.atomic():
+        hit_ids = upsert_visitors(events, created)
+        for kind, model, hit_model, field in (
+            (COURSE, Course, CourseHit, "course_id"),
+            (ARTICLE, Article, ArticleHit, "article_id"),
+        ):
+            hits = [
+                (event, at)
+                for event, at in zip(events, created)
+                if event["kind"] == kind
+            ]
+            if not hits:
+                continue
+            object_ids = set(
+                model.objects.filter(pk__in={e["id"] for e, _ in hits}).values_list(
+                    "pk", flat=True
+                )
+            )
+            timestamps = [
+                f.name
+                for f in hit_model._meta.fields
+                if f.name in ("created", "updated")
+            ]
+            hits = [
+                hit_model(
+                    hit_id=hit_ids[event["ip"]],
+                    view_window=view_window(event_time(event)),
+                    **{field: event["id"]},
+                    **dict.fromkeys(timestamps, at),
+                )
+                for event, at in hits
+                if event["id"] in object_ids
+            ]
+            if hits:
+                # in unique key order too
+                hits.sort(key=lambda hit: (hit.hit_id, getattr(hit, field)))
+                insert_hits(hit_model, hits)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from courses.archive import archive_hits
+
+
+class Command(BaseCommand):
+    help = (
+        "Move raw hits older than --days (and already rolled up) out of the "
+        "database into gzip-compressed CSV files, partitioned by date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=settings.HIT_ARCHIVE_DIR)
+        parser.add_argument("--days", type=int, default=settings.HIT_RETENTION_DAYS)
+
+    def handle(self, *args, dir, days, **options):
+        if not dir:
+            raise CommandError("Pass --dir or set HIT_ARCHIVE_DIR.")
+        if days < 1:
+            raise CommandError("--days must be at least 1.")
+        archived = archive_hits(dir, timezone.now() - timedelta(days=days))
+        self.stdout.write(f"Archived {archived} rows to {dir}")
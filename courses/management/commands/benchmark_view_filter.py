@@ -0,0 +1,53 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.bloom import RotatingBloomFilter
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the false-positive rate, memory and speed of the in-process "
+        "view filter for the HIT_VIEW_FILTER_* settings, filling every "
+        "generation with its share of --views distinct views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--views", type=int, default=settings.HIT_VIEW_FILTER_CAPACITY
+        )
+        parser.add_argument("--probes", type=int, default=100_000)
+
+    def handle(self, *args, views, probes, **options):
+        window = settings.HIT_UNIQUE_VIEW_WINDOW or 60 * 60 * 24
+        generations = settings.HIT_VIEW_FILTER_GENERATIONS
+        views_filter = RotatingBloomFilter(
+            window,
+            generations,
+            settings.HIT_VIEW_FILTER_CAPACITY,
+            settings.HIT_VIEW_FILTER_ERROR_RATE,
+        )
+        per_generation = views // generations
+        start = time.perf_counter()
+        for generation in range(generations):
+            views_filter.seen(
+                [uuid.uuid4().hex for _ in range(per_generation)],
+                now=generation * views_filter.span,
+            )
+        added = time.perf_counter()
+        false_positives = sum(uuid.uuid4().hex in views_filter for _ in range(probes))
+        probed = time.perf_counter()
+        self.stdout.write(
+            f"{'views':>10} {'us/view':>8} {'us/probe':>9} {'KiB':>8} "
+            f"{'false positives':>16} {'target':>8}"
+        )
+        self.stdout.write(
+            f"{per_generation * generations:>10} "
+            f"{(added - start) / max(per_generation * generations, 1) * 1e6:>8.2f} "
+            f"{(probed - added) / probes * 1e6:>9.2f} "
+            f"{views_filter.size / 1024:>8.0f} "
+            f"{false_positives / probes:>16.5f} "
+            f"{settings.HIT_VIEW_FILTER_ERROR_RATE:>8.5f}"
+        )
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.archive import load_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the archived hits of a date range into archived_<table> tables "
+        "for ad-hoc analysis. The live hit tables are not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("start", type=date.fromisoformat)
+        parser.add_argument("end", type=date.fromisoformat, nargs="?")
+        parser.add_argument("--dir", default=settings.HIT_ARCHIVE_DIR)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Empty the archived_<table> tables first.",
+        )
+
+    def handle(self, *args, start, end, dir, replace, **options):
+        if not dir:
+            raise CommandError("Pass --dir or set HIT_ARCHIVE_DIR.")
+        loaded = load_archive(dir, start, end or start, replace=replace)
+        self.stdout.write(f"Loaded {loaded} rows from {dir}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.similarity import build_related_courses
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the related-courses index now, e.g. right after deploying, "
+        "instead of waiting for the periodic rebuild_related_courses task."
+    )
+
+    def handle(self, *args, **options):
+        rows = build_related_courses()
+        self.stdout.write(f"Stored {rows} related courses")
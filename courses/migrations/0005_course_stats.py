@@ -0,0 +1,80 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+from django.db.models import Count
+
+
+def backfill_course_stats(apps, schema_editor):
+    Course = apps.get_model("courses", "Course")
+    CourseReviewRating = apps.get_model("courses", "CourseReviewRating")
+    CourseStats = apps.get_model("courses", "CourseStats")
+    histograms = {}
+    for course_id, rating, count in (
+        CourseReviewRating.objects.filter(is_active=True)
+        .values_list("course_id", "rating")
+        .annotate(Count("pk"))
+        .order_by()
+    ):
+        histograms.setdefault(course_id, {})[rating] = count
+
+    prior_mean = settings.COURSE_RATING_PRIOR_MEAN
+    prior_weight = settings.COURSE_RATING_PRIOR_WEIGHT
+    stats = []
+    for course_id in Course.objects.values_list("pk", flat=True):
+        histogram = histograms.get(course_id, {})
+        rating_count = sum(histogram.values())
+        rating_sum = sum(r * n for r, n in histogram.items())
+        stats.append(
+            CourseStats(
+                course_id=course_id,
+                rating_count=rating_count,
+                rating_sum=rating_sum,
+                rating_average=rating_sum / rating_count if rating_count else None,
+                bayesian_rating=(prior_mean * prior_weight + rating_sum)
+                / (prior_weight + rating_count),
+                **{f"star_{r}": histogram.get(r, 0) for r in range(1, 6)},
+            )
+        )
+    CourseStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0004_alter_category_slug"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseStats",
+            fields=[
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="courses.course",
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("rating_average", models.FloatField(blank=True, null=True)),
+                ("bayesian_rating", models.FloatField(default=0)),
+                ("star_1", models.PositiveIntegerField(default=0)),
+                ("star_2", models.PositiveIntegerField(default=0)),
+                ("star_3", models.PositiveIntegerField(default=0)),
+                ("star_4", models.PositiveIntegerField(default=0)),
+                ("star_5", models.PositiveIntegerField(default=0)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Course stats",
+                "db_table": "course_stats",
+            },
+        ),
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_student_count(apps, schema_editor):
+    # count enrollment rows like CourseStats.add_students does; enroll 0002
+    # resyncs the courses whose duplicate enrollments it removes
+    CourseStats = apps.get_model("courses", "CourseStats")
+    EnrolledCourse = apps.get_model("enroll", "EnrolledCourse")
+    student_counts = (
+        EnrolledCourse.objects.values_list("course_id")
+        .annotate(Count("pk"))
+        .order_by()
+    )
+    stats = []
+    for course_id, student_count in student_counts:
+        stats.append(CourseStats(course_id=course_id, student_count=student_count))
+    CourseStats.objects.bulk_update(stats, ["student_count"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_course_stats"),
+        ("enroll", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coursestats",
+            name="student_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_student_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_search_vector(apps, schema_editor):
+    Category = apps.get_model("courses", "Category")
+    Course = apps.get_model("courses", "Course")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    category_title = Category.objects.filter(pk=OuterRef("category_id")).values("title")
+    owner_name = User.objects.filter(pk=OuterRef("owner_id")).values("name")
+    Course.objects.update(
+        search_vector=SearchVector("title", weight="A", config="english")
+        + SearchVector(Subquery(category_title), weight="B", config="english")
+        + SearchVector(Subquery(owner_name), weight="B", config="english")
+        + SearchVector("overview", weight="C", config="english")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0006_course_stats_student_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="courses_search_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0008_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedCourse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="related_courses",
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="related_to",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "related_courses",
+                "ordering": ["course", "rank"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="relatedcourse",
+            constraint=models.UniqueConstraint(
+                fields=("course", "rank"), name="related_courses_course_rank"
+            ),
+        ),
+    ]
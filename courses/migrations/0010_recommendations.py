@@ -0,0 +1,100 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("courses", "0009_related_courses"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="student_recommendations",
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="course_recommendations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "student_recommendations",
+                "ordering": ["student", "rank"],
+            },
+        ),
+        migrations.CreateModel(
+            name="CourseRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendations",
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "recommended",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommended_with",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "course_recommendations",
+                "ordering": ["course", "rank"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="studentrecommendation",
+            constraint=models.UniqueConstraint(
+                fields=("student", "rank"), name="student_recommendations_student_rank"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="courserecommendation",
+            constraint=models.UniqueConstraint(
+                fields=("course", "rank"), name="course_recommendations_course_rank"
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Avg, Count
+
+
+def backfill_teacher_stats(apps, schema_editor):
+    Course = apps.get_model("courses", "Course")
+    CourseHit = apps.get_model("courses", "CourseHit")
+    Member = apps.get_model("courses", "Member")
+    TeacherReviewRating = apps.get_model("courses", "TeacherReviewRating")
+    TeacherStats = apps.get_model("courses", "TeacherStats")
+    EnrolledCourse = apps.get_model("enroll", "EnrolledCourse")
+
+    ratings = {
+        teacher_id: (count, average)
+        for teacher_id, count, average in TeacherReviewRating.objects.filter(
+            is_active=True
+        )
+        .values_list("teacher_id")
+        .annotate(Count("pk"), Avg("rating"))
+        .order_by()
+    }
+    owned, cotaught = {}, {}
+    for teacher_id, course_id in Course.objects.values_list("owner_id", "pk"):
+        owned.setdefault(teacher_id, set()).add(course_id)
+    for teacher_id, course_id in Member.objects.filter(
+        course__isnull=False
+    ).values_list("member_id", "course_id"):
+        if course_id not in owned.get(teacher_id, ()):
+            cotaught.setdefault(teacher_id, set()).add(course_id)
+    students = {}
+    for course_id, student_id in EnrolledCourse.objects.values_list(
+        "course_id", "student_id"
+    ).iterator():
+        students.setdefault(course_id, set()).add(student_id)
+    hits = dict(
+        CourseHit.objects.values_list("course_id").annotate(Count("pk")).order_by()
+    )
+
+    stats = []
+    for teacher_id in set(ratings) | set(owned) | set(cotaught):
+        taught = owned.get(teacher_id, set()) | cotaught.get(teacher_id, set())
+        rating_count, rating_average = ratings.get(teacher_id, (0, None))
+        stats.append(
+            TeacherStats(
+                teacher_id=teacher_id,
+                rating_count=rating_count,
+                rating_average=rating_average,
+                courses_owned=len(owned.get(teacher_id, ())),
+                courses_cotaught=len(cotaught.get(teacher_id, ())),
+                student_count=len(set().union(*(students.get(c, ()) for c in taught))),
+                hit_count=sum(hits.get(c, 0) for c in taught),
+            )
+        )
+    TeacherStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_user_name_trgm"),
+        ("courses", "0010_recommendations"),
+        ("enroll", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeacherStats",
+            fields=[
+                (
+                    "teacher",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="teacher_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_average", models.FloatField(blank=True, null=True)),
+                ("courses_owned", models.PositiveIntegerField(default=0)),
+                ("courses_cotaught", models.PositiveIntegerField(default=0)),
+                ("student_count", models.PositiveIntegerField(default=0)),
+                ("hit_count", models.PositiveIntegerField(default=0)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Teacher stats",
+                "db_table": "teacher_stats",
+            },
+        ),
+        migrations.RunPython(backfill_teacher_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0011_teacher_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HitRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=10)),
+                ("object_id", models.PositiveIntegerField()),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("views", models.PositiveIntegerField(default=0)),
+                ("unique_ips", models.PositiveIntegerField(default=0)),
+                ("devices", models.JSONField(default=dict)),
+                ("browsers", models.JSONField(default=dict)),
+                ("operating_systems", models.JSONField(default=dict)),
+            ],
+            options={
+                "db_table": "hit_rollups",
+            },
+        ),
+        migrations.AddField(
+            model_name="coursestats",
+            name="hit_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="coursehit",
+            index=models.Index(fields=["created"], name="course_hits_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="hitdetail",
+            index=models.Index(fields=["created"], name="hits_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="hitrollup",
+            index=models.Index(
+                fields=["period", "bucket"], name="hit_rollups_period_bucket"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="hitrollup",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "object_id", "period", "bucket"),
+                name="hit_rollups_bucket",
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Merge the duplicate visitors created by concurrent first visits into the
+# oldest one, then key every visitor by the sha256 of its IP.
+MERGE_DUPLICATE_VISITORS = """
+CREATE TEMPORARY TABLE hit_duplicates ON COMMIT DROP AS
+SELECT hits.id, first.id AS first_id
+FROM hits
+JOIN (SELECT ip, min(id) AS id FROM hits GROUP BY ip) first ON first.ip = hits.ip
+WHERE hits.id <> first.id;
+
+UPDATE course_hits SET hit_id = hit_duplicates.first_id
+FROM hit_duplicates WHERE course_hits.hit_id = hit_duplicates.id;
+
+UPDATE article_hits SET hit_id = hit_duplicates.first_id
+FROM hit_duplicates WHERE article_hits.hit_id = hit_duplicates.id;
+
+DELETE FROM hits USING hit_duplicates WHERE hits.id = hit_duplicates.id;
+
+UPDATE hits SET visitor_key = encode(sha256(convert_to(ip, 'UTF8')), 'hex');
+"""
+
+
+def backfill_view_windows(apps, schema_editor):
+    """
+    Put existing hits in the view window of their creation, as
+    `courses.hits.view_window` does for new ones, and delete the repeat
+    views of a visitor, object and window (including those the merge of
+    visitors produced) so the unique constraints can be added.
+    """
+    window = settings.HIT_UNIQUE_VIEW_WINDOW
+    if window == 0:
+        # every view counts, hits keep a NULL window
+        return
+    for table, column in (("course_hits", "course_id"), ("article_hits", "article_id")):
+        if window is None:
+            schema_editor.execute(f"UPDATE {table} SET view_window = 0")
+        else:
+            schema_editor.execute(
+                f"UPDATE {table} SET view_window = "
+                "floor(extract(epoch FROM created) / %s)",
+                [window],
+            )
+        schema_editor.execute(
+            f"DELETE FROM {table} USING {table} first "
+            f"WHERE {table}.hit_id = first.hit_id "
+            f"AND {table}.{column} = first.{column} "
+            f"AND {table}.view_window = first.view_window "
+            f"AND {table}.id > first.id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0012_hit_rollups"),
+        ("blog", "0005_articlehit_view_window"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coursehit",
+            name="view_window",
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="hitdetail",
+            name="visitor_key",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunSQL(MERGE_DUPLICATE_VISITORS, migrations.RunSQL.noop),
+        migrations.RunPython(backfill_view_windows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0013_hit_visitor_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="hitdetail",
+            name="visitor_key",
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name="coursehit",
+            constraint=models.UniqueConstraint(
+                fields=("hit", "course", "view_window"), name="course_hits_unique_view"
+            ),
+        ),
+    ]
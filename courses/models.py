@@ -1,10 +1,23 @@
+import hashlib
+import logging
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Avg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, Func, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
 from django.urls import reverse
 from django_resized import ResizedImageField
 
-from utils.utils import slug_generator
+from utils.search import SEARCH_CONFIG
+from utils.utils import SlugMixin
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = {"title", "overview", "category", "owner"}
 
 
 class TimeStampedModel(models.Model):
@@ -15,7 +28,7 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
-class Category(TimeStampedModel):
+class Category(SlugMixin, TimeStampedModel):
     title = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True)
 
@@ -23,12 +36,16 @@ class Category(TimeStampedModel):
         db_table = "categories"
         ordering = ["title"]
         verbose_name_plural = "Categories"
+        indexes = [
+            GinIndex(
+                fields=["title"],
+                name="categories_title_trgm",
+                opclasses=["gin_trgm_ops"],
+            )
+        ]
 
     def save(self, *args, **kwargs):
-        if self.slug is None or self.slug == "":
-            self.slug = slug_generator(self)
-        else:
-            self.slug = slug_generator(self, new_slug=self.slug)
+        self.allocate_slug()
         super(Category, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -38,18 +55,20 @@ class Category(TimeStampedModel):
         return reverse("category", kwargs={"category_slug": self.slug})
 
 
-class Tag(TimeStampedModel):
+class Tag(SlugMixin, TimeStampedModel):
     title = models.CharField(max_length=30, unique=True)
     slug = models.SlugField(max_length=100, unique=True, null=True)
 
     class Meta:
         db_table = "tags"
+        indexes = [
+            GinIndex(
+                fields=["title"], name="tags_title_trgm", opclasses=["gin_trgm_ops"]
+            )
+        ]
 
     def save(self, *args, **kwargs):
-        if self.slug is None or self.slug == "":
-            self.slug = slug_generator(self)
-        else:
-            self.slug = slug_generator(self, new_slug=self.slug)
+        self.allocate_slug()
         super(Tag, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -59,7 +78,7 @@ class Tag(TimeStampedModel):
         return reverse("tag", kwargs={"tag_slug": self.slug})
 
 
-class Course(TimeStampedModel):
+class Course(SlugMixin, TimeStampedModel):
     owner = models.ForeignKey(
         get_user_model(),
         on_delete=models.SET_NULL,
@@ -83,17 +102,24 @@ class Course(TimeStampedModel):
     lessons = models.PositiveSmallIntegerField("Number of Lessons", default=12)
     number_of_weeks = models.PositiveSmallIntegerField("Number of Weeks", default=8)
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = "courses"
         ordering = ["pk"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="courses_search_idx"),
+            GinIndex(
+                fields=["title"], name="courses_title_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.slug is None or self.slug == "":
-            self.slug = slug_generator(self)
-        else:
-            self.slug = slug_generator(self, new_slug=self.slug)
+        self.allocate_slug()
         super(Course, self).save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or SEARCH_FIELDS.intersection(update_fields):
+            Course.update_search_vectors(pk=self.pk)
 
     def __str__(self):
         return self.title
@@ -109,6 +135,34 @@ class Course(TimeStampedModel):
     def get_courses_by_id(cls, ids):
         return cls.objects.filter(pk__in=ids)
 
+    @staticmethod
+    def search_vector_expression():
+        """
+        Weighted document: title (A), category and teacher name (B), overview (C).
+        Related titles are read through subqueries so it can be used in UPDATE.
+        """
+        category_title = Category.objects.filter(pk=OuterRef("category_id")).values(
+            "title"
+        )
+        owner_name = (
+            get_user_model().objects.filter(pk=OuterRef("owner_id")).values("name")
+        )
+        return (
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(Subquery(category_title), weight="B", config=SEARCH_CONFIG)
+            + SearchVector(Subquery(owner_name), weight="B", config=SEARCH_CONFIG)
+            + SearchVector("overview", weight="C", config=SEARCH_CONFIG)
+        )
+
+    @classmethod
+    def update_search_vectors(cls, **filters):
+        """
+        Rebuild the stored search vector of the matching courses in one query.
+        """
+        return cls.objects.filter(**filters).update(
+            search_vector=cls.search_vector_expression()
+        )
+
 
 class CourseTag(TimeStampedModel):
     course = models.ForeignKey(
@@ -173,11 +227,15 @@ class Member(TimeStampedModel):
 
     @classmethod
     def member_rating(cls):
-        return cls.objects.annotate(avg_rating=Avg("teacher_reviews"))
+        return cls.objects.annotate(
+            avg_rating=F("member__teacher_stats__rating_average")
+        )
 
 
 class HitDetail(TimeStampedModel):
     ip = models.CharField(editable=False, max_length=100)
+    # one row per visitor, keyed by a hash of the IP
+    visitor_key = models.CharField(max_length=64, unique=True, editable=False)
     device_type = models.CharField(max_length=100, default="")
     os_type = models.CharField(max_length=200, default="")
     os_version = models.CharField(max_length=200, default="")
@@ -186,24 +244,79 @@ class HitDetail(TimeStampedModel):
 
     class Meta:
         db_table = "hits"
+        indexes = [models.Index(fields=["created"], name="hits_created_idx")]
 
     def __str__(self):
         return self.ip
 
+    def save(self, *args, **kwargs):
+        if not self.visitor_key:
+            self.visitor_key = self.key_for(self.ip)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def key_for(ip):
+        return hashlib.sha256(ip.encode()).hexdigest()
+
 
 class CourseHit(TimeStampedModel):
     course = models.ForeignKey(
         Course, on_delete=models.SET_NULL, related_name="course_hits", null=True
     )
     hit = models.ForeignKey(HitDetail, on_delete=models.CASCADE)
+    # view counting window the hit was counted in (see `courses.hits.view_window`)
+    view_window = models.PositiveIntegerField(null=True, editable=False)
 
     class Meta:
         db_table = "course_hits"
+        indexes = [models.Index(fields=["created"], name="course_hits_created_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hit", "course", "view_window"], name="course_hits_unique_view"
+            )
+        ]
 
     def __str__(self):
         return f"{self.hit} for {self.course}"
 
 
+class HitRollup(models.Model):
+    """
+    Hits on a course or an article over one hour or one day, aggregated from
+    the raw hit tables by `courses.rollups`. Raw rows are purged after
+    HIT_RETENTION_DAYS, these are kept.
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    PERIODS = [(HOUR, "Hour"), (DAY, "Day")]
+
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveIntegerField()
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    unique_ips = models.PositiveIntegerField(default=0)
+    devices = models.JSONField(default=dict)
+    browsers = models.JSONField(default=dict)
+    operating_systems = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = "hit_rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id", "period", "bucket"],
+                name="hit_rollups_bucket",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["period", "bucket"], name="hit_rollups_period_bucket")
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}, {self.period} of {self.bucket}"
+
+
 class CourseWeek(TimeStampedModel):
     """
     Limit the number of weeks to 12 for every course.
@@ -326,3 +439,355 @@ class TeacherReviewRating(TimeStampedModel):
 
     def __str__(self):
         return f"Review for {self.teacher} by {self.user}"
+
+
+class CourseStats(models.Model):
+    """
+    Denormalized per-course aggregates.
+    Kept current by `courses.signals` so course pages never aggregate
+    over the reviews table.
+    """
+
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, related_name="stats", primary_key=True
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(blank=True, null=True)
+    bayesian_rating = models.FloatField(default=0)
+    star_1 = models.PositiveIntegerField(default=0)
+    star_2 = models.PositiveIntegerField(default=0)
+    star_3 = models.PositiveIntegerField(default=0)
+    star_4 = models.PositiveIntegerField(default=0)
+    star_5 = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    # views (see HIT_UNIQUE_VIEW_WINDOW), added by `courses.rollups`
+    hit_count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "course_stats"
+        verbose_name_plural = "Course stats"
+
+    def __str__(self):
+        return f"Stats for {self.course}"
+
+    def star_count(self, rating):
+        return getattr(self, f"star_{rating}", 0)
+
+    def star_percentage(self, rating):
+        if not self.rating_count:
+            return 0
+        return self.star_count(rating) / self.rating_count * 100
+
+    @property
+    def histogram(self):
+        """
+        (rating, count, percentage) for every star, highest first.
+        """
+        return [
+            (rating, self.star_count(rating), self.star_percentage(rating))
+            for rating in range(5, 0, -1)
+        ]
+
+    @staticmethod
+    def bayesian_average(rating_count, rating_sum):
+        """
+        Shrink the average towards a prior so that a single 5-star review
+        doesn't outrank a course with hundreds of 4-star reviews.
+        """
+        prior_mean = settings.COURSE_RATING_PRIOR_MEAN
+        prior_weight = settings.COURSE_RATING_PRIOR_WEIGHT
+        return (prior_mean * prior_weight + rating_sum) / (prior_weight + rating_count)
+
+    @classmethod
+    def add_students(cls, course_ids, count=1):
+        """
+        Adjust the enrollment counter of the given courses in a single UPDATE.
+        """
+        cls.objects.filter(course_id__in=course_ids).update(
+            student_count=Greatest(F("student_count") + count, 0)
+        )
+
+    @classmethod
+    def refresh_ratings(cls, course_id):
+        """
+        Recompute the rating aggregates of a course from its active reviews.
+        The stats row is locked so concurrent review writes apply in turn.
+        """
+        with transaction.atomic():
+            stats, _ = cls.objects.select_for_update().get_or_create(
+                course_id=course_id
+            )
+            histogram = dict(
+                CourseReviewRating.objects.filter(course_id=course_id, is_active=True)
+                .values_list("rating")
+                .annotate(Count("pk"))
+                .order_by()
+            )
+            stats.rating_count = sum(histogram.values())
+            stats.rating_sum = sum(r * n for r, n in histogram.items())
+            stats.rating_average = (
+                stats.rating_sum / stats.rating_count if stats.rating_count else None
+            )
+            stats.bayesian_rating = cls.bayesian_average(
+                stats.rating_count, stats.rating_sum
+            )
+            for rating in range(1, 6):
+                setattr(stats, f"star_{rating}", histogram.get(rating, 0))
+            stats.save()
+        return stats
+
+
+class TeacherStats(models.Model):
+    """
+    Denormalized per-teacher aggregates for the team pages and the course
+    instructor block. Writes seen by `courses.signals` and `enroll.signals`
+    queue a background refresh of the teachers concerned;
+    `courses.tasks.rebuild_teacher_stats` recomputes every row.
+    """
+
+    teacher = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="teacher_stats",
+        primary_key=True,
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(blank=True, null=True)
+    courses_owned = models.PositiveIntegerField(default=0)
+    courses_cotaught = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "teacher_stats"
+        verbose_name_plural = "Teacher stats"
+
+    def __str__(self):
+        return f"Stats for {self.teacher}"
+
+    @property
+    def courses_taught(self):
+        return self.courses_owned + self.courses_cotaught
+
+    @staticmethod
+    def teachers_of(course_ids):
+        """
+        Owners and members of the given courses.
+        """
+        return set(
+            Course.objects.filter(pk__in=course_ids).values_list("owner_id", flat=True)
+        ) | set(
+            Member.objects.filter(course_id__in=course_ids).values_list(
+                "member_id", flat=True
+            )
+        )
+
+    @classmethod
+    def queue_refresh(cls, teacher_ids):
+        """
+        Refresh the stats of the given teachers in the background once the
+        current transaction commits, so writes and their locks do not wait
+        for it. The teachers queued by every write of a transaction are
+        refreshed by a single task. If the broker is down the next full
+        rebuild catches up.
+        """
+        from .tasks import refresh_teacher_stats
+
+        teacher_ids = set(teacher_ids)
+        if not teacher_ids:
+            return
+        connection = transaction.get_connection()
+        queued = getattr(connection, "queued_teacher_stats", None)
+        # the callback is gone if its savepoint was rolled back
+        if queued and any(entry[1] is queued[1] for entry in connection.run_on_commit):
+            queued[0].update(teacher_ids)
+            return
+
+        def send():
+            if getattr(connection, "queued_teacher_stats", None) is queued:
+                connection.queued_teacher_stats = None
+            try:
+                refresh_teacher_stats.delay(sorted(teacher_ids))
+            except Exception:
+                logger.exception("Could not queue teacher stats for %s", teacher_ids)
+
+        queued = connection.queued_teacher_stats = (teacher_ids, send)
+        transaction.on_commit(send)
+
+    @classmethod
+    def refresh(cls, teacher_ids):
+        """
+        Recompute the stats of the given teachers with a fixed number of
+        grouped queries and upsert them in one statement.
+        """
+        from enroll.models import EnrolledCourse
+
+        students = (
+            EnrolledCourse.objects.filter(
+                Q(course__owner_id=OuterRef("pk"))
+                | Q(course__course_members__member_id=OuterRef("pk"))
+            )
+            .order_by()
+            .values(
+                count=Func(
+                    "student_id",
+                    function="COUNT",
+                    template="%(function)s(DISTINCT %(expressions)s)",
+                )
+            )
+        )
+        student_counts = dict(
+            get_user_model()
+            .objects.filter(pk__in=set(teacher_ids))
+            .annotate(
+                student_count=Subquery(students, output_field=models.IntegerField())
+            )
+            .values_list("pk", "student_count")
+        )
+        teacher_ids = set(student_counts)
+        if not teacher_ids:
+            return
+
+        ratings = {
+            teacher_id: (count, average)
+            for teacher_id, count, average in TeacherReviewRating.objects.filter(
+                teacher_id__in=teacher_ids, is_active=True
+            )
+            .values_list("teacher_id")
+            .annotate(Count("pk"), Avg("rating"))
+            .order_by()
+        }
+        owned = defaultdict(set)
+        for teacher_id, course_id in Course.objects.filter(
+            owner_id__in=teacher_ids
+        ).values_list("owner_id", "pk"):
+            owned[teacher_id].add(course_id)
+        cotaught = defaultdict(set)
+        for teacher_id, course_id in Member.objects.filter(
+            member_id__in=teacher_ids, course__isnull=False
+        ).values_list("member_id", "course_id"):
+            if course_id not in owned[teacher_id]:
+                cotaught[teacher_id].add(course_id)
+
+        course_ids = set().union(*owned.values(), *cotaught.values())
+        hits = dict(
+            CourseStats.objects.filter(course_id__in=course_ids).values_list(
+                "course_id", "hit_count"
+            )
+        )
+
+        rows = []
+        for teacher_id in teacher_ids:
+            taught = owned[teacher_id] | cotaught[teacher_id]
+            rating_count, rating_average = ratings.get(teacher_id, (0, None))
+            rows.append(
+                cls(
+                    teacher_id=teacher_id,
+                    rating_count=rating_count,
+                    rating_average=rating_average,
+                    courses_owned=len(owned[teacher_id]),
+                    courses_cotaught=len(cotaught[teacher_id]),
+                    student_count=student_counts[teacher_id],
+                    hit_count=sum(hits.get(course_id, 0) for course_id in taught),
+                )
+            )
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            # Django 4.1 expects the column name of the primary key here
+            unique_fields=["teacher_id"],
+            update_fields=[
+                "rating_count",
+                "rating_average",
+                "courses_owned",
+                "courses_cotaught",
+                "student_count",
+                "hit_count",
+                "updated",
+            ],
+        )
+
+
+class RelatedCourse(models.Model):
+    """
+    Precomputed top-K neighbours of a course, rebuilt by
+    `courses.tasks.build_related_courses`.
+    """
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="related_courses"
+    )
+    related = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="related_to"
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "related_courses"
+        ordering = ["course", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "rank"], name="related_courses_course_rank"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.related} related to {self.course}"
+
+
+class CourseRecommendation(models.Model):
+    """
+    "Students who took this also took": the RECOMMENDATIONS_NEIGHBOURS nearest
+    courses by co-enrollment, rebuilt by `courses.tasks.rebuild_recommendations`.
+    Pages show the first RECOMMENDATIONS_LIMIT.
+    """
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="recommendations"
+    )
+    recommended = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="recommended_with"
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "course_recommendations"
+        ordering = ["course", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "rank"], name="course_recommendations_course_rank"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recommended} for students of {self.course}"
+
+
+class StudentRecommendation(models.Model):
+    student = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="course_recommendations",
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="student_recommendations"
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "student_recommendations"
+        ordering = ["student", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "rank"], name="student_recommendations_student_rank"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.course} for {self.student}"
@@ -0,0 +1,212 @@
+"""
+Co-enrollment recommendations ("students who took this also took").
+
+Courses are compared by the cosine similarity of their student sets. Each
+student is recommended the active courses they do not own, scored by the
+summed similarity to the courses they do own (item-item nearest neighbours).
+Every course keeps RECOMMENDATIONS_NEIGHBOURS neighbours, so a refresh scores
+students from the same neighbourhoods as a rebuild.
+
+`build_recommendations` rebuilds everything from `EnrolledCourse`;
+`refresh_recommendations` updates the enrolled courses and the student right
+after a checkout, until the next full rebuild.
+"""
+import heapq
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from enroll.models import EnrolledCourse
+
+from .models import Course, CourseRecommendation, StudentRecommendation
+from .similarity import cosine_scores, invert
+
+logger = logging.getLogger(__name__)
+
+
+def top(scores, limit):
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def student_scores(owned, neighbours):
+    """
+    Summed similarity of unowned courses to the courses a student owns.
+    """
+    scores = Counter()
+    for course_id in owned:
+        for other, score in neighbours.get(course_id, ()):
+            if other not in owned:
+                scores[other] += score
+    return scores
+
+
+def load_students_by_course():
+    students = defaultdict(set)
+    enrollments = EnrolledCourse.objects.values_list("course_id", "student_id")
+    for course_id, student_id in enrollments.iterator(chunk_size=10_000):
+        students[course_id].add(student_id)
+    return students
+
+
+def build_recommendations():
+    """
+    Rebuild course and student recommendations. Returns the number of rows.
+    """
+    limit = settings.RECOMMENDATIONS_LIMIT
+    active = set(Course.objects.filter(is_active=True).values_list("pk", flat=True))
+    students = load_students_by_course()
+    courses_by_student = invert(students)
+
+    neighbours = {}
+    for course_id in students:
+        scores = cosine_scores(course_id, students, courses_by_student)
+        neighbours[course_id] = top(
+            {other: s for other, s in scores.items() if other in active},
+            settings.RECOMMENDATIONS_NEIGHBOURS,
+        )
+
+    course_rows = [
+        CourseRecommendation(
+            course_id=course_id, recommended_id=other, score=score, rank=rank
+        )
+        for course_id, ranked in neighbours.items()
+        for rank, (other, score) in enumerate(ranked, start=1)
+    ]
+    student_rows = [
+        StudentRecommendation(
+            student_id=student_id, course_id=other, score=score, rank=rank
+        )
+        for student_id, owned in courses_by_student.items()
+        for rank, (other, score) in enumerate(
+            top(student_scores(set(owned), neighbours), limit), start=1
+        )
+    ]
+    with transaction.atomic():
+        CourseRecommendation.objects.all().delete()
+        StudentRecommendation.objects.all().delete()
+        # upserts, rows of a concurrent refresh may have been committed since
+        save_ranked(CourseRecommendation, "course", course_rows)
+        save_ranked(StudentRecommendation, "student", student_rows)
+    return len(course_rows) + len(student_rows)
+
+
+def save_ranked(model, owner, rows):
+    """
+    Upsert ranked recommendation `rows` on (owner, rank). Concurrent writers
+    of the same owner wait for each other's rows instead of failing on the
+    unique constraint; rows are sorted so they lock in the same order.
+    """
+    model.objects.bulk_create(
+        sorted(rows, key=lambda row: (getattr(row, f"{owner}_id"), row.rank)),
+        batch_size=5000,
+        update_conflicts=True,
+        # columns, Django 4.1 does not resolve foreign key names here
+        unique_fields=[f"{owner}_id", "rank"],
+        update_fields=[
+            field.column
+            for field in model._meta.concrete_fields
+            if field.name not in (owner, "rank") and not field.primary_key
+        ],
+    )
+
+
+def replace_ranked(model, owner, owner_ids, rows):
+    """
+    Replace the ranked rows of `owner_ids` with `rows`: upsert the new ranks
+    and delete the ranks beyond them.
+    """
+    save_ranked(model, owner, rows)
+    ranks = Counter(getattr(row, f"{owner}_id") for row in rows)
+    stale = Q()
+    for owner_id in owner_ids:
+        stale |= Q(**{f"{owner}_id": owner_id, "rank__gt": ranks[owner_id]})
+    if stale:
+        model.objects.filter(stale).delete()
+
+
+def course_neighbours(course_id):
+    """
+    Co-enrollment neighbours of one course, read straight from the database.
+    """
+    enrolled = EnrolledCourse.objects.filter(course_id=course_id)
+    size = enrolled.values("student_id").distinct().count()
+    if not size:
+        return []
+    shared = dict(
+        EnrolledCourse.objects.filter(
+            student_id__in=enrolled.values("student_id"), course__is_active=True
+        )
+        .exclude(course_id=course_id)
+        .values_list("course_id")
+        .annotate(Count("student_id", distinct=True))
+        .order_by()
+    )
+    sizes = dict(
+        EnrolledCourse.objects.filter(course_id__in=shared)
+        .values_list("course_id")
+        .annotate(Count("student_id", distinct=True))
+        .order_by()
+    )
+    scores = {
+        other: count / (size * sizes[other]) ** 0.5 for other, count in shared.items()
+    }
+    return top(scores, settings.RECOMMENDATIONS_NEIGHBOURS)
+
+
+def refresh_recommendations(student_id, course_ids):
+    """
+    Update the recommendations of newly enrolled courses and of their student.
+    """
+    limit = settings.RECOMMENDATIONS_LIMIT
+    course_rows = [
+        CourseRecommendation(
+            course_id=course_id, recommended_id=other, score=score, rank=rank
+        )
+        for course_id in course_ids
+        for rank, (other, score) in enumerate(course_neighbours(course_id), start=1)
+    ]
+    with transaction.atomic():
+        replace_ranked(CourseRecommendation, "course", course_ids, course_rows)
+
+        owned = set(
+            EnrolledCourse.objects.filter(student_id=student_id).values_list(
+                "course_id", flat=True
+            )
+        )
+        neighbours = defaultdict(list)
+        for course_id, other, score in CourseRecommendation.objects.filter(
+            course_id__in=owned
+        ).values_list("course_id", "recommended_id", "score"):
+            neighbours[course_id].append((other, score))
+        replace_ranked(
+            StudentRecommendation,
+            "student",
+            [student_id],
+            [
+                StudentRecommendation(
+                    student_id=student_id, course_id=other, score=score, rank=rank
+                )
+                for rank, (other, score) in enumerate(
+                    top(student_scores(owned, neighbours), limit), start=1
+                )
+            ],
+        )
+
+
+def queue_refresh(student_id, course_ids):
+    """
+    Refresh in the background once the enrollment is committed. If the broker
+    is down the next full rebuild picks the enrollment up.
+    """
+    from .tasks import refresh_student_recommendations
+
+    def send():
+        try:
+            refresh_student_recommendations.delay(student_id, list(course_ids))
+        except Exception:
+            logger.exception("Could not queue recommendations for %s", student_id)
+
+    transaction.on_commit(send)
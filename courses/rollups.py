@@ -0,0 +1,232 @@
+"""
+Hourly and daily rollups of course and article hits, and retention of the
+raw hit tables.
+
+`rollup_hits` aggregates the `CourseHit` and `ArticleHit` rows of every
+complete hour since the last rollup into `HitRollup` rows per object: views,
+unique IPs and device/browser/OS breakdowns, by hour and by day. The views of
+the new hours are added to `CourseStats.hit_count` and `Article.hit_count`,
+which pages read instead of counting hits. An hour is rolled up
+HIT_ROLLUP_LAG_MINUTES after it ends, so buffered hits have been written;
+hits buffered for longer are dated after the rolled up hours (see
+`courses.hits.write_hits`).
+
+`purge_raw_hits` deletes raw rows older than HIT_RETENTION_DAYS, in chunks of
+HIT_PURGE_CHUNK_SIZE, but never rows of a day that has not been completely
+rolled up, so the daily rollup recomputed from them is never partial.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Min, Value, When
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from blog.models import Article, ArticleHit
+
+from .hits import ARTICLE, COURSE
+from .models import CourseHit, CourseStats, HitDetail, HitRollup
+
+logger = logging.getLogger(__name__)
+
+# kind: (raw hit model, object column, model holding `hit_count`, its key)
+SOURCES = {
+    COURSE: (CourseHit, "course_id", CourseStats, "course_id"),
+    ARTICLE: (ArticleHit, "article_id", Article, "pk"),
+}
+
+# HitRollup field: HitDetail lookup
+BREAKDOWNS = {
+    "devices": "hit__device_type",
+    "browsers": "hit__browser_type",
+    "operating_systems": "hit__os_type",
+}
+
+ROLLUP_FIELDS = ["views", "unique_ips", *BREAKDOWNS]
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value):
+    return floor_hour(timezone.localtime(value)).replace(hour=0)
+
+
+def rolled_up_until():
+    """
+    End of the last rolled up hour with hits, None before the first rollup.
+    """
+    last = HitRollup.objects.filter(period=HitRollup.HOUR).aggregate(
+        last=Max("bucket")
+    )["last"]
+    return last and last + timedelta(hours=1)
+
+
+def first_hit():
+    starts = [
+        model.objects.aggregate(first=Min("created"))["first"]
+        for model, *_ in SOURCES.values()
+    ]
+    starts = [start for start in starts if start is not None]
+    return starts and floor_hour(min(starts))
+
+
+def aggregate(kind, start, end, period):
+    """
+    Unsaved `HitRollup`s of the raw hits of `kind` in [start, end).
+    """
+    model, field, *_ = SOURCES[kind]
+    trunc = TruncHour if period == HitRollup.HOUR else TruncDay
+    hits = (
+        model.objects.filter(
+            created__gte=start, created__lt=end, **{f"{field}__isnull": False}
+        )
+        .annotate(bucket=trunc("created"))
+        .order_by()
+    )
+    rollups = {}
+    for object_id, bucket, views, unique_ips in hits.values_list(
+        field, "bucket"
+    ).annotate(Count("pk"), Count("hit__ip", distinct=True)):
+        rollups[object_id, bucket] = HitRollup(
+            kind=kind,
+            object_id=object_id,
+            period=period,
+            bucket=bucket,
+            views=views,
+            unique_ips=unique_ips,
+        )
+    for name, lookup in BREAKDOWNS.items():
+        for object_id, bucket, value, count in hits.values_list(
+            field, "bucket", lookup
+        ).annotate(Count("pk")):
+            getattr(rollups[object_id, bucket], name)[value or "Other"] = count
+    return list(rollups.values())
+
+
+def add_hit_counts(kind, views):
+    """
+    Add `views` ({object id: views}) to the `hit_count` of the objects.
+    """
+    *_, model, key = SOURCES[kind]
+    items = list(views.items())
+    for i in range(0, len(items), 500):
+        chunk = dict(items[i : i + 500])
+        model.objects.filter(**{f"{key}__in": chunk}).update(
+            hit_count=F("hit_count")
+            + Case(
+                *(When(**{key: pk}, then=Value(count)) for pk, count in chunk.items()),
+                default=Value(0),
+            )
+        )
+
+
+def rollup_hits(now=None):
+    """
+    Roll up the complete hours not rolled up yet. Returns the number of
+    hourly rollups written.
+    """
+    end = floor_hour(
+        (now or timezone.now()) - timedelta(minutes=settings.HIT_ROLLUP_LAG_MINUTES)
+    )
+    start = rolled_up_until() or first_hit()
+    if not start or start >= end:
+        return 0
+
+    hours = [
+        row for kind in SOURCES for row in aggregate(kind, start, end, HitRollup.HOUR)
+    ]
+    # days are recomputed from the raw rows, including their earlier hours
+    days = [
+        row
+        for kind in SOURCES
+        for row in aggregate(kind, floor_day(start), end, HitRollup.DAY)
+    ]
+    views = {kind: Counter() for kind in SOURCES}
+    for row in hours:
+        views[row.kind][row.object_id] += row.views
+
+    try:
+        with transaction.atomic():
+            # a concurrent rollup of the same hours fails here and adds nothing
+            HitRollup.objects.bulk_create(hours, batch_size=5000)
+            HitRollup.objects.bulk_create(
+                days,
+                batch_size=5000,
+                update_conflicts=True,
+                unique_fields=["kind", "object_id", "period", "bucket"],
+                update_fields=ROLLUP_FIELDS,
+            )
+            for kind, counts in views.items():
+                add_hit_counts(kind, counts)
+    except IntegrityError:
+        logger.warning("Hits from %s to %s are already rolled up", start, end)
+        return 0
+    return len(hours)
+
+
+def delete_in_chunks(queryset):
+    """
+    Delete the rows of `queryset` in chunks of HIT_PURGE_CHUNK_SIZE. A chunk
+    is locked, skipping rows a hit writer holds, and deleted with the
+    conditions of `queryset` checked again, so a visitor that got new hits
+    meanwhile is kept with them.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.select_for_update(skip_locked=True, of=("self",))
+                .order_by()
+                .values_list("pk", flat=True)[: settings.HIT_PURGE_CHUNK_SIZE]
+            )
+            if not ids:
+                return deleted
+            deleted += queryset.filter(pk__in=ids).delete()[0]
+
+
+def complete_days_until():
+    """
+    Start of the first day whose rollup may still change: daily rollups are
+    recomputed from the raw hits of that day, which must all be kept. None
+    before the first rollup.
+    """
+    rolled_up = rolled_up_until()
+    return rolled_up and floor_day(rolled_up)
+
+
+def retention_cutoff(now=None):
+    """
+    Raw hits created before this are past retention and their days rolled
+    up, None before the first rollup.
+    """
+    complete = complete_days_until()
+    if complete is None:
+        return None
+    return min(
+        (now or timezone.now()) - timedelta(days=settings.HIT_RETENTION_DAYS),
+        complete,
+    )
+
+
+def purge_raw_hits(now=None):
+    """
+    Delete rolled up raw hits older than HIT_RETENTION_DAYS, then the
+    visitors left without hits. Returns the number of rows deleted.
+    """
+    cutoff = retention_cutoff(now)
+    if cutoff is None:
+        return 0
+    deleted = sum(
+        delete_in_chunks(model.objects.filter(created__lt=cutoff))
+        for model, *_ in SOURCES.values()
+    )
+    return deleted + delete_in_chunks(
+        HitDetail.objects.filter(
+            created__lt=cutoff, coursehit__isnull=True, articlehit__isnull=True
+        )
+    )
@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .curriculum import invalidate_curriculum
+from .models import (
+    Audience,
+    Category,
+    Course,
+    CourseAudience,
+    CourseContent,
+    CourseReviewRating,
+    CourseStats,
+    CourseTag,
+    CourseWeek,
+    Member,
+    Tag,
+    TeacherReviewRating,
+    TeacherStats,
+    WeeklyCourseContent,
+)
+
+
+def deleted_with_course(origin):
+    """
+    Whether a cascade delete started from the course (or its category),
+    in which case the stats row is deleted along with it.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Course, Category)
+
+
+def deleted_with_user(origin, user_id):
+    """
+    Whether a cascade delete started from the given user, whose stats row
+    goes with it.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is get_user_model()
+    return isinstance(origin, get_user_model()) and origin.pk == user_id
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(post_save, sender=CourseReviewRating)
+def update_course_rating_on_save(sender, instance, **kwargs):
+    CourseStats.refresh_ratings(instance.course_id)
+
+
+@receiver(post_delete, sender=CourseReviewRating)
+def update_course_rating_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_course(origin):
+        return
+    CourseStats.refresh_ratings(instance.course_id)
+
+
+@receiver(post_save, sender=TeacherReviewRating)
+def update_teacher_stats_on_review_save(sender, instance, **kwargs):
+    TeacherStats.queue_refresh([instance.teacher_id])
+
+
+@receiver(post_delete, sender=TeacherReviewRating)
+def update_teacher_stats_on_review_delete(sender, instance, origin=None, **kwargs):
+    if not deleted_with_user(origin, instance.teacher_id):
+        TeacherStats.queue_refresh([instance.teacher_id])
+
+
+@receiver(post_save, sender=Course)
+def update_teacher_stats_on_course_save(sender, instance, created, **kwargs):
+    if created:
+        TeacherStats.queue_refresh([instance.owner_id])
+    else:
+        TeacherStats.queue_refresh(TeacherStats.teachers_of([instance.pk]))
+
+
+@receiver(post_delete, sender=Course)
+def update_teacher_stats_on_course_delete(sender, instance, **kwargs):
+    TeacherStats.queue_refresh([instance.owner_id])
+
+
+@receiver(post_save, sender=Member)
+def update_teacher_stats_on_member_save(sender, instance, **kwargs):
+    TeacherStats.queue_refresh([instance.member_id])
+
+
+@receiver(post_delete, sender=Member)
+def update_teacher_stats_on_member_delete(sender, instance, origin=None, **kwargs):
+    if not deleted_with_user(origin, instance.member_id):
+        TeacherStats.queue_refresh([instance.member_id])
+
+
+@receiver(post_save, sender=Category)
+def update_course_search_on_category_save(sender, instance, created, **kwargs):
+    if not created:
+        Course.update_search_vectors(category_id=instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def update_course_search_on_teacher_save(sender, instance, created, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    Course.update_search_vectors(owner_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CourseWeek)
+@receiver([post_save, post_delete], sender=CourseTag)
+@receiver([post_save, post_delete], sender=CourseAudience)
+def invalidate_curriculum_of_course(sender, instance, **kwargs):
+    invalidate_curriculum(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=WeeklyCourseContent)
+def invalidate_curriculum_of_week(sender, instance, **kwargs):
+    invalidate_curriculum(
+        *CourseWeek.objects.filter(pk=instance.course_week_id).values_list(
+            "course_id", flat=True
+        )
+    )
+
+
+@receiver([post_save, post_delete], sender=CourseContent)
+def invalidate_curriculum_of_content(sender, instance, **kwargs):
+    invalidate_curriculum(
+        instance.course_id,
+        *CourseWeek.objects.filter(
+            weekly_course_contents__content_id=instance.pk
+        ).values_list("course_id", flat=True),
+    )
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_curriculum_of_tag(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_curriculum(
+            *CourseTag.objects.filter(tag=instance).values_list("course_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Audience)
+def invalidate_curriculum_of_audience(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_curriculum(
+            *CourseAudience.objects.filter(audience=instance).values_list(
+                "course_id", flat=True
+            )
+        )
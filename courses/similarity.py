@@ -0,0 +1,119 @@
+"""
+Offline related-courses index.
+
+Each active course is scored against the others by
+  TAG_WEIGHT * Jaccard(tags + category) + ENROLLMENT_WEIGHT * cosine(students)
+and its best `limit` neighbours are stored as `RelatedCourse` rows.
+
+Both similarities are sparse row-by-row products computed through inverted
+indexes (feature -> courses, student -> courses), so only course pairs that
+share a tag, the category or a student are ever looked at.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from enroll.models import EnrolledCourse
+
+from .models import Course, CourseTag, RelatedCourse
+
+
+def invert(sets_by_course):
+    index = defaultdict(list)
+    for course_id, items in sets_by_course.items():
+        for item in items:
+            index[item].append(course_id)
+    return index
+
+
+def overlaps(course_id, items, index):
+    """
+    |items(course) & items(other)| for every other course sharing an item.
+    """
+    counts = Counter()
+    for item in items:
+        counts.update(index[item])
+    counts.pop(course_id, None)
+    return counts
+
+
+def jaccard_scores(course_id, sets_by_course, index):
+    items = sets_by_course.get(course_id, ())
+    return {
+        other: shared / (len(items) + len(sets_by_course[other]) - shared)
+        for other, shared in overlaps(course_id, items, index).items()
+    }
+
+
+def cosine_scores(course_id, sets_by_course, index):
+    items = sets_by_course.get(course_id, ())
+    return {
+        other: shared / math.sqrt(len(items) * len(sets_by_course[other]))
+        for other, shared in overlaps(course_id, items, index).items()
+    }
+
+
+def course_features(course_ids):
+    features = {
+        course_id: {("category", category_id)}
+        for course_id, category_id in Course.objects.filter(
+            pk__in=course_ids
+        ).values_list("pk", "category_id")
+    }
+    for course_id, tag_id in CourseTag.objects.filter(
+        course_id__in=course_ids
+    ).values_list("course_id", "tag_id"):
+        features[course_id].add(("tag", tag_id))
+    return features
+
+
+def course_students(course_ids):
+    students = defaultdict(set)
+    enrollments = EnrolledCourse.objects.filter(course_id__in=course_ids).values_list(
+        "course_id", "student_id"
+    )
+    for course_id, student_id in enrollments.iterator(chunk_size=10_000):
+        students[course_id].add(student_id)
+    return students
+
+
+def related_courses(limit=None):
+    """
+    {course_id: [(related_id, score), ...]} for every active course, best first.
+    """
+    limit = limit or settings.RELATED_COURSES_LIMIT
+    course_ids = set(Course.objects.filter(is_active=True).values_list("pk", flat=True))
+    features = course_features(course_ids)
+    students = course_students(course_ids)
+    feature_index = invert(features)
+    student_index = invert(students)
+
+    related = {}
+    for course_id in course_ids:
+        scores = Counter()
+        for other, score in jaccard_scores(course_id, features, feature_index).items():
+            scores[other] += settings.RELATED_COURSES_TAG_WEIGHT * score
+        for other, score in cosine_scores(course_id, students, student_index).items():
+            scores[other] += settings.RELATED_COURSES_ENROLLMENT_WEIGHT * score
+        related[course_id] = heapq.nlargest(
+            limit, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+    return related
+
+
+def build_related_courses(limit=None):
+    """
+    Replace the stored index in one transaction. Returns the number of rows.
+    """
+    rows = [
+        RelatedCourse(course_id=course_id, related_id=other, score=score, rank=rank)
+        for course_id, neighbours in related_courses(limit).items()
+        for rank, (other, score) in enumerate(neighbours, start=1)
+    ]
+    with transaction.atomic():
+        RelatedCourse.objects.all().delete()
+        RelatedCourse.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
@@ -1,7 +1,13 @@
 from celery import shared_task
+from django.conf import settings
 from django.db.models import Count, Q
 
-from courses.models import Course
+from courses.archive import archive_hits
+from courses.hits import get_hit_buffer, write_hits
+from courses.rollups import purge_raw_hits, retention_cutoff, rollup_hits
+from courses.recommendations import build_recommendations, refresh_recommendations
+from courses.similarity import build_related_courses
+from courses.models import Course, Member, TeacherReviewRating, TeacherStats
 from enroll.models import EnrolledCourse
 
 # """
@@ -35,3 +41,91 @@ from enroll.models import EnrolledCourse
 #         return f"{(rating_count.r_count / rating_count.total_count) * 100:.2f}"
 #     except ZeroDivisionError:
 #         return 0
+
+
+@shared_task
+def record_hits(events):
+    """
+    Write a batch of buffered hit events.
+    """
+    write_hits(events)
+
+
+@shared_task
+def drain_hit_buffer():
+    """
+    Periodically flush the shared (Redis) hit buffer in batches. Memory
+    buffers live in the web processes and flush themselves.
+    """
+    if settings.HIT_BUFFER_BACKEND != "redis":
+        return
+    buffer = get_hit_buffer()
+    while events := buffer.pop(settings.HIT_FLUSH_BATCH_SIZE):
+        write_hits(events)
+
+
+@shared_task
+def rollup_and_purge_hits():
+    """
+    Roll up the raw hits of the past hours, then purge those past retention,
+    archiving them first if HIT_ARCHIVE_DIR is set.
+    """
+    rolled = rollup_hits()
+    if settings.HIT_ARCHIVE_DIR:
+        archive_old_hits()
+    return rolled, purge_raw_hits()
+
+
+@shared_task
+def archive_old_hits():
+    """
+    Move the raw hits past retention to compressed files in HIT_ARCHIVE_DIR.
+    """
+    return archive_hits(settings.HIT_ARCHIVE_DIR, retention_cutoff())
+
+
+@shared_task
+def rebuild_related_courses():
+    """
+    Recompute the related-courses index.
+    """
+    return build_related_courses()
+
+
+@shared_task
+def rebuild_recommendations():
+    """
+    Recompute co-enrollment recommendations for every course and student.
+    """
+    return build_recommendations()
+
+
+@shared_task
+def refresh_student_recommendations(student_id, course_ids):
+    """
+    Refresh recommendations after a student enrolls in `course_ids`.
+    """
+    refresh_recommendations(student_id, course_ids)
+
+
+@shared_task
+def refresh_teacher_stats(teacher_ids):
+    """
+    Recompute the stats of the teachers concerned by a write.
+    """
+    TeacherStats.refresh(teacher_ids)
+
+
+@shared_task
+def rebuild_teacher_stats():
+    """
+    Recompute the stats of every teacher, picking up hits and any change
+    the queued refreshes missed.
+    """
+    teacher_ids = (
+        set(Course.objects.values_list("owner_id", flat=True))
+        | set(Member.objects.values_list("member_id", flat=True))
+        | set(TeacherReviewRating.objects.values_list("teacher_id", flat=True))
+    )
+    TeacherStats.refresh(teacher_ids)
+    return len(teacher_ids)
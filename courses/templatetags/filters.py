@@ -1,8 +1,7 @@
 from django import template
-from django.db.models import Count, Q
 
-from courses.models import Course
-from enroll.models import EnrolledCourse
+from courses.models import CourseStats
+from utils.search import highlight
 
 # from courses.tasks import astudent_count, adetailed_rating
 
@@ -16,15 +15,12 @@ def currency(price):
 
 @register.filter(name="is_in_cart")
 def is_in_cart(course, cart):
-    for id in cart.keys():  # sourcery skip
-        if int(id) == course.id:
-            return True
-    return False
+    return course in cart
 
 
 @register.filter(name="quantity_in_cart")
 def quantity_in_cart(course, cart):
-    return next((cart.get(id) for id in cart.keys() if int(id) == course.id), 0)
+    return int(course in cart)
 
 
 @register.filter(name="total_amount")
@@ -33,14 +29,27 @@ def total_amount(total):
 
 
 @register.filter("student_count")
-def student_count(course_id):
+def student_count(course):
     """
-    Count number of students  based on the enrolled course.
+    Number of students enrolled in the course, read from `CourseStats`.
+    Select the `stats` relation along with the courses of a page so that
+    every card reads its count without a query.
     """
-    s_count = EnrolledCourse.objects.filter(pk=course_id).aggregate(
-        student_count=Count("student")
-    )
-    return s_count["student_count"]
+    try:
+        return course.stats.student_count
+    except CourseStats.DoesNotExist:
+        return 0
+
+
+@register.filter("hit_count")
+def hit_count(course):
+    """
+    Views of the course, read from `CourseStats` like `student_count`.
+    """
+    try:
+        return course.stats.hit_count
+    except CourseStats.DoesNotExist:
+        return 0
 
 
 @register.filter("already_enrolled")
@@ -55,17 +64,28 @@ def already_enrolled(course, user):
 
 
 @register.filter(name="detailed_rating")
-def detailed_rating(course_id, rating):
+def detailed_rating(course, rating):
     """
-    Detailed rating for each course.
+    Percentage of a course's reviews with the given rating.
+    Reads the precomputed `CourseStats`, so select_related("stats") makes it free.
     """
     try:
-        rating_count = Course.objects.annotate(
-            r_count=Count(
-                "course_reviews__rating", filter=Q(course_reviews__rating__exact=rating)
-            ),
-            total_count=Count("course_reviews__rating"),
-        ).get(pk=course_id)
-        return f"{(rating_count.r_count / rating_count.total_count) * 100:.2f}"
-    except ZeroDivisionError:
+        return f"{course.stats.star_percentage(rating):.2f}"
+    except CourseStats.DoesNotExist:
         return 0
+
+
+@register.filter(name="highlight")
+def highlight_matches(headline):
+    return highlight(headline)
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, cursor):
+    """
+    Current query string pointing at another page of a cursor-paginated list.
+    """
+    query = context["request"].GET.copy()
+    query.pop("page", None)
+    query["cursor"] = cursor
+    return f"?{query.urlencode()}"
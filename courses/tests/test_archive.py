@@ -0,0 +1,148 @@
+import csv
+import gzip
+import tempfile
+from datetime import date, datetime
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from blog.models import Article, ArticleHit
+from courses.archive import ArchiveError, archive_hits, load_archive
+from courses.models import Category, Course, CourseHit, HitDetail
+from courses.rollups import rollup_hits
+
+User = get_user_model()
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2026, 3, day, hour, minute))
+
+
+@override_settings(HIT_PURGE_CHUNK_SIZE=2)
+class HitArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.course = Course.objects.create(
+            owner=teacher,
+            title="Test Course",
+            category=Category.objects.create(title="Test category"),
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.article = Article.objects.create(
+            title="Article title", content="The content of the article."
+        )
+        self.hit(at(1, 9), "10.0.0.1")
+        self.hit(at(1, 10), "10.0.0.2", article=True)
+        self.hit(at(2, 23, 30), "10.0.0.3")
+        # a visitor from the 1st still seen on the 10th is kept
+        self.hit(at(10, 9), "10.0.0.2")
+        rollup_hits(now=at(10, 12))
+
+    def hit(self, created, ip, article=False):
+        detail, _ = HitDetail.objects.get_or_create(ip=ip)
+        HitDetail.objects.filter(pk=detail.pk, created__gt=created).update(
+            created=created
+        )
+        if article:
+            hit = ArticleHit.objects.create(article=self.article, hit=detail)
+        else:
+            hit = CourseHit.objects.create(course=self.course, hit=detail)
+        type(hit).objects.filter(pk=hit.pk).update(created=created)
+
+    def files(self):
+        root = Path(self.directory.name)
+        return sorted(str(path.relative_to(root).parent) for path in root.rglob("*.gz"))
+
+    def test_archives_old_rows_by_day_and_deletes_them(self):
+        self.assertEqual(archive_hits(self.directory.name, at(5, 0)), 5)
+        self.assertEqual(
+            self.files(),
+            [
+                "article_hits/date=2026-03-01",
+                "course_hits/date=2026-03-01",
+                "course_hits/date=2026-03-02",
+                "hits/date=2026-03-01",
+                "hits/date=2026-03-02",
+            ],
+        )
+        self.assertEqual(CourseHit.objects.count(), 1)
+        self.assertFalse(ArticleHit.objects.exists())
+        self.assertEqual(
+            list(HitDetail.objects.values_list("ip", flat=True)), ["10.0.0.2"]
+        )
+        [path] = Path(self.directory.name, "course_hits", "date=2026-03-01").iterdir()
+        with gzip.open(path, "rt", newline="") as text:
+            header, row = csv.reader(text)
+        self.assertEqual(
+            header, ["id", "created", "updated", "course_id", "hit_id", "view_window"]
+        )
+        self.assertEqual(row[3], str(self.course.pk))
+
+    def test_hits_of_days_not_rolled_up_are_kept(self):
+        self.hit(at(10, 13), "10.0.0.4")
+        archive_hits(self.directory.name, at(11, 0))
+        self.assertEqual(
+            list(
+                CourseHit.objects.order_by("created").values_list("created", flat=True)
+            ),
+            [at(10, 9), at(10, 13)],
+        )
+
+    def test_count_mismatch_deletes_nothing(self):
+        with mock.patch("courses.archive.count_rows", return_value=0):
+            with self.assertRaises(ArchiveError):
+                archive_hits(self.directory.name, at(5, 0))
+        self.assertEqual(CourseHit.objects.count(), 3)
+        self.assertEqual(self.files(), [])
+
+    def test_load_archive_window(self):
+        archive_hits(self.directory.name, at(5, 0))
+        self.assertEqual(
+            load_archive(self.directory.name, date(2026, 3, 2), date(2026, 3, 9)), 2
+        )
+        load_archive(self.directory.name, date(2026, 3, 1), date(2026, 3, 1))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ip, os_type FROM archived_hits ORDER BY ip")
+            self.assertEqual(
+                cursor.fetchall(),
+                [("10.0.0.1", ""), ("10.0.0.3", "")],
+            )
+            cursor.execute("SELECT count(*) FROM archived_course_hits")
+            self.assertEqual(cursor.fetchone(), (2,))
+        self.assertEqual(
+            load_archive(
+                self.directory.name, date(2026, 3, 1), date(2026, 3, 1), replace=True
+            ),
+            3,
+        )
+
+    def test_commands(self):
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("archive_hits", dir="")
+        with self.assertRaises(CommandError):
+            call_command("archive_hits", dir=self.directory.name, days=0)
+        call_command("archive_hits", dir=self.directory.name, days=1, stdout=out)
+        self.assertIn("Archived 5 rows", out.getvalue())
+        call_command(
+            "load_hit_archive", "2026-03-01", dir=self.directory.name, stdout=out
+        )
+        self.assertIn("Loaded 3 rows", out.getvalue())
@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.curriculum import get_curriculum
+from courses.models import (
+    Audience,
+    Category,
+    Course,
+    CourseAudience,
+    CourseContent,
+    CourseTag,
+    CourseWeek,
+    Tag,
+    WeeklyCourseContent,
+)
+
+User = get_user_model()
+
+
+class CurriculumSnapshotTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.category = Category.objects.create(title="Test category")
+        self.course = Course.objects.create(
+            owner=self.teacher,
+            title="Test Course",
+            category=self.category,
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+            thumbnail="courses/thumbnails/course_img.png",
+        )
+        self.week_1 = CourseWeek.objects.create(course=self.course, week="1")
+        self.week_2 = CourseWeek.objects.create(course=self.course, week="2")
+        self.video = CourseContent.objects.create(
+            course=self.course,
+            title="Introduction",
+            content_type=CourseContent.ContentType.VIDEO,
+            length=15,
+            questions=2,
+        )
+        self.reading = CourseContent.objects.create(
+            course=self.course, title="Setup", length=10, questions=3
+        )
+        WeeklyCourseContent.objects.create(course_week=self.week_1, content=self.video)
+        WeeklyCourseContent.objects.create(
+            course_week=self.week_1, content=self.reading
+        )
+        self.tag = Tag.objects.create(title="Test tag")
+        CourseTag.objects.create(course=self.course, tag=self.tag)
+        CourseAudience.objects.create(
+            course=self.course, audience=Audience.objects.create(name="Beginners")
+        )
+        cache.clear()
+
+    def curriculum(self):
+        return get_curriculum(Course.objects.get(pk=self.course.pk))
+
+    def test_compiles_weeks_contents_and_totals(self):
+        curriculum = self.curriculum()
+        self.assertEqual([week["week"] for week in curriculum["weeks"]], ["1", "2"])
+        week_1 = curriculum["weeks"][0]
+        self.assertEqual(
+            [content["title"] for content in week_1["contents"]],
+            ["Introduction", "Setup"],
+        )
+        self.assertEqual((week_1["length"], week_1["questions"]), (25, 5))
+        self.assertEqual(curriculum["weeks"][1]["contents"], [])
+        self.assertEqual(curriculum["length"], 25)
+        self.assertEqual(curriculum["contents"], 2)
+        self.assertEqual(curriculum["content_types"], {"VIDEO": 1, "READING": 1})
+        self.assertEqual(
+            curriculum["tags"],
+            [{"title": "Test tag", "url": self.tag.get_absolute_url()}],
+        )
+        self.assertEqual(curriculum["audience"], ["Beginners"])
+
+    def test_snapshot_is_read_from_cache(self):
+        get_curriculum(self.course)
+        with self.assertNumQueries(0):
+            get_curriculum(self.course)
+
+    def test_changes_are_seen_without_deleting_cache_keys(self):
+        self.curriculum()
+        with mock.patch.object(cache, "delete_many") as delete_many:
+            self.video.length = 45
+            self.video.save()
+        delete_many.assert_not_called()
+        self.assertEqual(self.curriculum()["length"], 55)
+
+    def test_content_change_invalidates_snapshot(self):
+        self.curriculum()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.length = 45
+            self.video.save()
+        self.assertEqual(self.curriculum()["length"], 55)
+
+    def test_weekly_content_change_invalidates_snapshot(self):
+        self.curriculum()
+        with self.captureOnCommitCallbacks(execute=True):
+            WeeklyCourseContent.objects.create(
+                course_week=self.week_2, content=self.reading
+            )
+        self.assertEqual(len(self.curriculum()["weeks"][1]["contents"]), 1)
+
+    def test_tag_changes_invalidate_snapshot(self):
+        self.curriculum()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.title = "Renamed tag"
+            self.tag.save()
+        self.assertEqual(self.curriculum()["tags"][0]["title"], "Renamed tag")
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseTag.objects.filter(course=self.course).delete()
+        self.assertEqual(self.curriculum()["tags"], [])
+
+    def test_course_detail_renders_snapshot(self):
+        url = reverse("course_detail", kwargs={"course_slug": self.course.slug})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.context["curriculum"]["contents"], 2)
+        self.assertContains(response, "Introduction")
+        self.assertContains(response, "Beginners")
+        self.assertContains(response, "(25 minutes)")
@@ -0,0 +1,440 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+import redis
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Article, ArticleHit
+from courses.hits import (
+    ARTICLE,
+    COURSE,
+    MemoryHitBuffer,
+    bot_hit_count,
+    bot_hits_key,
+    dispatch_hits,
+    get_hit_buffer,
+    is_bot,
+    record_hit,
+    upsert_visitors,
+    view_window,
+    write_hits,
+)
+from courses.models import Category, Course, CourseHit, HitDetail, HitRollup
+from courses.rollups import delete_in_chunks
+
+User = get_user_model()
+
+CHROME = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
+)
+GOOGLEBOT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+
+class CounterRedis:
+    """
+    The INCR, EXPIRE and GET of a Redis client, for counting crawler hits.
+    """
+
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self):
+        return []
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+
+class HitPipelineTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.category = Category.objects.create(title="Test category")
+        self.course = Course.objects.create(
+            owner=self.teacher,
+            title="Test Course",
+            category=self.category,
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+            thumbnail="courses/thumbnails/course_img.png",
+        )
+        self.article = Article.objects.create(
+            title="Article title",
+            content="The content of the article.",
+            thumbnail="blog/images/default.jpeg",
+        )
+        self.factory = RequestFactory()
+        # start every test with an empty buffer and no views seen
+        get_hit_buffer().pop(10_000)
+        patcher = mock.patch("courses.hits._view_filter", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, kind, object_id, ip="10.0.0.1", ts=None):
+        event = {"kind": kind, "id": object_id, "ip": ip, "ua": CHROME}
+        if ts is not None:
+            event["ts"] = ts
+        return event
+
+    def test_record_hit_does_not_touch_the_database(self):
+        request = self.factory.get("/", HTTP_USER_AGENT=CHROME, REMOTE_ADDR="10.0.0.9")
+        with self.assertNumQueries(0), mock.patch(
+            "courses.hits.time.time", return_value=1_000_000
+        ):
+            record_hit(request, COURSE, self.course.pk)
+        self.assertEqual(
+            get_hit_buffer().pop(10),
+            [self.event(COURSE, self.course.pk, "10.0.0.9", ts=1_000_000)],
+        )
+
+    def test_course_detail_buffers_hit(self):
+        self.client.get(
+            reverse("course_detail", kwargs={"course_slug": self.course.slug}),
+            HTTP_USER_AGENT=CHROME,
+        )
+        self.assertFalse(HitDetail.objects.exists())
+        events = get_hit_buffer().pop(10)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["kind"], COURSE)
+        self.assertEqual(events[0]["id"], self.course.pk)
+
+    @override_settings(HIT_BOT_IP_RANGES=["192.0.2.0/24", "2001:db8::/32"])
+    def test_record_hit_drops_bots(self):
+        counter = CounterRedis()
+        patcher = mock.patch("courses.hits._bot_counter", counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for ip, user_agent in [
+            ("10.0.0.1", GOOGLEBOT),
+            ("10.0.0.1", "python-requests/2.28.1"),
+            ("10.0.0.1", ""),
+            ("192.0.2.15", CHROME),
+            ("2001:db8::1", CHROME),
+        ]:
+            request = self.factory.get("/", HTTP_USER_AGENT=user_agent, REMOTE_ADDR=ip)
+            with self.assertNumQueries(0):
+                record_hit(request, COURSE, self.course.pk)
+        self.assertEqual(get_hit_buffer().pop(10), [])
+        self.assertEqual(bot_hit_count(), 5)
+        self.assertEqual(counter.ttls, {bot_hits_key(timezone.localdate()): 604_800})
+
+        self.assertFalse(is_bot("198.51.100.1", CHROME))
+        self.assertFalse(is_bot("unknown", CHROME))
+
+    def test_unreachable_bot_counter_does_not_fail_the_request(self):
+        counter = mock.Mock()
+        counter.pipeline.side_effect = redis.ConnectionError
+        request = self.factory.get("/", HTTP_USER_AGENT=GOOGLEBOT)
+        with mock.patch("courses.hits._bot_counter", counter):
+            with self.assertLogs("courses.hits", "WARNING"):
+                record_hit(request, COURSE, self.course.pk)
+
+    def test_write_hits_creates_rows_in_bulk(self):
+        events = [
+            self.event(COURSE, self.course.pk),
+            self.event(COURSE, self.course.pk),
+            self.event(ARTICLE, self.article.pk),
+            self.event(COURSE, self.course.pk, ip="10.0.0.2"),
+        ]
+        write_hits(events)
+        self.assertEqual(HitDetail.objects.count(), 2)
+        self.assertEqual(CourseHit.objects.filter(course=self.course).count(), 2)
+        self.assertEqual(ArticleHit.objects.filter(article=self.article).count(), 1)
+        hit = HitDetail.objects.get(ip="10.0.0.1")
+        self.assertEqual(hit.browser_type, "Chrome")
+        self.assertEqual(hit.os_type, "Linux")
+
+    def test_write_hits_skips_repeat_views_without_queries(self):
+        write_hits([self.event(COURSE, self.course.pk)])
+        with self.assertNumQueries(0):
+            write_hits([self.event(COURSE, self.course.pk)])
+        self.assertEqual(HitDetail.objects.count(), 1)
+        self.assertEqual(CourseHit.objects.count(), 1)
+
+    def test_views_count_again_after_the_window(self):
+        with mock.patch("utils.bloom.time.time", return_value=1_000_000):
+            write_hits([self.event(COURSE, self.course.pk)])
+        with mock.patch("utils.bloom.time.time", return_value=1_000_000 + 86_400):
+            write_hits([self.event(COURSE, self.course.pk)])
+            write_hits([self.event(COURSE, self.course.pk)])
+        self.assertEqual(HitDetail.objects.count(), 1)
+        self.assertEqual(CourseHit.objects.count(), 2)
+
+    @override_settings(HIT_UNIQUE_VIEW_WINDOW=None)
+    def test_write_hits_counts_visitors_once_without_window(self):
+        write_hits([self.event(COURSE, self.course.pk)])
+        with self.assertNumQueries(6):
+            # rolled up hours, then in a savepoint known hits, existing courses
+            # and course hits only
+            write_hits([self.event(COURSE, self.course.pk)])
+        self.assertEqual(CourseHit.objects.count(), 1)
+
+    @override_settings(HIT_UNIQUE_VIEW_WINDOW=0)
+    def test_write_hits_counts_every_view_with_zero_window(self):
+        write_hits([self.event(COURSE, self.course.pk)] * 2)
+        write_hits([self.event(COURSE, self.course.pk)])
+        self.assertEqual(CourseHit.objects.count(), 3)
+
+    def test_buffered_hits_keep_the_time_they_were_recorded(self):
+        recorded = time.time() - 2 * 86_400
+        write_hits(
+            [
+                self.event(COURSE, self.course.pk, ts=recorded),
+                self.event(COURSE, self.course.pk, ts=recorded + 86_400),
+                self.event(ARTICLE, self.article.pk, ts=recorded),
+            ]
+        )
+        self.assertEqual(
+            list(
+                CourseHit.objects.order_by("created").values_list(
+                    "created", "updated", "view_window"
+                )
+            ),
+            [
+                (
+                    datetime.fromtimestamp(ts, dt_timezone.utc),
+                    datetime.fromtimestamp(ts, dt_timezone.utc),
+                    view_window(ts),
+                )
+                for ts in (recorded, recorded + 86_400)
+            ],
+        )
+        self.assertEqual(
+            ArticleHit.objects.get().created,
+            datetime.fromtimestamp(recorded, dt_timezone.utc),
+        )
+        self.assertEqual(
+            HitDetail.objects.get().created,
+            datetime.fromtimestamp(recorded, dt_timezone.utc),
+        )
+
+    def test_hits_of_rolled_up_hours_are_dated_after_them(self):
+        rolled_up = timezone.now().replace(minute=0, second=0, microsecond=0)
+        HitRollup.objects.create(
+            kind=COURSE,
+            object_id=self.course.pk,
+            period=HitRollup.HOUR,
+            bucket=rolled_up - timedelta(hours=1),
+        )
+        recorded = time.time() - 3 * 3600
+        write_hits([self.event(COURSE, self.course.pk, ts=recorded)])
+        hit = CourseHit.objects.get()
+        self.assertEqual(hit.created, rolled_up)
+        self.assertEqual(hit.view_window, view_window(recorded))
+
+    def test_write_hits_ignores_deleted_objects(self):
+        course_id = self.course.pk
+        self.course.delete()
+        write_hits([self.event(COURSE, course_id)])
+        self.assertFalse(CourseHit.objects.exists())
+
+    def memory_buffer(self, max_size, max_age, dispatched=True):
+        buffer = MemoryHitBuffer(max_size=max_size, max_age=max_age)
+        self.addCleanup(buffer.pop, 10_000)
+        done = threading.Event()
+
+        def dispatch_hits(events):
+            done.set()
+            return dispatched
+
+        patcher = mock.patch("courses.hits.dispatch_hits", side_effect=dispatch_hits)
+        self.dispatch_hits = patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer, done
+
+    def test_memory_buffer_dispatches_when_full(self):
+        buffer, dispatched = self.memory_buffer(max_size=3, max_age=60)
+        buffer.push(self.event(COURSE, 1))
+        buffer.push(self.event(COURSE, 2))
+        self.assertFalse(dispatched.wait(0.1))
+        buffer.push(self.event(COURSE, 3))
+        self.assertTrue(dispatched.wait(5))
+        self.dispatch_hits.assert_called_once()
+        self.assertEqual(len(self.dispatch_hits.call_args.args[0]), 3)
+        self.assertEqual(len(buffer), 0)
+
+    def test_memory_buffer_dispatches_when_stale_without_more_pushes(self):
+        buffer, dispatched = self.memory_buffer(max_size=100, max_age=0.05)
+        buffer.push(self.event(COURSE, 1))
+        self.assertTrue(dispatched.wait(5))
+        self.assertEqual(self.dispatch_hits.call_args.args[0], [self.event(COURSE, 1)])
+
+    def test_memory_buffer_keeps_hits_the_broker_did_not_take(self):
+        buffer, _ = self.memory_buffer(max_size=100, max_age=60, dispatched=False)
+        buffer.max_batches = 1
+        events = [self.event(COURSE, i) for i in range(101)]
+        with mock.patch("courses.hits.write_hits") as write_hits:
+            for event in events[:2]:
+                buffer.push(event)
+            buffer.flush()
+            buffer.push(events[2])
+        write_hits.assert_not_called()
+        self.assertEqual(buffer.pop(3), events[:3])
+        with self.assertLogs("courses.hits", "WARNING"):
+            buffer.restore(events)
+        self.assertEqual(buffer.pop(200), events[1:])
+
+    def test_dispatch_does_not_write_hits_when_the_broker_is_down(self):
+        with mock.patch(
+            "courses.tasks.record_hits.delay", side_effect=ConnectionError
+        ), mock.patch("courses.hits.write_hits") as write_hits:
+            with self.assertLogs("courses.hits", "ERROR"):
+                self.assertFalse(dispatch_hits([self.event(COURSE, 1)]))
+        write_hits.assert_not_called()
+
+
+@override_settings(HIT_UNIQUE_VIEW_WINDOW=None)
+class ConcurrentHitTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        # these transactions commit, keep the teacher stats refresh off the broker
+        patcher = mock.patch("courses.tasks.refresh_teacher_stats.delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.course = Course.objects.create(
+            owner=User.objects.create_user(
+                name="test teacher",
+                username="testteacher",
+                email="test@teacher.com",
+                password="secret",
+                is_student=False,
+            ),
+            title="Test Course",
+            category=Category.objects.create(title="Test category"),
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.article = Article.objects.create(
+            title="Article title", content="The content of the article."
+        )
+
+    def test_parallel_first_visits_create_one_row_each(self):
+        events = [
+            {"kind": kind, "id": object_id, "ip": "10.0.0.1", "ua": CHROME}
+            for kind, object_id in (
+                (COURSE, self.course.pk),
+                (ARTICLE, self.article.pk),
+            )
+        ]
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def visit():
+            try:
+                barrier.wait()
+                write_hits(events)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=visit) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(HitDetail.objects.count(), 1)
+        self.assertEqual(CourseHit.objects.count(), 1)
+        self.assertEqual(ArticleHit.objects.count(), 1)
+
+    def test_batches_of_the_same_visitors_in_any_order_do_not_deadlock(self):
+        events = [
+            {"kind": COURSE, "id": self.course.pk, "ip": f"10.0.0.{i}", "ua": CHROME}
+            for i in range(50)
+        ]
+        write_hits(events)
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def visit(batch):
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    write_hits(batch)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=visit, args=(events[:: 1 if i % 2 else -1],))
+            for i in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(CourseHit.objects.count(), 50)
+
+    def test_purge_keeps_visitors_being_written(self):
+        detail = HitDetail.objects.create(ip="10.0.0.1")
+        orphans = HitDetail.objects.filter(
+            coursehit__isnull=True, articlehit__isnull=True
+        )
+        event = {"kind": COURSE, "id": self.course.pk, "ip": "10.0.0.1", "ua": CHROME}
+        locked, purged = threading.Event(), threading.Event()
+
+        def upsert_and_wait(events, created):
+            hit_ids = upsert_visitors(events, created)
+            locked.set()
+            purged.wait(5)
+            return hit_ids
+
+        def write():
+            try:
+                with mock.patch(
+                    "courses.hits.upsert_visitors", side_effect=upsert_and_wait
+                ):
+                    write_hits([event])
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        self.assertTrue(locked.wait(5))
+        self.assertEqual(delete_in_chunks(orphans), 0)
+        purged.set()
+        thread.join()
+        self.assertEqual(CourseHit.objects.get().hit_id, detail.pk)
+        self.assertEqual(delete_in_chunks(orphans), 0)
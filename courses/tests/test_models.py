@@ -1,8 +1,20 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 from django.test import TestCase
 
-from courses.models import Category, Course, Tag
+from courses.models import (
+    Category,
+    Course,
+    CourseReviewRating,
+    CourseStats,
+    Member,
+    Tag,
+    TeacherReviewRating,
+    TeacherStats,
+)
+from enroll.models import EnrolledCourse, Enrollment
 
 User = get_user_model()
 
@@ -168,4 +180,282 @@ class CourseModelTests(TestCase):
         self.assertNotEqual(len(course_qs_2), len(Course.objects.all()))
 
 
+class CourseStatsModelTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            name="testuser",
+            email="testuser@mail.com",
+            username="testuer",
+            password="secret",
+        )
+        self.students = [
+            User.objects.create_user(
+                name=f"student {i}",
+                email=f"student{i}@mail.com",
+                username=f"student{i}",
+                password="secret",
+            )
+            for i in range(3)
+        ]
+        self.category = Category.objects.create(title="Test Category")
+        self.course = Course.objects.create(
+            owner=self.owner,
+            title="Test Course",
+            category=self.category,
+            overview="The overview of test course.",
+            language="English",
+            old_price=100,
+            price=95,
+            thumbnail="courses/thumbnails/course_img.png",
+        )
+
+    def review(self, student, rating, is_active=True):
+        return CourseReviewRating.objects.create(
+            user=student,
+            course=self.course,
+            title="Review",
+            rating=rating,
+            is_active=is_active,
+        )
+
+    def stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def test_stats_created_with_course(self):
+        stats = self.stats()
+        self.assertEqual(stats.rating_count, 0)
+        self.assertIsNone(stats.rating_average)
+        self.assertEqual(stats.star_percentage(5), 0)
+
+    def test_stats_updated_on_review_insert(self):
+        self.review(self.students[0], 5)
+        self.review(self.students[1], 4)
+        stats = self.stats()
+        self.assertEqual(stats.rating_count, 2)
+        self.assertEqual(stats.rating_sum, 9)
+        self.assertEqual(stats.rating_average, 4.5)
+        self.assertEqual((stats.star_5, stats.star_4, stats.star_1), (1, 1, 0))
+        self.assertEqual(stats.star_percentage(4), 50)
+
+    def test_stats_updated_on_review_update(self):
+        review = self.review(self.students[0], 5)
+        review.rating = 2
+        review.save()
+        stats = self.stats()
+        self.assertEqual(stats.rating_average, 2)
+        self.assertEqual((stats.star_5, stats.star_2), (0, 1))
+
+    def test_inactive_reviews_are_excluded(self):
+        self.review(self.students[0], 5)
+        review = self.review(self.students[1], 1, is_active=False)
+        self.assertEqual(self.stats().rating_count, 1)
+        review.is_active = True
+        review.save()
+        self.assertEqual(self.stats().rating_count, 2)
+        self.assertEqual(self.stats().star_1, 1)
+
+    def test_stats_updated_on_review_delete(self):
+        self.review(self.students[0], 5)
+        self.review(self.students[1], 3).delete()
+        stats = self.stats()
+        self.assertEqual(stats.rating_count, 1)
+        self.assertEqual(stats.star_3, 0)
+
+    def test_bayesian_rating_shrinks_towards_prior(self):
+        self.review(self.students[0], 5)
+        expected = CourseStats.bayesian_average(1, 5)
+        self.assertEqual(self.stats().bayesian_rating, expected)
+        self.assertLess(self.stats().bayesian_rating, 5)
+
+    def test_histogram_highest_rating_first(self):
+        self.review(self.students[0], 5)
+        self.review(self.students[1], 5)
+        self.review(self.students[2], 1)
+        histogram = self.stats().histogram
+        self.assertEqual([r for r, _, _ in histogram], [5, 4, 3, 2, 1])
+        self.assertEqual(histogram[0][1], 2)
+        self.assertAlmostEqual(histogram[4][2], 100 / 3)
+
+    def test_student_count_follows_enrollments(self):
+        enrollment = Enrollment.objects.create(
+            student=self.students[0], amount=self.course.price
+        )
+        enrolled = [
+            EnrolledCourse.objects.create(
+                enrollment=enrollment, student=student, course=self.course
+            )
+            for student in self.students
+        ]
+        self.assertEqual(self.stats().student_count, 3)
+        enrolled[0].delete()
+        self.assertEqual(self.stats().student_count, 2)
+
+    def test_deleting_course_deletes_stats(self):
+        self.review(self.students[0], 5)
+        self.course.delete()
+        self.assertFalse(CourseStats.objects.exists())
+
+
+class TeacherStatsModelTests(TestCase):
+    def setUp(self):
+        # refresh inline what is queued on commit
+        patcher = mock.patch(
+            "courses.tasks.refresh_teacher_stats.delay",
+            side_effect=TeacherStats.refresh,
+        )
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            email="teacher@mail.com",
+            username="testteacher",
+            password="secret",
+            is_student=False,
+        )
+        self.co_teacher = User.objects.create_user(
+            name="co teacher",
+            email="coteacher@mail.com",
+            username="coteacher",
+            password="secret",
+            is_student=False,
+        )
+        self.students = [
+            User.objects.create_user(
+                name=f"student {i}",
+                email=f"student{i}@mail.com",
+                username=f"student{i}",
+                password="secret",
+            )
+            for i in range(3)
+        ]
+        self.category = Category.objects.create(title="Test Category")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = self.create_course("Course one")
+            self.other_course = self.create_course("Course two")
+
+    def create_course(self, title):
+        return Course.objects.create(
+            owner=self.teacher,
+            title=title,
+            category=self.category,
+            overview="The overview of test course.",
+            language="English",
+            old_price=100,
+            price=95,
+        )
+
+    def enroll(self, student, course):
+        enrollment = Enrollment.objects.create(student=student, amount=course.price)
+        with self.captureOnCommitCallbacks(execute=True):
+            return EnrolledCourse.objects.create(
+                enrollment=enrollment, student=student, course=course
+            )
+
+    def stats(self, teacher):
+        return TeacherStats.objects.get(teacher=teacher)
+
+    def test_refresh_is_queued_on_commit(self):
+        enrollment = Enrollment.objects.create(student=self.students[0], amount=95)
+        self.delay.reset_mock()
+        with self.captureOnCommitCallbacks() as callbacks:
+            EnrolledCourse.objects.create(
+                enrollment=enrollment, student=self.students[0], course=self.course
+            )
+        self.delay.assert_not_called()
+        self.assertEqual(self.stats(self.teacher).student_count, 0)
+        for callback in callbacks:
+            callback()
+        self.delay.assert_called_once_with([self.teacher.pk])
+        self.assertEqual(self.stats(self.teacher).student_count, 1)
+
+    def test_writes_of_a_transaction_queue_one_refresh(self):
+        enrollment = Enrollment.objects.create(student=self.students[0], amount=95)
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.create(member=self.co_teacher, course=self.other_course)
+        self.delay.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for student in self.students:
+                for course in (self.course, self.other_course):
+                    EnrolledCourse.objects.create(
+                        enrollment=enrollment, student=student, course=course
+                    )
+        self.assertEqual(len(callbacks), 1)
+        self.delay.assert_called_once_with(
+            sorted([self.teacher.pk, self.co_teacher.pk])
+        )
+        self.assertEqual(self.stats(self.teacher).student_count, 3)
+        self.assertEqual(self.stats(self.co_teacher).student_count, 3)
+
+    def test_refresh_counts_students_in_the_database(self):
+        for student in self.students:
+            self.enroll(student, self.course)
+        with self.assertNumQueries(6):
+            TeacherStats.refresh([self.teacher.pk, self.co_teacher.pk])
+        self.assertEqual(self.stats(self.teacher).student_count, 3)
+
+    def test_courses_owned_follow_course_writes(self):
+        self.assertEqual(self.stats(self.teacher).courses_owned, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_course.delete()
+        self.assertEqual(self.stats(self.teacher).courses_owned, 1)
+
+    def test_ratings_follow_review_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TeacherReviewRating.objects.create(
+                user=self.students[0], teacher=self.teacher, rating=5
+            )
+            review = TeacherReviewRating.objects.create(
+                user=self.students[1], teacher=self.teacher, rating=2
+            )
+        stats = self.stats(self.teacher)
+        self.assertEqual((stats.rating_count, stats.rating_average), (2, 3.5))
+        review.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            review.save()
+        self.assertEqual(self.stats(self.teacher).rating_average, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.assertEqual(self.stats(self.teacher).rating_count, 1)
+
+    def test_students_are_counted_once_across_courses(self):
+        self.enroll(self.students[0], self.course)
+        self.enroll(self.students[0], self.other_course)
+        enrolled = self.enroll(self.students[1], self.course)
+        self.assertEqual(self.stats(self.teacher).student_count, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrolled.delete()
+        self.assertEqual(self.stats(self.teacher).student_count, 1)
+
+    def test_members_co_teach(self):
+        self.enroll(self.students[0], self.course)
+        with self.captureOnCommitCallbacks(execute=True):
+            member = Member.objects.create(member=self.co_teacher, course=self.course)
+        stats = self.stats(self.co_teacher)
+        self.assertEqual((stats.courses_owned, stats.courses_cotaught), (0, 1))
+        self.assertEqual(stats.student_count, 1)
+        self.enroll(self.students[1], self.course)
+        self.assertEqual(self.stats(self.co_teacher).student_count, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+        self.assertEqual(self.stats(self.co_teacher).courses_taught, 0)
+
+    def test_refresh_counts_hits(self):
+        CourseStats.objects.filter(course=self.course).update(hit_count=2)
+        CourseStats.objects.filter(course=self.other_course).update(hit_count=1)
+        TeacherStats.refresh([self.teacher.pk])
+        self.assertEqual(self.stats(self.teacher).hit_count, 3)
+
+    def test_deleting_teacher_deletes_stats(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.create(member=self.co_teacher, course=self.course)
+            TeacherReviewRating.objects.create(
+                user=self.students[0], teacher=self.co_teacher, rating=4
+            )
+            self.co_teacher.delete()
+        self.assertFalse(
+            TeacherStats.objects.filter(teacher_id=self.co_teacher.pk).exists()
+        )
+        self.assertEqual(self.stats(self.teacher).courses_owned, 2)
+
+
 # TODO test _meta fields
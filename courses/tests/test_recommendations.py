@@ -0,0 +1,213 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from courses.models import (
+    Category,
+    Course,
+    CourseRecommendation,
+    StudentRecommendation,
+)
+from courses.recommendations import build_recommendations, refresh_recommendations
+from enroll.models import EnrolledCourse, Enrollment
+
+User = get_user_model()
+
+
+class RecommendationFixture:
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.category = Category.objects.create(title="Test category")
+        self.a, self.b, self.c, self.d = [
+            Course.objects.create(
+                owner=self.teacher,
+                title=f"Course {title}",
+                category=self.category,
+                overview=f"The overview of course {title}.",
+                language="English",
+                old_price=200,
+                price=150,
+            )
+            for title in "ABCD"
+        ]
+        self.students = [
+            User.objects.create_user(
+                name=f"student {i}",
+                username=f"student{i}",
+                email=f"student{i}@test.com",
+                password="secret",
+            )
+            for i in range(4)
+        ]
+        # A and B are taken together most often, C once with A.
+        self.enroll(self.students[0], self.a, self.b)
+        self.enroll(self.students[1], self.a, self.b, self.c)
+        self.enroll(self.students[2], self.b)
+        self.enroll(self.students[3], self.a)
+
+    def enroll(self, student, *courses):
+        enrollment = Enrollment.objects.create(student=student, amount=0)
+        for course in courses:
+            EnrolledCourse.objects.create(
+                enrollment=enrollment, course=course, student=student
+            )
+
+
+class RecommendationTests(RecommendationFixture, TestCase):
+    def recommended(self, **filters):
+        return list(
+            CourseRecommendation.objects.filter(**filters).values_list(
+                "recommended_id", flat=True
+            )
+        )
+
+    def test_build_ranks_courses_by_co_enrollment(self):
+        build_recommendations()
+        self.assertEqual(self.recommended(course=self.a), [self.b.pk, self.c.pk])
+        self.assertEqual(self.recommended(course=self.d), [])
+        a_b = CourseRecommendation.objects.get(course=self.a, recommended=self.b)
+        self.assertAlmostEqual(a_b.score, 2 / (3 * 3) ** 0.5)
+
+    def test_build_recommends_unowned_courses_to_students(self):
+        build_recommendations()
+        self.assertEqual(
+            list(
+                StudentRecommendation.objects.filter(
+                    student=self.students[3]
+                ).values_list("course_id", flat=True)
+            ),
+            [self.b.pk, self.c.pk],
+        )
+        self.assertFalse(
+            StudentRecommendation.objects.filter(student=self.students[1]).exists()
+        )
+
+    def test_inactive_courses_are_not_recommended(self):
+        self.c.is_active = False
+        self.c.save()
+        build_recommendations()
+        self.assertEqual(self.recommended(course=self.a), [self.b.pk])
+
+    def test_refresh_after_new_enrollment(self):
+        build_recommendations()
+        self.enroll(self.students[2], self.d)
+        refresh_recommendations(self.students[2].pk, [self.d.pk])
+        self.assertEqual(self.recommended(course=self.d), [self.b.pk])
+        self.assertEqual(
+            list(
+                StudentRecommendation.objects.filter(
+                    student=self.students[2]
+                ).values_list("course_id", flat=True)
+            ),
+            [self.a.pk, self.c.pk],
+        )
+
+    @override_settings(RECOMMENDATIONS_LIMIT=1, RECOMMENDATIONS_NEIGHBOURS=2)
+    def test_refresh_scores_students_like_a_rebuild(self):
+        def rows():
+            return list(
+                StudentRecommendation.objects.values_list(
+                    "student_id", "course_id", "rank"
+                )
+            ) + list(
+                CourseRecommendation.objects.values_list(
+                    "course_id", "recommended_id", "rank"
+                )
+            )
+
+        self.enroll(self.students[3], self.d)
+        self.enroll(self.students[2], self.c, self.d)
+        build_recommendations()
+        rebuilt = rows()
+        for student in self.students:
+            refresh_recommendations(
+                student.pk, [self.a.pk, self.b.pk, self.c.pk, self.d.pk]
+            )
+        self.assertEqual(rows(), rebuilt)
+
+    def test_checkout_queues_refresh_after_commit(self):
+        self.client.login(email="student2@test.com", password="secret")
+        session = self.client.session
+        session["cart"] = {str(self.d.pk): 1}
+        session.save()
+        with mock.patch(
+            "courses.tasks.refresh_student_recommendations.delay"
+        ) as delay, mock.patch("courses.tasks.refresh_teacher_stats.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("checkout"), {"phone": "0700000000"})
+        delay.assert_called_once_with(self.students[2].pk, [self.d.pk])
+
+    def test_pages_show_recommendations(self):
+        build_recommendations()
+        response = self.client.get(
+            reverse("course_detail", kwargs={"course_slug": self.a.slug})
+        )
+        self.assertEqual(list(response.context["also_taken"]), [self.b, self.c])
+        self.assertContains(response, "Students also took")
+        self.client.login(email="student3@test.com", password="secret")
+        response = self.client.get(reverse("my_courses"))
+        self.assertEqual(
+            list(response.context["recommended_courses"]), [self.b, self.c]
+        )
+
+    @override_settings(RECOMMENDATIONS_LIMIT=1)
+    def test_pages_show_the_nearest_neighbours(self):
+        build_recommendations()
+        self.assertEqual(self.recommended(course=self.a), [self.b.pk, self.c.pk])
+        response = self.client.get(
+            reverse("course_detail", kwargs={"course_slug": self.a.slug})
+        )
+        self.assertEqual(list(response.context["also_taken"]), [self.b])
+
+
+class RecommendationConcurrencyTests(RecommendationFixture, TransactionTestCase):
+    def setUp(self):
+        # these transactions commit, keep the teacher stats refresh off the broker
+        patcher = mock.patch("courses.tasks.refresh_teacher_stats.delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_concurrent_refreshes_of_the_same_courses(self):
+        build_recommendations()
+        self.enroll(self.students[2], self.a, self.d)
+        self.enroll(self.students[3], self.b, self.d)
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def refresh(student):
+            try:
+                barrier.wait()
+                refresh_recommendations(student.pk, [self.a.pk, self.b.pk, self.d.pk])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=refresh, args=(student,))
+            for student in self.students
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            list(
+                CourseRecommendation.objects.filter(course=self.d).values_list(
+                    "rank", flat=True
+                )
+            ),
+            [1, 2],
+        )
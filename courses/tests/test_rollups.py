@@ -0,0 +1,134 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from blog.models import Article, ArticleHit
+from courses.models import (
+    Category,
+    Course,
+    CourseHit,
+    CourseStats,
+    HitDetail,
+    HitRollup,
+    RelatedCourse,
+)
+from courses.rollups import purge_raw_hits, rollup_hits
+
+User = get_user_model()
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2026, 3, day, hour, minute))
+
+
+class HitRollupTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.course = Course.objects.create(
+            owner=self.teacher,
+            title="Test Course",
+            category=Category.objects.create(title="Test category"),
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.article = Article.objects.create(
+            title="Article title", content="The content of the article."
+        )
+
+    def hit(self, created, ip="10.0.0.1", article=False, **details):
+        detail, _ = HitDetail.objects.get_or_create(ip=ip, defaults=details)
+        if article:
+            hit = ArticleHit.objects.create(article=self.article, hit=detail)
+        else:
+            hit = CourseHit.objects.create(course=self.course, hit=detail)
+        type(hit).objects.filter(pk=hit.pk).update(created=created)
+        HitDetail.objects.filter(pk=detail.pk, created__gt=created).update(
+            created=created
+        )
+        return hit
+
+    def rollup(self, period, bucket, kind="course"):
+        return HitRollup.objects.get(kind=kind, period=period, bucket=bucket)
+
+    def hit_count(self):
+        return CourseStats.objects.get(course=self.course).hit_count
+
+    def test_rolls_up_complete_hours_and_days(self):
+        self.hit(at(10, 9, 15), device_type="Mobile", browser_type="Chrome")
+        self.hit(at(10, 9, 40), ip="10.0.0.2", device_type="PC", os_type="Linux")
+        self.hit(at(10, 10, 20), ip="10.0.0.3")
+        self.hit(at(10, 9, 5), article=True)
+        # 11:00-12:00 is not complete yet
+        self.hit(at(10, 11, 30), ip="10.0.0.4")
+
+        self.assertEqual(rollup_hits(now=at(10, 12, 2)), 3)
+        nine = self.rollup(HitRollup.HOUR, at(10, 9))
+        self.assertEqual((nine.views, nine.unique_ips), (2, 2))
+        self.assertEqual(nine.devices, {"Mobile": 1, "PC": 1})
+        self.assertEqual(nine.browsers, {"Chrome": 1, "Other": 1})
+        self.assertEqual(nine.operating_systems, {"Other": 1, "Linux": 1})
+        self.assertEqual(self.rollup(HitRollup.DAY, at(10, 0)).views, 3)
+        self.assertEqual(self.rollup(HitRollup.HOUR, at(10, 9), "article").views, 1)
+        self.assertFalse(HitRollup.objects.filter(bucket=at(10, 11)).exists())
+        self.assertEqual(self.hit_count(), 3)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.hit_count, 1)
+
+        # nothing new to roll up until the lag has passed
+        self.assertEqual(rollup_hits(now=at(10, 12, 4)), 0)
+        self.assertEqual(self.hit_count(), 3)
+
+        self.assertEqual(rollup_hits(now=at(10, 13, 5)), 1)
+        self.assertEqual(self.rollup(HitRollup.DAY, at(10, 0)).views, 4)
+        self.assertEqual(self.hit_count(), 4)
+
+    def test_purges_rolled_up_hits_past_retention(self):
+        old = self.hit(at(1, 9), ip="10.0.0.1")
+        kept_visitor = self.hit(at(1, 10), ip="10.0.0.2")
+        self.hit(at(10, 10), ip="10.0.0.2")
+        self.hit(at(10, 11), ip="10.0.0.3")
+        now = at(10, 11, 10)
+        rollup_hits(now=now)
+
+        with override_settings(HIT_RETENTION_DAYS=7, HIT_PURGE_CHUNK_SIZE=1):
+            self.assertEqual(purge_raw_hits(now=now), 3)
+        self.assertEqual(CourseHit.objects.count(), 2)
+        self.assertFalse(HitDetail.objects.filter(pk=old.hit_id).exists())
+        self.assertTrue(HitDetail.objects.filter(pk=kept_visitor.hit_id).exists())
+        self.assertEqual(self.rollup(HitRollup.DAY, at(1, 0)).views, 2)
+
+        # hits of days not completely rolled up are kept whatever their age,
+        # the day's rollup is recomputed from them
+        with override_settings(HIT_RETENTION_DAYS=0):
+            self.assertEqual(purge_raw_hits(now=now), 0)
+            self.hit(at(10, 23, 30), ip="10.0.0.4")
+            rollup_hits(now=at(11, 0, 10))
+            self.assertEqual(self.rollup(HitRollup.DAY, at(10, 0)).views, 3)
+            self.assertEqual(purge_raw_hits(now=at(11, 0, 10)), 6)
+        self.assertFalse(CourseHit.objects.exists())
+        self.assertEqual(self.rollup(HitRollup.DAY, at(10, 0)).views, 3)
+
+    def test_pages_read_hit_counts(self):
+        CourseStats.objects.filter(course=self.course).update(hit_count=42)
+        other = Course.objects.create(
+            owner=self.teacher,
+            title="Other Course",
+            category=self.course.category,
+            overview="The overview of another course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        RelatedCourse.objects.create(course=other, related=self.course, score=1, rank=1)
+        response = self.client.get(other.get_absolute_url())
+        self.assertContains(response, "<span>42</span>", html=True)
@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Category, Course, CourseTag, RelatedCourse, Tag
+from courses.similarity import build_related_courses, related_courses
+from enroll.models import EnrolledCourse, Enrollment
+
+User = get_user_model()
+
+
+class RelatedCoursesIndexTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.web = Category.objects.create(title="Web")
+        self.data = Category.objects.create(title="Data")
+        self.python = Tag.objects.create(title="python")
+        self.django_tag = Tag.objects.create(title="django")
+        self.django = self.create_course(
+            "Django", self.web, [self.python, self.django_tag]
+        )
+        self.flask = self.create_course("Flask", self.web, [self.python])
+        self.pandas = self.create_course("Pandas", self.data, [self.python])
+        self.sql = self.create_course("SQL", self.data, [])
+
+    def create_course(self, title, category, tags):
+        course = Course.objects.create(
+            owner=self.teacher,
+            title=title,
+            category=category,
+            overview=f"The overview of {title}.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        for tag in tags:
+            CourseTag.objects.create(course=course, tag=tag)
+        return course
+
+    def enroll(self, student, *courses):
+        enrollment = Enrollment.objects.create(student=student, amount=0)
+        for course in courses:
+            EnrolledCourse.objects.create(
+                enrollment=enrollment, course=course, student=student
+            )
+
+    def test_ranks_by_shared_tags_and_category(self):
+        neighbours = dict(related_courses())
+        ranked = [course_id for course_id, _ in neighbours[self.django.pk]]
+        # category + python beats python alone; SQL shares nothing
+        self.assertEqual(ranked, [self.flask.pk, self.pandas.pk])
+        flask_score, pandas_score = [score for _, score in neighbours[self.django.pk]]
+        self.assertAlmostEqual(flask_score, 0.6 * 2 / 3)
+        self.assertAlmostEqual(pandas_score, 0.6 * 1 / 4)
+
+    def test_co_enrollment_is_blended_in(self):
+        for i in range(3):
+            student = User.objects.create_user(
+                name=f"student {i}",
+                username=f"student{i}",
+                email=f"student{i}@test.com",
+                password="secret",
+            )
+            self.enroll(student, self.django, self.sql)
+        ranked = [course_id for course_id, _ in related_courses()[self.django.pk]]
+        self.assertEqual(ranked[0], self.sql.pk)
+
+    def test_inactive_courses_are_left_out(self):
+        self.flask.is_active = False
+        self.flask.save()
+        neighbours = related_courses()
+        self.assertNotIn(self.flask.pk, neighbours)
+        self.assertNotIn(
+            self.flask.pk, [course_id for course_id, _ in neighbours[self.django.pk]]
+        )
+
+    def test_build_replaces_index_and_feeds_course_detail(self):
+        RelatedCourse.objects.create(
+            course=self.django, related=self.sql, score=1, rank=1
+        )
+        self.assertEqual(build_related_courses(limit=1), 4)
+        self.assertEqual(
+            list(
+                RelatedCourse.objects.filter(course=self.django).values_list(
+                    "related_id", "rank"
+                )
+            ),
+            [(self.flask.pk, 1)],
+        )
+        response = self.client.get(
+            reverse("course_detail", kwargs={"course_slug": self.django.slug})
+        )
+        self.assertEqual(list(response.context["related_courses"]), [self.flask])
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command("rebuild_related_courses", stdout=out)
+        self.assertTrue(RelatedCourse.objects.filter(course=self.django).exists())
+        self.assertIn(f"Stored {RelatedCourse.objects.count()} ", out.getvalue())
@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
-from django.db.models import Avg, Count
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, Q
 from django.test import TestCase
 from django.urls import reverse
 
 from blog.models import Article
+from courses.autocomplete import get_sources
 from courses.models import (
     Category,
     Course,
@@ -12,6 +15,7 @@ from courses.models import (
     CourseTag,
     Tag,
     TeacherReviewRating,
+    TeacherStats,
 )
 from enroll.models import EnrolledCourse, Enrollment
 
@@ -368,6 +372,8 @@ class TeamViewTests(TestCase):
             comment="Test comment on teacher",
             rating=5,
         )
+        # refreshed in the background after the writes
+        TeacherStats.refresh([self.teacher.pk])
         self.url = reverse("team")
 
     def test_team_course_owner_is_correct(self):
@@ -375,7 +381,7 @@ class TeamViewTests(TestCase):
         course_teachers = response.context["course_teachers"]
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["page_title"], "Team")
-        self.assertEqual(course_teachers.first().owner, self.teacher)
+        self.assertEqual(course_teachers.first().teacher, self.teacher)
 
     def test_team_testimonial(self):
         response = self.client.get(self.url)
@@ -438,6 +444,7 @@ class TeamDetailViewTests(TestCase):
             comment="Test comment on teacher",
             rating=5,
         )
+        TeacherStats.refresh([self.teacher.pk])
         self.url = reverse("team_detail", kwargs={"username": self.teacher.username})
 
     def test_team_detail_GET(self):
@@ -740,3 +747,163 @@ class TeacherReviewTests(TestCase):
             str(messages[0]),
             "Only students enrolled in the teacher's courses can make reviews.",
         )
+
+
+class SearchViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse("search")
+        self.teacher = User.objects.create_user(
+            name="grace hopper",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.category = Category.objects.create(title="Programming")
+        self.python = Course.objects.create(
+            owner=self.teacher,
+            title="Python for beginners",
+            category=self.category,
+            overview="Learn <b>programming</b> with Python from scratch.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.django = Course.objects.create(
+            owner=self.teacher,
+            title="Web development with Django",
+            category=self.category,
+            overview="Build web applications in Python.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+
+    def test_search_orders_by_relevance(self):
+        response = self.client.get(self.url, {"search": "python"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["rc"], 2)
+        # a title match ranks above an overview match
+        self.assertEqual(list(response.context["results"]), [self.python, self.django])
+
+    def test_search_matches_category_and_teacher(self):
+        response = self.client.get(self.url, {"search": "hopper"})
+        self.assertEqual(response.context["rc"], 2)
+        self.category.title = "Data science"
+        self.category.save()
+        response = self.client.get(self.url, {"search": "science"})
+        self.assertEqual(response.context["rc"], 2)
+        response = self.client.get(self.url, {"search": "programming"})
+        self.assertEqual(list(response.context["results"]), [self.python])
+
+    def test_search_vector_follows_title_changes(self):
+        self.django.title = "Web development with Flask"
+        self.django.save()
+        response = self.client.get(self.url, {"search": "flask"})
+        self.assertEqual(list(response.context["results"]), [self.django])
+
+    def test_search_excludes_inactive_courses(self):
+        self.django.is_active = False
+        self.django.save()
+        response = self.client.get(self.url, {"search": "python"})
+        self.assertEqual(list(response.context["results"]), [self.python])
+
+    def test_search_highlights_escaped_snippet(self):
+        response = self.client.get(self.url, {"search": "scratch"})
+        self.assertContains(response, "<mark>scratch</mark>")
+        self.assertNotContains(response, "<b>programming</b>")
+
+
+class SearchAutocompleteTests(TestCase):
+    def setUp(self):
+        self.url = reverse("search_autocomplete")
+        self.teacher = User.objects.create_user(
+            name="grace hopper",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        self.category = Category.objects.create(title="Programming")
+        self.tag = Tag.objects.create(title="python")
+        self.course = Course.objects.create(
+            owner=self.teacher,
+            title="Python for beginners",
+            category=self.category,
+            overview="Learn programming from scratch.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        cache.clear()
+
+    def test_autocomplete_prefix(self):
+        response = self.client.get(self.url, {"q": "  PYth "})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+        suggestions = response.json()["suggestions"]
+        self.assertIn(
+            {
+                "kind": "course",
+                "text": "Python for beginners",
+                "url": self.course.get_absolute_url(),
+            },
+            suggestions,
+        )
+        self.assertIn(
+            {"kind": "tag", "text": "python", "url": self.tag.get_absolute_url()},
+            suggestions,
+        )
+
+    def test_autocomplete_teachers_and_categories(self):
+        suggestions = self.client.get(self.url, {"q": "hop"}).json()["suggestions"]
+        self.assertEqual(
+            [(s["kind"], s["text"]) for s in suggestions], [("teacher", "grace hopper")]
+        )
+        suggestions = self.client.get(self.url, {"q": "program"}).json()["suggestions"]
+        self.assertEqual(
+            [(s["kind"], s["text"]) for s in suggestions], [("category", "Programming")]
+        )
+
+    def test_autocomplete_tolerates_typos(self):
+        suggestions = self.client.get(self.url, {"q": "pythn"}).json()["suggestions"]
+        self.assertIn("Python for beginners", [s["text"] for s in suggestions])
+
+    def test_autocomplete_queries_use_the_trigram_indexes(self):
+        with connection.cursor() as cursor:
+            # with a handful of rows a sequential scan is always cheaper
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for (_, queryset, field, *_), index in zip(
+                get_sources(),
+                [
+                    "courses_title_trgm",
+                    "tags_title_trgm",
+                    "categories_title_trgm",
+                    "users_name_trgm",
+                ],
+            ):
+                matches = queryset.order_by().filter(
+                    Q(**{f"{field}__ilike": "pyth"})
+                    | Q(**{f"{field}__trigram_word_similar": "pyth"})
+                )
+                self.assertIn(index, matches.explain())
+        self.assertTrue(Course.objects.filter(title__ilike="ON FOR").exists())
+        # wildcards in the term are matched literally
+        self.assertFalse(Course.objects.filter(title__ilike="p_thon").exists())
+
+    def test_autocomplete_is_cached_per_normalized_prefix(self):
+        self.client.get(self.url, {"q": "python"})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"q": " Python  "})
+        self.assertTrue(response.json()["suggestions"])
+
+    def test_autocomplete_ignores_short_prefix(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"q": "p"})
+        self.assertEqual(response.json(), {"suggestions": []})
+
+    def test_search_without_results_suggests_keywords(self):
+        response = self.client.get(reverse("search"), {"search": "pythn"})
+        self.assertEqual(response.context["rc"], 0)
+        self.assertIn("python", response.context["did_you_mean"])
+        self.assertContains(response, "Did you mean")
@@ -9,10 +9,12 @@ from .views import (
     home,
     myCourses,
     search,
+    searchAutocomplete,
     tag,
     teacherReview,
     team,
     teamDetail,
+    userAgentCacheStats,
 )
 
 urlpatterns = [
@@ -28,4 +30,10 @@ urlpatterns = [
     path("team/", team, name="team"),
     path("about/", about, name="about"),
     path("search/", search, name="search"),
+    path("search/autocomplete/", searchAutocomplete, name="search_autocomplete"),
+    path(
+        "stats/user-agent-cache/",
+        userAgentCacheStats,
+        name="user_agent_cache_stats",
+    ),
 ]
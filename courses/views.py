@@ -1,24 +1,31 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
-from django.db.models import Avg, Count, Q
-from django.http import Http404
+from django.db.models import Count, F, Q
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.cache import cache_control
 
 from blog.models import Article
 from enroll.models import EnrolledCourse
 from events.models import Event, Sponsor
+from utils.pagination import paginate
+from utils.search import search_headline, search_query, search_rank
+from utils.user_agents import get_user_agent_cache
 
+from .autocomplete import autocomplete, did_you_mean
+from .curriculum import get_curriculum
+from .hits import COURSE, record_hit
 from .models import (
     Category,
     Course,
-    CourseHit,
     CourseReviewRating,
-    HitDetail,
     Member,
     Tag,
     TeacherReviewRating,
+    TeacherStats,
 )
 
 User = get_user_model()
@@ -31,7 +38,7 @@ def home(request):
     Count only students who have enrolled for courses.
     """
     courses = (
-        Course.objects.annotate(avg_rating=Avg("course_reviews__rating"))
+        Course.objects.annotate(avg_rating=F("stats__rating_average"))
         .select_related("owner", "category")
         .filter(is_active=True)
         .order_by("avg_rating")[:4]
@@ -53,47 +60,19 @@ def home(request):
 
 def courseList(request):
     courses = Course.objects.select_related("owner", "category").filter(is_active=True)
-    page = request.GET.get("page")
-    paginator = Paginator(courses, 6)
-    try:
-        courses = paginator.page(page)
-    except PageNotAnInteger:
-        courses = paginator.page(1)
-    except (EmptyPage, InvalidPage):
-        courses = paginator.page(paginator.num_pages)
-
+    courses = paginate(request, courses, 6, ["pk"])
     return render(
         request,
         "courses.html",
-        {"page_title": "Our Courses", "courses": courses, "paginator": paginator},
+        {"page_title": "Our Courses", "courses": courses},
     )
 
 
-def get_user_agent_details(request):
-    if x_forwarded_for := request.META.get("HTTP_X_FORWARDED_FOR"):
-        ip = x_forwarded_for.split(",")[0]
-    else:
-        ip = request.META.get("REMOTE_ADDR")
-    try:
-        return HitDetail.objects.get(ip=ip)
-    except HitDetail.DoesNotExist:
-        hit = HitDetail(
-            ip=ip,
-            device_type=request.user_agent,
-            browser_type=request.user_agent.browser.family,
-            browser_version=request.user_agent.browser.version_string,
-            os_type=request.user_agent.os.family,
-            os_version=request.user_agent.os.version_string,
-        )
-        hit.save()
-        return hit
-
-
 def courseDetail(request, course_slug):
     try:
         course = (
-            Course.objects.annotate(avg_rating=Avg("course_reviews__rating"))
-            .select_related("owner", "category")
+            Course.objects.annotate(avg_rating=F("stats__rating_average"))
+            .select_related("owner", "category", "stats")
             .get(slug=course_slug, is_active=True)
         )
         reviews = CourseReviewRating.objects.select_related("user").filter(
@@ -101,21 +80,25 @@ def courseDetail(request, course_slug):
         )
         course_members = (
             Member.objects.filter(course=course)
-            .annotate(avg_rating=Avg("member__teacher_reviews__rating"))
-            .select_related("member")
+            .annotate(avg_rating=F("member__teacher_stats__rating_average"))
+            .select_related("member__designation", "member__teacher_stats")
         )
-        related_courses_ids = course.course_tags.values_list("tag_id", flat=True)
         related_courses = (
+            Course.objects.filter(is_active=True, related_to__course=course)
+            .annotate(avg_rating=F("stats__rating_average"))
+            .select_related("category", "stats")
+            .order_by("related_to__rank")
+        )
+        also_taken = (
             Course.objects.filter(
-                is_active=True, course_tags__tag_id__in=related_courses_ids
+                is_active=True,
+                recommended_with__course=course,
+                recommended_with__rank__lte=settings.RECOMMENDATIONS_LIMIT,
             )
-            .annotate(avg_rating=Avg("course_reviews__rating"))
-            .distinct()
-            .exclude(pk=course.pk)
-        )
-        CourseHit.objects.get_or_create(
-            hit=get_user_agent_details(request), course=course
+            .select_related("category")
+            .order_by("recommended_with__rank")
         )
+        record_hit(request, COURSE, course.pk)
 
         return render(
             request,
@@ -123,10 +106,11 @@ def courseDetail(request, course_slug):
             {
                 "page_title": course.title,
                 "course": course,
+                "curriculum": get_curriculum(course),
                 "reviews": reviews,
                 "related_courses": related_courses,
+                "also_taken": also_taken,
                 "course_members": course_members,
-                "rating_range": reversed(range(1, 6)),
             },
         )
     except Course.DoesNotExist:
@@ -135,16 +119,36 @@ def courseDetail(request, course_slug):
 
 @login_required
 def myCourses(request):
-    enrolled_courses = request.user.enrolled_courses.all()
+    enrolled_courses = request.user.enrolled_courses.select_related(
+        "course__owner", "course__category", "course__stats"
+    )
 
-    return render(request, "my-courses.html", {"enrolled_courses": enrolled_courses})
+    recommended_courses = (
+        Course.objects.filter(
+            is_active=True, student_recommendations__student=request.user
+        )
+        .select_related("category")
+        .order_by("student_recommendations__rank")
+    )
+    return render(
+        request,
+        "my-courses.html",
+        {
+            "enrolled_courses": enrolled_courses,
+            "recommended_courses": recommended_courses,
+        },
+    )
 
 
 def team(request):
     """
     Get only teachers who own courses.
     """
-    course_teachers = Course.objects.only("owner")
+    course_teachers = (
+        TeacherStats.objects.filter(courses_owned__gt=0)
+        .select_related("teacher__designation")
+        .order_by(F("rating_average").desc(nulls_last=True), "-student_count")
+    )
     testimonials = (
         TeacherReviewRating.objects.select_related("user", "teacher")
         .filter(is_active=True)
@@ -166,13 +170,20 @@ def team(request):
 
 def teamDetail(request, username):
     try:
-        teacher = User.objects.annotate(avg_rating=Avg("teacher_reviews__rating")).get(
-            username=username
+        teacher = (
+            User.objects.annotate(avg_rating=F("teacher_stats__rating_average"))
+            .select_related("teacher_stats")
+            .get(username=username)
         )
+        # Member is one-to-one with the user: at most one co-taught course
+        cotaught = Member.objects.filter(member=teacher, course__isnull=False)
         courses_taught = (
-            Course.objects.annotate(avg_rating=Avg("course_reviews__rating"))
-            .select_related("owner", "category")
-            .filter(Q(owner=teacher) | Q(course_members__member_id__in=[teacher.id]))
+            Course.objects.annotate(avg_rating=F("stats__rating_average"))
+            .select_related("owner", "category", "stats")
+            .filter(
+                Q(owner=teacher)
+                | Q(pk__in=list(cotaught.values_list("course_id", flat=True)))
+            )
         )
         core_courses = courses_taught.filter(owner=teacher)
         teacher_reviews = TeacherReviewRating.objects.select_related("user").filter(
@@ -281,7 +292,7 @@ def teacherReview(request, username):
 def about(request):
     try:
         courses = (
-            Course.objects.annotate(avg_rating=Count("course_reviews__rating"))
+            Course.objects.annotate(avg_rating=F("stats__rating_count"))
             .select_related("owner", "category")
             .filter(is_active=True)
             .order_by("avg_rating")[:6]
@@ -309,45 +320,48 @@ def about(request):
 
 
 def search(request):
+    """
+    Full-text search over the stored course search vector,
+    best matches first with the matching part of the overview highlighted.
+    """
     try:
         if request.method == "GET":
             query = request.GET.get("search")
             if query == "":
                 messages.warning(request, "Enter a valid keyword.")
                 return redirect(request.META.get("HTTP_REFERER"))
+            keywords = search_query(query)
             results = (
                 Course.objects.select_related("owner", "category")
-                .filter(is_active=True)
-                .filter(
-                    Q(title__icontains=query)
-                    | Q(overview__icontains=query)
-                    | Q(category__title__icontains=query)
-                    | Q(owner__name__icontains=query)
+                .filter(is_active=True, search_vector=keywords)
+                .annotate(
+                    rank=search_rank(keywords),
+                    snippet=search_headline("overview", keywords),
                 )
-                .distinct()
             )
-        rc = results.count()
-        page = request.GET.get("page")
-        paginator = Paginator(results, 8)
-        try:
-            results = paginator.page(page)
-        except PageNotAnInteger:
-            results = paginator.page(1)
-        except (EmptyPage, InvalidPage):
-            results = paginator.page(paginator.num_pages)
+        results = paginate(request, results, 8, ["-rank", "pk"])
         return render(
             request,
             "search.html",
             {
                 "results": results,
-                "rc": rc,
+                "rc": results.paginator.count,
                 "query": query,
+                "did_you_mean": did_you_mean(query) if not results else [],
             },
         )
     except Exception:
         return redirect("home")
 
 
+@cache_control(public=True, max_age=settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+def searchAutocomplete(request):
+    """
+    JSON suggestions for the search box, keyed on the normalized `q` prefix.
+    """
+    return JsonResponse({"suggestions": autocomplete(request.GET.get("q"))})
+
+
 def category(request, category_slug):
     try:
         category = Category.objects.prefetch_related(
@@ -404,3 +418,12 @@ def tag(request, tag_slug):
         )
     except Tag.DoesNotExist:
         raise Http404
+
+
+@staff_member_required
+def userAgentCacheStats(request):
+    """
+    Hit/miss counters of this process's user agent cache,
+    used to size `USER_AGENT_CACHE_SIZE`.
+    """
+    return JsonResponse(get_user_agent_cache().stats())
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Coupon, EnrolledCourse, Enrollment, Wishlist
+from .models import Coupon, CouponRedemption, EnrolledCourse, Enrollment, Wishlist
 
 
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -13,7 +13,27 @@ class EnrolledCourseAdmin(admin.ModelAdmin):
     search_fields = ["enrollment__enrollemnt_id", "course__title"]
 
 
+class CouponAdmin(admin.ModelAdmin):
+    list_display = [
+        "code",
+        "user",
+        "discount",
+        "times_used",
+        "max_uses",
+        "expiry_date",
+        "is_used",
+    ]
+    list_filter = ["is_used"]
+    search_fields = ["code", "user__name"]
+
+
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ["coupon", "user", "amount", "enrollment", "redeemed"]
+    search_fields = ["coupon__code", "user__name"]
+
+
 admin.site.register(Enrollment, EnrollmentAdmin)
 admin.site.register(EnrolledCourse, EnrolledCourseAdmin)
 admin.site.register(Wishlist)
-admin.site.register(Coupon)
+admin.site.register(Coupon, CouponAdmin)
+admin.site.register(CouponRedemption, CouponRedemptionAdmin)
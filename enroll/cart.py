@@ -0,0 +1,144 @@
+"""
+Server-side carts.
+
+A cart is a set of `CartItem` rows sharing a random id kept in the session,
+so it survives the session key rotation on login. Adding and removing are
+single INSERT ... ON CONFLICT DO NOTHING / DELETE statements. With a shared
+cache the course id set (used for membership and the item count on every
+page) and the price total are cached per cart, and dropped when the cart
+changes or when the price of one of its courses does. Checkout reads both
+from the database with `lines`.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils.functional import cached_property
+
+from courses.models import Course
+from utils.cache import is_shared
+
+from .models import CartItem
+
+SESSION_KEY = "cart_id"
+# carts used to be stored in the session as {course_id: 1}
+LEGACY_SESSION_KEY = "cart"
+
+
+def ids_key(cart_id):
+    return f"cart:{cart_id}:ids"
+
+
+def total_key(cart_id):
+    return f"cart:{cart_id}:total"
+
+
+def invalidate_carts(course_ids, totals_only=False):
+    """
+    Drop the cached state of every cart holding one of the courses.
+    """
+    cart_ids = (
+        CartItem.objects.filter(course_id__in=course_ids)
+        .values_list("cart_id", flat=True)
+        .distinct()
+    )
+    keys = [total_key(cart_id) for cart_id in cart_ids]
+    if not totals_only:
+        keys += [ids_key(cart_id) for cart_id in cart_ids]
+    cache.delete_many(keys)
+
+
+class Cart:
+    def __init__(self, session):
+        self.session = session
+        cart_id = session.get(SESSION_KEY) if session is not None else None
+        self.id = uuid.UUID(cart_id) if cart_id else None
+        if session is not None and (legacy := session.pop(LEGACY_SESSION_KEY, None)):
+            self.add(
+                *Course.objects.filter(pk__in=list(legacy)).values_list("pk", flat=True)
+            )
+
+    def __contains__(self, course):
+        return int(getattr(course, "pk", course)) in self.course_ids
+
+    def __len__(self):
+        return len(self.course_ids)
+
+    @cached_property
+    def course_ids(self):
+        if self.id is None:
+            return frozenset()
+        shared = is_shared()
+        course_ids = cache.get(ids_key(self.id)) if shared else None
+        if course_ids is None:
+            course_ids = frozenset(
+                CartItem.objects.filter(cart_id=self.id).values_list(
+                    "course_id", flat=True
+                )
+            )
+            if shared:
+                cache.set(ids_key(self.id), course_ids, settings.CART_CACHE_TIMEOUT)
+        return course_ids
+
+    @property
+    def total(self):
+        if not self:
+            return 0
+        shared = is_shared()
+        total = cache.get(total_key(self.id)) if shared else None
+        if total is None:
+            total = CartItem.objects.filter(cart_id=self.id).aggregate(
+                total=Sum("course__price")
+            )["total"]
+            if shared:
+                cache.set(total_key(self.id), total, settings.CART_CACHE_TIMEOUT)
+        return total
+
+    def courses(self):
+        return Course.get_courses_by_id(self.course_ids)
+
+    def lines(self):
+        """
+        The courses in the cart and their price total, read from the database
+        whatever is cached, for charging them.
+        """
+        if self.id is None:
+            return [], 0
+        courses = list(Course.objects.filter(cart_items__cart_id=self.id))
+        return courses, sum(course.price for course in courses)
+
+    def add(self, *course_ids):
+        if not course_ids:
+            return
+        if self.id is None:
+            self.id = uuid.uuid4()
+            self.session[SESSION_KEY] = str(self.id)
+        CartItem.objects.bulk_create(
+            [CartItem(cart_id=self.id, course_id=pk) for pk in course_ids],
+            ignore_conflicts=True,
+        )
+        self.changed()
+
+    def remove(self, *course_ids):
+        if self.id is not None:
+            CartItem.objects.filter(cart_id=self.id, course_id__in=course_ids).delete()
+            self.changed()
+
+    def clear(self):
+        if self.id is not None:
+            CartItem.objects.filter(cart_id=self.id).delete()
+            self.changed()
+
+    def changed(self):
+        cache.delete_many([ids_key(self.id), total_key(self.id)])
+        self.__dict__.pop("course_ids", None)
+
+
+def get_cart(request):
+    """
+    The cart of the current visitor, shared by the view and the templates.
+    """
+    if not hasattr(request, "_cart"):
+        request._cart = Cart(getattr(request, "session", None))
+    return request._cart
@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart
+
+
+def cart_renderer(request):
+    return {"cart": SimpleLazyObject(lambda: get_cart(request))}
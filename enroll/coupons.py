@@ -0,0 +1,103 @@
+"""
+Coupon redemption.
+
+With a shared cache, codes are first checked against a cached set of live
+codes, so guesses never reach the database; a per-process set could miss
+codes created since in another process, so without one the coupon row is
+always looked up. A redemption locks the coupon row, re-checks it and
+takes one use (or part of a balance) inside the caller's transaction; the
+lock is held until the enrollment commits, so concurrent checkouts of the
+same code queue up instead of over-redeeming it. The check constraint on
+`times_used` backs this up at the database level.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from utils.cache import is_shared
+
+from .models import Coupon, CouponRedemption
+
+VALID_CODES_KEY = "coupons:valid"
+SESSION_KEY = "coupon_code"
+
+INVALID = "Your coupon code is invalid."
+EXPIRED = "This coupon has expired."
+USED_UP = "This coupon has been used up."
+
+
+def valid_codes():
+    """
+    Codes that were live when the set was built. It may still hold codes that
+    have since expired or been used up, `redeem` re-checks those.
+    """
+    codes = cache.get(VALID_CODES_KEY)
+    if codes is None:
+        codes = frozenset(
+            Coupon.objects.filter(is_used=False)
+            .filter(Q(expiry_date__isnull=True) | Q(expiry_date__gt=timezone.now()))
+            .values_list("code", flat=True)
+        )
+        cache.set(VALID_CODES_KEY, codes, settings.COUPON_CACHE_TIMEOUT)
+    return codes
+
+
+def may_be_valid(code):
+    """
+    False for codes that are not live, answered from the cached set when the
+    cache is shared.
+    """
+    return code in valid_codes() if is_shared() else True
+
+
+def invalidate_valid_codes():
+    transaction.on_commit(lambda: cache.delete(VALID_CODES_KEY))
+
+
+def check(coupon, user):
+    if coupon is None or coupon.user_id not in (None, user.pk):
+        raise ValidationError(INVALID)
+    if coupon.is_expired:
+        raise ValidationError(EXPIRED)
+    if not coupon.is_redeemable_by(user):
+        raise ValidationError(USED_UP)
+
+
+def get_coupon(code, user):
+    """
+    The coupon `user` may redeem with `code`, or a ValidationError.
+    """
+    code = (code or "").strip()
+    if not may_be_valid(code):
+        raise ValidationError(INVALID)
+    coupon = Coupon.objects.filter(code=code).first()
+    check(coupon, user)
+    return coupon
+
+
+def redeem(code, user, total, enrollment=None):
+    """
+    Take `code` off `total` for `user` and return the `CouponRedemption`, or
+    raise a ValidationError. Call it inside the transaction that charges the
+    discounted amount so a failed checkout gives the use back.
+    """
+    code = (code or "").strip()
+    if not may_be_valid(code):
+        raise ValidationError(INVALID)
+    with transaction.atomic():
+        coupon = Coupon.objects.select_for_update().filter(code=code).first()
+        check(coupon, user)
+        amount = coupon.discount_for(total)
+        if coupon.user_id is not None and amount < coupon.discount:
+            # personal balances keep what is left
+            coupon.discount -= amount
+        else:
+            coupon.times_used += 1
+            coupon.is_used = coupon.times_used >= coupon.max_uses
+        coupon.save(update_fields=["discount", "times_used", "is_used", "updated"])
+        return CouponRedemption.objects.create(
+            coupon=coupon, user=user, enrollment=enrollment, amount=amount
+        )
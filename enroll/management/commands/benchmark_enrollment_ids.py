@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from utils.utils import enrollment_id_generator
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark enrollment ID generation and insertion into a uniquely "
+        "indexed column as the table grows. Runs against a temporary table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2_000_000)
+        parser.add_argument("--batch", type=int, default=100_000)
+
+    def handle(self, *args, rows, batch, **options):
+        self.stdout.write(
+            f"{'rows':>10} {'generate us/id':>15} {'insert us/row':>14} "
+            f"{'queries/batch':>14}"
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE enrollment_id_benchmark "
+                "(enrollment_id varchar(50) NOT NULL UNIQUE) ON COMMIT DROP"
+            )
+            inserted = 0
+            while inserted < rows:
+                size = min(batch, rows - inserted)
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    ids = [enrollment_id_generator() for _ in range(size)]
+                    generated = time.perf_counter()
+                    # one statement per batch, like the enrollments' bulk_create
+                    cursor.execute(
+                        "INSERT INTO enrollment_id_benchmark (enrollment_id) "
+                        "SELECT unnest(%s::varchar[])",
+                        [ids],
+                    )
+                    stored = time.perf_counter()
+                inserted += size
+                self.stdout.write(
+                    f"{inserted:>10} {(generated - start) / size * 1e6:>15.2f} "
+                    f"{(stored - generated) / size * 1e6:>14.2f} "
+                    f"{len(queries):>14}"
+                )
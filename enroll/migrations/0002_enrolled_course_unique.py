@@ -0,0 +1,52 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:50
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    """
+    Keep the first enrollment of a student in a course and resync the
+    student counts of the courses that had duplicates.
+    """
+    CourseStats = apps.get_model("courses", "CourseStats")
+    EnrolledCourse = apps.get_model("enroll", "EnrolledCourse")
+    duplicates = (
+        EnrolledCourse.objects.values("student_id", "course_id")
+        .annotate(first=Min("pk"), count=Count("pk"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    course_ids = set()
+    for row in duplicates:
+        EnrolledCourse.objects.filter(
+            student_id=row["student_id"], course_id=row["course_id"]
+        ).exclude(pk=row["first"]).delete()
+        course_ids.add(row["course_id"])
+    for course_id, student_count in (
+        EnrolledCourse.objects.filter(course_id__in=course_ids)
+        .values_list("course_id")
+        .annotate(Count("pk"))
+        .order_by()
+    ):
+        CourseStats.objects.filter(course_id=course_id).update(
+            student_count=student_count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0006_course_stats_student_count"),
+        ("enroll", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="enrolledcourse",
+            constraint=models.UniqueConstraint(
+                fields=("student", "course"), name="enrolled_courses_student_course"
+            ),
+        ),
+    ]
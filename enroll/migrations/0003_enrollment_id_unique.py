@@ -0,0 +1,51 @@
+# Generated by Django 4.1.2 on 2026-10-17 02:53
+
+import secrets
+
+from django.db import migrations, models
+
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_enrollment_id():
+    # random, in the 16-character Crockford base32 format of new IDs
+    return "".join(secrets.choice(CROCKFORD_ALPHABET) for _ in range(16))
+
+
+def reissue_duplicate_enrollment_ids(apps, schema_editor):
+    """
+    Give a fresh ID to blank enrollment IDs and to every repeat of an ID,
+    keeping the oldest enrollment's.
+    """
+    Enrollment = apps.get_model("enroll", "Enrollment")
+    seen = set()
+    reissued = []
+    for enrollment in (
+        Enrollment.objects.only("enrollment_id").order_by("pk").iterator()
+    ):
+        if enrollment.enrollment_id and enrollment.enrollment_id not in seen:
+            seen.add(enrollment.enrollment_id)
+            continue
+        while enrollment.enrollment_id in seen or not enrollment.enrollment_id:
+            enrollment.enrollment_id = new_enrollment_id()
+        seen.add(enrollment.enrollment_id)
+        reissued.append(enrollment)
+    Enrollment.objects.bulk_update(reissued, ["enrollment_id"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("enroll", "0002_enrolled_course_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reissue_duplicate_enrollment_ids, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name="enrollment",
+            name="enrollment_id",
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+    ]
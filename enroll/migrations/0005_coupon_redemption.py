@@ -0,0 +1,104 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_past_uses(apps, schema_editor):
+    Coupon = apps.get_model("enroll", "Coupon")
+    Coupon.objects.filter(is_used=True).update(times_used=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("enroll", "0004_cart_items"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CouponRedemption",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=9)),
+                ("redeemed", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "coupon_redemptions",
+            },
+        ),
+        migrations.AddField(
+            model_name="coupon",
+            name="expiry_date",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="coupon",
+            name="max_uses",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="coupon",
+            name="times_used",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="coupon",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="coupons",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(count_past_uses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="coupon",
+            constraint=models.CheckConstraint(
+                check=models.Q(("times_used__lte", models.F("max_uses"))),
+                name="coupons_times_used_lte_max_uses",
+            ),
+        ),
+        migrations.AddField(
+            model_name="couponredemption",
+            name="coupon",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="redemptions",
+                to="enroll.coupon",
+            ),
+        ),
+        migrations.AddField(
+            model_name="couponredemption",
+            name="enrollment",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="coupon_redemptions",
+                to="enroll.enrollment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="couponredemption",
+            name="user",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="coupon_redemptions",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
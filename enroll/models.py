@@ -1,9 +1,10 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models.signals import pre_save
+from django.utils import timezone
 
 from courses.models import Course, TimeStampedModel
-from utils.utils import unique_enroll_id_generator
+from utils.utils import enrollment_id_generator
 
 
 class Enrollment(models.Model):
@@ -13,7 +14,7 @@ class Enrollment(models.Model):
         on_delete=models.SET_NULL,
         null=True,
     )
-    enrollment_id = models.CharField(max_length=50, blank=True)
+    enrollment_id = models.CharField(max_length=50, blank=True, unique=True)
     amount = models.DecimalField(decimal_places=2, max_digits=9, blank=True)
     date_enrolled = models.DateTimeField(auto_now_add=True)
 
@@ -23,7 +24,8 @@ class Enrollment(models.Model):
         verbose_name_plural = "Enrollments"
 
     def save(self, *args, **kwargs):
-        self.enrollment_id = unique_enroll_id_generator(self)
+        if self._state.adding:
+            self.enrollment_id = enrollment_id_generator()
         super(Enrollment, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -45,15 +47,33 @@ class EnrolledCourse(models.Model):
 
     class Meta:
         db_table = "enrolled_courses"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "course"], name="enrolled_courses_student_course"
+            )
+        ]
 
 
 class Coupon(TimeStampedModel):
+    """
+    A discount code. Codes tied to a `user` are personal balances: a
+    redemption smaller than the balance leaves the rest on the coupon.
+    Codes without a user can be redeemed by anyone, `max_uses` times, for up
+    to `discount` each. Redeem through `enroll.coupons.redeem`.
+    """
+
     user = models.ForeignKey(
-        get_user_model(), related_name="coupons", on_delete=models.CASCADE
+        get_user_model(),
+        related_name="coupons",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
     )
     code = models.CharField(max_length=20, unique=True)
     discount = models.DecimalField(decimal_places=2, max_digits=9, default=0)
-    # expiry_date = models.DateTimeField()
+    expiry_date = models.DateTimeField(null=True, blank=True)
+    max_uses = models.PositiveIntegerField(default=1)
+    times_used = models.PositiveIntegerField(default=0)
     is_used = models.BooleanField(default=False)
 
     def __str__(self):
@@ -61,6 +81,54 @@ class Coupon(TimeStampedModel):
 
     class Meta:
         db_table = "coupons"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(times_used__lte=models.F("max_uses")),
+                name="coupons_times_used_lte_max_uses",
+            )
+        ]
+
+    @property
+    def is_expired(self):
+        return self.expiry_date is not None and self.expiry_date <= timezone.now()
+
+    def is_redeemable_by(self, user):
+        return (
+            not self.is_used
+            and not self.is_expired
+            and self.times_used < self.max_uses
+            and self.user_id in (None, user.pk)
+        )
+
+    def discount_for(self, total):
+        return min(self.discount, total)
+
+
+class CouponRedemption(models.Model):
+    coupon = models.ForeignKey(
+        Coupon, related_name="redemptions", on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        get_user_model(),
+        related_name="coupon_redemptions",
+        on_delete=models.SET_NULL,
+        null=True,
+    )
+    enrollment = models.ForeignKey(
+        Enrollment,
+        related_name="coupon_redemptions",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    amount = models.DecimalField(decimal_places=2, max_digits=9)
+    redeemed = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "coupon_redemptions"
+
+    def __str__(self):
+        return f"{self.coupon.code} : KES {self.amount} by {self.user}"
 
 
 class Wishlist(TimeStampedModel):
@@ -72,3 +140,27 @@ class Wishlist(TimeStampedModel):
 
     def __str__(self):
         return f"{self.user}'s Wishlist"
+
+
+class CartItem(models.Model):
+    """
+    A course in a visitor's cart. A cart is the set of rows sharing a
+    `cart_id` (see `enroll.cart`).
+    """
+
+    cart_id = models.UUIDField()
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="cart_items"
+    )
+    added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "cart_items"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart_id", "course"], name="cart_items_cart_course"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.course} in cart {self.cart_id}"
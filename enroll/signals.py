@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from courses.models import Course, CourseStats, TeacherStats
+from courses.signals import deleted_with_user
+
+from .cart import invalidate_carts
+from .coupons import invalidate_valid_codes
+from .models import Coupon, EnrolledCourse
+
+
+@receiver(post_save, sender=EnrolledCourse)
+def increment_student_count(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.add_students([instance.course_id])
+        TeacherStats.queue_refresh(TeacherStats.teachers_of([instance.course_id]))
+
+
+@receiver(post_delete, sender=EnrolledCourse)
+def decrement_student_count(sender, instance, origin=None, **kwargs):
+    CourseStats.add_students([instance.course_id], -1)
+    TeacherStats.queue_refresh(
+        teacher_id
+        for teacher_id in TeacherStats.teachers_of([instance.course_id])
+        if not deleted_with_user(origin, teacher_id)
+    )
+
+
+@receiver(post_save, sender=Course)
+def invalidate_cart_totals(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or "price" in update_fields):
+        invalidate_carts([instance.pk], totals_only=True)
+
+
+@receiver(pre_delete, sender=Course)
+def invalidate_carts_of_deleted_course(sender, instance, **kwargs):
+    # the cart items go with the course, find their carts while they exist
+    invalidate_carts([instance.pk])
+
+
+@receiver(post_save, sender=Coupon)
+def refresh_valid_codes(sender, instance, created, update_fields=None, **kwargs):
+    # redemptions save with update_fields and only ever retire codes, which
+    # the cached set tolerates
+    if created or update_fields is None:
+        invalidate_valid_codes()
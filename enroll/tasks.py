@@ -0,0 +1,22 @@
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from enroll.models import CartItem
+
+
+@shared_task
+def purge_stale_carts():
+    """
+    Delete carts nothing was added to for longer than a session lives.
+    """
+    cutoff = timezone.now() - timezone.timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    stale = (
+        CartItem.objects.values("cart_id")
+        .annotate(last_added=Max("added"))
+        .filter(last_added__lt=cutoff)
+        .values("cart_id")
+    )
+    deleted, _ = CartItem.objects.filter(cart_id__in=stale).delete()
+    return deleted
@@ -0,0 +1,125 @@
+from importlib import import_module
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from courses.models import Category, Course
+from enroll.cart import LEGACY_SESSION_KEY, SESSION_KEY, Cart
+from enroll.models import CartItem
+from enroll.tasks import purge_stale_carts
+
+User = get_user_model()
+SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user(
+            name="test teacher",
+            username="testteacher",
+            email="test@teacher.com",
+            password="secret",
+            is_student=False,
+        )
+        category = Category.objects.create(title="Test category")
+        self.a, self.b, self.c = [
+            Course.objects.create(
+                owner=teacher,
+                title=f"Course {title}",
+                category=category,
+                overview=f"The overview of course {title}.",
+                language="English",
+                old_price=200,
+                price=price,
+            )
+            for title, price in (("A", 150), ("B", 100), ("C", 50))
+        ]
+        self.session = SessionStore()
+
+    def test_empty_cart_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            cart = Cart(self.session)
+            self.assertEqual(len(cart), 0)
+            self.assertNotIn(self.a, cart)
+            self.assertEqual(cart.total, 0)
+        self.assertNotIn(SESSION_KEY, self.session)
+
+    def test_add_and_remove(self):
+        cart = Cart(self.session)
+        cart.add(self.a.pk, self.b.pk)
+        cart.add(self.a.pk)
+        self.assertEqual(len(cart), 2)
+        self.assertIn(self.a, cart)
+        self.assertIn(str(self.b.pk), cart)
+        self.assertNotIn(self.c, cart)
+        cart.remove(self.a.pk)
+        self.assertEqual(Cart(self.session).course_ids, {self.b.pk})
+        cart.clear()
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_membership_and_total_are_cached_in_a_shared_cache(self):
+        Cart(self.session).add(self.a.pk, self.b.pk)
+        with mock.patch("enroll.cart.is_shared", return_value=True):
+            self.assertEqual(Cart(self.session).total, 250)
+            with self.assertNumQueries(0):
+                cart = Cart(self.session)
+                self.assertIn(self.a, cart)
+                self.assertEqual(len(cart), 2)
+                self.assertEqual(cart.total, 250)
+
+    def test_nothing_is_cached_in_a_per_process_cache(self):
+        Cart(self.session).add(self.a.pk, self.b.pk)
+        self.assertEqual(Cart(self.session).total, 250)
+        CartItem.objects.filter(course=self.b).delete()
+        self.assertEqual(Cart(self.session).total, 150)
+
+    def test_lines_ignore_the_cache(self):
+        cart = Cart(self.session)
+        cart.add(self.a.pk, self.b.pk)
+        with mock.patch("enroll.cart.is_shared", return_value=True):
+            self.assertEqual(Cart(self.session).total, 250)
+            # e.g. a change invalidated in another process's cache
+            CartItem.objects.filter(course=self.b).delete()
+            self.assertEqual(Cart(self.session).total, 250)
+            self.assertEqual(Cart(self.session).lines(), ([self.a], 150))
+
+    @mock.patch("enroll.cart.is_shared", return_value=True)
+    def test_price_change_invalidates_total(self, is_shared):
+        Cart(self.session).add(self.a.pk, self.b.pk)
+        self.assertEqual(Cart(self.session).total, 250)
+        self.a.price = 120
+        self.a.save()
+        self.assertEqual(Cart(self.session).total, 220)
+
+    @mock.patch("enroll.cart.is_shared", return_value=True)
+    def test_deleted_course_leaves_cart(self, is_shared):
+        Cart(self.session).add(self.a.pk, self.b.pk)
+        self.assertEqual(len(Cart(self.session)), 2)
+        self.b.delete()
+        cart = Cart(self.session)
+        self.assertEqual(cart.course_ids, {self.a.pk})
+        self.assertEqual(cart.total, 150)
+
+    def test_imports_legacy_session_cart(self):
+        self.session[LEGACY_SESSION_KEY] = {str(self.a.pk): 1, "99999999": 1}
+        cart = Cart(self.session)
+        self.assertEqual(cart.course_ids, {self.a.pk})
+        self.assertNotIn(LEGACY_SESSION_KEY, self.session)
+
+    def test_purge_stale_carts(self):
+        stale, fresh = Cart(SessionStore()), Cart(self.session)
+        stale.add(self.a.pk, self.b.pk)
+        fresh.add(self.a.pk)
+        CartItem.objects.filter(cart_id=stale.id).update(
+            added=timezone.now()
+            - timezone.timedelta(seconds=settings.SESSION_COOKIE_AGE + 1)
+        )
+        self.assertEqual(purge_stale_carts(), 2)
+        self.assertEqual(
+            list(CartItem.objects.values_list("cart_id", flat=True)), [fresh.id]
+        )
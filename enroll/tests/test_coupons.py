@@ -0,0 +1,217 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Category, Course
+from enroll import coupons
+from enroll.cart import SESSION_KEY as CART_SESSION_KEY
+from enroll.models import Coupon, CouponRedemption, Enrollment
+
+User = get_user_model()
+
+
+def create_users(count):
+    return [
+        User.objects.create_user(
+            name=f"student {i}",
+            username=f"student{i}",
+            email=f"student{i}@test.com",
+            password="secret",
+        )
+        for i in range(count)
+    ]
+
+
+class CouponTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student, self.other = create_users(2)
+        self.shared = Coupon.objects.create(code="FLASH", discount=50, max_uses=2)
+        self.personal = Coupon.objects.create(
+            code="GIFT", discount=100, user=self.student
+        )
+
+    @mock.patch("enroll.coupons.is_shared", return_value=True)
+    def test_unknown_codes_are_rejected_from_a_shared_cache(self, is_shared):
+        coupons.valid_codes()
+        with self.assertNumQueries(0):
+            with self.assertRaisesMessage(ValidationError, coupons.INVALID):
+                coupons.get_coupon("GUESS", self.student)
+            with self.assertRaisesMessage(ValidationError, coupons.INVALID):
+                coupons.redeem("GUESS", self.student, 100)
+
+    @mock.patch("enroll.coupons.is_shared", return_value=True)
+    def test_new_coupon_is_added_to_the_cached_codes(self, is_shared):
+        coupons.valid_codes()
+        with self.captureOnCommitCallbacks(execute=True):
+            Coupon.objects.create(code="NEW", discount=10)
+        self.assertEqual(coupons.get_coupon(" NEW ", self.student).code, "NEW")
+
+    def test_new_coupon_is_valid_without_a_shared_cache(self):
+        coupons.valid_codes()
+        # the cached set is not invalidated before commit, as in a process
+        # that did not create the coupon
+        Coupon.objects.create(code="NEW", discount=10)
+        self.assertEqual(coupons.get_coupon("NEW", self.student).code, "NEW")
+        with self.assertRaisesMessage(ValidationError, coupons.INVALID):
+            coupons.get_coupon("GUESS", self.student)
+
+    def test_personal_coupons_belong_to_their_user(self):
+        with self.assertRaisesMessage(ValidationError, coupons.INVALID):
+            coupons.redeem("GIFT", self.other, 100)
+
+    def test_expired_coupon(self):
+        coupons.valid_codes()
+        self.shared.expiry_date = timezone.now() - timezone.timedelta(minutes=1)
+        self.shared.save(update_fields=["expiry_date"])
+        # still in the cached codes, caught by the check on the row
+        with self.assertRaisesMessage(ValidationError, coupons.EXPIRED):
+            coupons.redeem("FLASH", self.student, 100)
+        cache.clear()
+        self.assertNotIn("FLASH", coupons.valid_codes())
+
+    def test_shared_coupon_is_used_up_after_max_uses(self):
+        self.assertEqual(coupons.redeem("FLASH", self.student, 100).amount, 50)
+        self.assertEqual(coupons.redeem("FLASH", self.other, 30).amount, 30)
+        with self.assertRaisesMessage(ValidationError, coupons.USED_UP):
+            coupons.redeem("FLASH", self.student, 100)
+        self.shared.refresh_from_db()
+        self.assertEqual((self.shared.times_used, self.shared.is_used), (2, True))
+        self.assertEqual(self.shared.discount, 50)
+
+    def test_personal_coupon_keeps_its_balance(self):
+        self.assertEqual(coupons.redeem("GIFT", self.student, 70).amount, 70)
+        self.personal.refresh_from_db()
+        self.assertEqual((self.personal.discount, self.personal.is_used), (30, False))
+        self.assertEqual(coupons.redeem("GIFT", self.student, 70).amount, 30)
+        self.personal.refresh_from_db()
+        self.assertTrue(self.personal.is_used)
+
+    def test_checkout_charges_the_discounted_amount(self):
+        course = Course.objects.create(
+            owner=User.objects.create_user(
+                name="test teacher",
+                username="testteacher",
+                email="test@teacher.com",
+                password="secret",
+                is_student=False,
+            ),
+            title="Test Course",
+            category=Category.objects.create(title="Test category"),
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.client.force_login(self.student)
+        self.client.get(reverse("add_to_cart"), {"course_id": course.pk})
+        response = self.client.post(
+            reverse("apply_coupon"),
+            {"coupon_code": "FLASH"},
+            HTTP_REFERER="https://evil.example.com/",
+        )
+        self.assertRedirects(response, reverse("cart"))
+        self.assertEqual(
+            self.client.get(reverse("checkout")).context["amount_due"], 100
+        )
+
+        self.client.post(reverse("checkout"), {"phone": "0700000000"})
+        enrollment = Enrollment.objects.get(student=self.student)
+        self.assertEqual(enrollment.amount, 100)
+        redemption = CouponRedemption.objects.get()
+        self.assertEqual(
+            (redemption.coupon, redemption.enrollment, redemption.amount),
+            (self.shared, enrollment, 50),
+        )
+        self.assertNotIn(coupons.SESSION_KEY, self.client.session)
+
+    def test_failed_redemption_rolls_the_enrollment_back(self):
+        self.shared.times_used = 2
+        self.shared.save()
+        course = Course.objects.create(
+            title="Test Course",
+            category=Category.objects.create(title="Test category"),
+            overview="The overview of a test course.",
+            language="English",
+            old_price=200,
+            price=150,
+        )
+        self.client.force_login(self.student)
+        session = self.client.session
+        session["cart"] = {str(course.pk): 1}
+        session[coupons.SESSION_KEY] = "FLASH"
+        session.save()
+
+        response = self.client.post(reverse("checkout"), {"phone": "0700000000"})
+        self.assertRedirects(
+            response, reverse("checkout"), fetch_redirect_response=False
+        )
+        self.assertEqual(
+            [str(m) for m in get_messages(response.wsgi_request)], [coupons.USED_UP]
+        )
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertIn(CART_SESSION_KEY, self.client.session)
+
+
+class CouponConcurrencyTests(TransactionTestCase):
+    threads = 12
+
+    def setUp(self):
+        cache.clear()
+        self.users = create_users(self.threads)
+
+    def hammer(self, code, users, total):
+        """
+        Redeem `code` from one thread per user at once; returns the amounts.
+        """
+        barrier = threading.Barrier(len(users))
+        amounts, errors = [], []
+
+        def checkout(user):
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    amounts.append(coupons.redeem(code, user, total).amount)
+            except ValidationError as e:
+                errors.append(e.messages[0])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(amounts) + len(errors), len(users))
+        self.assertEqual(set(errors) - {coupons.USED_UP}, set())
+        return amounts
+
+    def test_shared_code_is_never_over_redeemed(self):
+        coupon = Coupon.objects.create(code="FLASH", discount=50, max_uses=5)
+        amounts = self.hammer("FLASH", self.users, 100)
+        self.assertEqual(len(amounts), 5)
+        coupon.refresh_from_db()
+        self.assertEqual((coupon.times_used, coupon.is_used), (5, True))
+        self.assertEqual(CouponRedemption.objects.filter(coupon=coupon).count(), 5)
+
+    def test_personal_balance_is_never_overdrawn(self):
+        user = self.users[0]
+        coupon = Coupon.objects.create(code="GIFT", discount=100, user=user)
+        amounts = self.hammer("GIFT", [user] * self.threads, 30)
+        self.assertEqual(sum(amounts), 100)
+        self.assertEqual(sorted(amounts), [10, 30, 30, 30])
+        coupon.refresh_from_db()
+        self.assertTrue(coupon.is_used)
+        self.assertEqual(
+            sum(CouponRedemption.objects.values_list("amount", flat=True)),
+            Decimal(100),
+        )
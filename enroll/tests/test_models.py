@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase
+
+from enroll.models import Enrollment
+
+User = get_user_model()
+
+
+class EnrollmentModelTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            name="test student",
+            username="teststudent",
+            email="test@student.com",
+            password="secret",
+        )
+
+    def test_enrollment_id_is_issued_without_queries(self):
+        enrollment = Enrollment(student=self.student, amount=100)
+        with self.assertNumQueries(1):
+            enrollment.save()
+        self.assertEqual(len(enrollment.enrollment_id), 16)
+
+    def test_enrollment_id_is_kept_on_update(self):
+        enrollment = Enrollment.objects.create(student=self.student, amount=100)
+        enrollment_id = enrollment.enrollment_id
+        enrollment.amount = 50
+        enrollment.save()
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.enrollment_id, enrollment_id)
+
+    def test_enrollment_ids_are_unique(self):
+        first = Enrollment.objects.create(student=self.student, amount=100)
+        second = Enrollment.objects.create(student=self.student, amount=100)
+        self.assertNotEqual(first.enrollment_id, second.enrollment_id)
+        with self.assertRaises(IntegrityError):
+            Enrollment.objects.filter(pk=second.pk).update(
+                enrollment_id=first.enrollment_id
+            )
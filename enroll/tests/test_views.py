@@ -1,15 +1,27 @@
-from django.db import IntegrityError
+from unittest import mock
+
+from django.db import IntegrityError, connection
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
 from django.test import TestCase
 from django.urls import reverse
 
-from courses.models import Category, Course, Tag
-from enroll.models import EnrolledCourse, Enrollment
+from courses.models import Category, Course, CourseStats, Tag
+from enroll.cart import SESSION_KEY
+from enroll.models import CartItem, EnrolledCourse, Enrollment
+from enroll.views import enrollCourses
 
 User = get_user_model()
 
 
+def cart_course_ids(client):
+    return set(
+        CartItem.objects.filter(cart_id=client.session.get(SESSION_KEY)).values_list(
+            "course_id", flat=True
+        )
+    )
+
+
 class AddToCartTests(TestCase):
     def setUp(self):
         self.teacher = User.objects.create_user(
@@ -48,10 +60,8 @@ class AddToCartTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, self.course.get_absolute_url())
 
-        # check the cart in the session
-        cart = self.client.session.get("cart")
-        self.assertIsNotNone(cart)
-        self.assertEqual(cart[str(self.course.pk)], 1)
+        # check the cart
+        self.assertEqual(cart_course_ids(self.client), {self.course.pk})
 
         # assert that a success message is displayed to the user
         messages = list(get_messages(response.wsgi_request))
@@ -68,10 +78,8 @@ class AddToCartTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, self.course.get_absolute_url())
 
-        # check the cart in the session
-        cart = self.client.session.get("cart")
-        self.assertIsNotNone(cart)
-        self.assertEqual(cart[str(self.course.pk)], 1)
+        # check the cart
+        self.assertEqual(cart_course_ids(self.client), {self.course.pk})
 
         # assert that a success message is displayed to the user
         messages = list(get_messages(response.wsgi_request))
@@ -178,7 +186,7 @@ class CartTests(TestCase):
         # send a GET request to the cart view with the test course id
         # To remove `Test Course` from cart.
         response = self.client.get(reverse("cart"), {"course_id": self.course.pk})
-        self.assertNotIn(str(self.course.pk), self.client.session["cart"])
+        self.assertNotIn(self.course.pk, cart_course_ids(self.client))
 
         # assert that an info message is displayed to the user
         messages = list(get_messages(response.wsgi_request))
@@ -279,7 +287,7 @@ class CheckoutViewTests(TestCase):
         )
 
         # assert the enrolled course does not exist in cart
-        self.assertNotIn(str(self.course.pk), self.client.session["cart"])
+        self.assertNotIn(self.course.pk, cart_course_ids(self.client))
 
     def test_checkout_view_enrolls_user_in_courses_and_clears_cart(self):
         self.client.force_login(self.student)
@@ -304,14 +312,88 @@ class CheckoutViewTests(TestCase):
         self.assertEqual(enrollment.first().student, self.student)
         self.assertEqual(enrolled_course.first().student, self.student)
 
+        # assert the course student count is updated
+        self.assertEqual(CourseStats.objects.get(course=self.course).student_count, 1)
+
         # assert cart is cleared on successful enrollment
-        self.assertEqual(self.client.session["cart"], {})
+        self.assertEqual(cart_course_ids(self.client), set())
 
         # assert success messages show to the user
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(len(messages), 1)
         self.assertEqual(str(messages[0]), "Enrollment successful. Thank you!")
 
+    def create_courses(self, count):
+        return [
+            Course.objects.create(
+                owner=self.teacher,
+                title=f"Bulk Course {i}",
+                category=self.category,
+                overview="The overview of a bulk course.",
+                language="English",
+                old_price=150,
+                price=100,
+            )
+            for i in range(count)
+        ]
+
+    def test_checkout_view_removes_all_enrolled_courses_at_once(self):
+        courses = self.create_courses(3)
+        enrollCourses(courses[:2], 200, self.student)
+        self.client.force_login(self.student)
+        session = self.client.session
+        session["cart"] = {str(course.pk): 1 for course in courses}
+        session.save()
+
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse("checkout"))
+        self.assertEqual(len(list(get_messages(response.wsgi_request))), 2)
+        self.assertEqual(cart_course_ids(self.client), {courses[2].pk})
+
+    def test_enroll_courses_writes_everything_in_bulk(self):
+        courses = self.create_courses(5)
+        with self.assertNumQueries(8), self.captureOnCommitCallbacks() as callbacks:
+            enrolled = enrollCourses(courses, 500, self.student)
+        self.assertEqual(enrolled, sorted(course.pk for course in courses))
+        self.assertEqual(
+            EnrolledCourse.objects.filter(enrollment__student=self.student).count(), 5
+        )
+        self.assertEqual(CourseStats.objects.get(course=courses[0]).student_count, 1)
+        # the teachers are refreshed once for the whole test transaction
+        pending = [entry[1] for entry in connection.run_on_commit]
+        with mock.patch("courses.tasks.refresh_teacher_stats.delay") as delay:
+            with mock.patch("courses.tasks.refresh_student_recommendations.delay"):
+                for callback in pending + callbacks:
+                    callback()
+        delay.assert_called_once_with([self.teacher.pk])
+
+    def test_enroll_courses_skips_owned_courses(self):
+        courses = self.create_courses(2)
+        enrollCourses(courses[:1], 100, self.student)
+        self.assertEqual(enrollCourses(courses, 200, self.student), [courses[1].pk])
+        self.assertEqual(
+            Enrollment.objects.filter(student=self.student).latest("pk").amount, 100
+        )
+        self.assertEqual(CourseStats.objects.get(course=courses[0]).student_count, 1)
+
+    def test_repeated_submit_is_idempotent(self):
+        courses = self.create_courses(2)
+        enrollCourses(courses, 200, self.student)
+        self.assertEqual(enrollCourses(courses, 200, self.student), [])
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(EnrolledCourse.objects.filter(student=self.student).count(), 2)
+
+    def test_student_cannot_enroll_twice_in_a_course(self):
+        enrollment = Enrollment.objects.create(student=self.student, amount=150)
+        EnrolledCourse.objects.create(
+            enrollment=enrollment, student=self.student, course=self.course
+        )
+        with self.assertRaises(IntegrityError):
+            EnrolledCourse.objects.create(
+                enrollment=enrollment, student=self.student, course=self.course
+            )
+
+
 class DirectEnrollCourseViewTests(TestCase):
     def setUp(self):
         self.teacher = User.objects.create_user(
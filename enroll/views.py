@@ -1,108 +1,122 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
 
-from courses.models import Course
-from enroll.models import Coupon, EnrolledCourse, Enrollment
+from courses.models import Course, CourseStats, TeacherStats
+from courses.recommendations import queue_refresh
+from enroll import coupons
+from enroll.cart import get_cart
+from enroll.models import EnrolledCourse, Enrollment
 
 
 def addToCart(request):
     course_id = request.GET.get("course_id")
-    cart = request.session.get("cart")
     user = request.user
     course = get_object_or_404(Course, id=course_id)
     if user.is_authenticated and user.enrolled_courses.filter(course=course).exists():
         messages.info(request, "You are already enrolled for this course.")
         return redirect("my_courses")
-    if not cart:
-        cart = {course_id: 1}
-    elif not cart.get(course_id):
-        cart[course_id] = 1
+    get_cart(request).add(course.pk)
     messages.success(request, f"{course.title} added to cart successfully.")
-    request.session["cart"] = cart
     return redirect(course)
 
 
-def getCartTotal(request):
-    cart_courses = Course.get_courses_by_id(
-        list(request.session.get("cart").keys()))
-    cart_total = sum(course.price for course in cart_courses)
-    return (cart_courses, cart_total)
-
-
 def cart(request):
     context = {"page_title": "Cart"}
-    if request.session.get("cart"):
-        cart_courses, cart_total = getCartTotal(request)
-        context["cart_courses"] = cart_courses
-        context["cart_total"] = cart_total
-
+    cart = get_cart(request)
+    if cart:
         if course_id := request.GET.get("course_id"):
-            request.session.get("cart").pop(course_id)
-            request.session.save()
+            cart.remove(course_id)
             messages.info(request, "Course removed from cart successfully.")
             return redirect("cart")
+        context["cart_courses"] = cart.courses()
+        context["cart_total"] = cart.total
+        context["coupon"], context["discount"] = couponDiscount(
+            request, context["cart_total"]
+        )
+        context["amount_due"] = context["cart_total"] - context["discount"]
     return render(request, "cart.html", context)
 
 
 @login_required
 def applyCoupon(request):
+    url = request.META.get("HTTP_REFERER")
+    if not url_has_allowed_host_and_scheme(url, allowed_hosts={request.get_host()}):
+        url = reverse("cart")
+    if request.method == "POST":
+        try:
+            coupon = coupons.get_coupon(request.POST.get("coupon_code"), request.user)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            request.session[coupons.SESSION_KEY] = coupon.code
+            messages.info(request, "Your cart balance updated successfully.")
+    return redirect(url)
+
+
+def couponDiscount(request, total):
     """
-    TODO : implement after creating a Cart Model
+    The discount of the coupon applied to the cart, dropping it if it is no
+    longer valid.
     """
-    pass
-    # try:
-    #     url = request.META.get("HTTP_REFERER")
-    #     if request.method == "POST":
-    #         coupon = Coupon.objects.get(
-    #             code=request.POST.get("coupon_code"), user=request.user
-    #         )
-    #         if not coupon or coupon.is_used:
-    #             messages.error(request, "Your coupon code is invalid.")
-    #         else:
-    #             _, cart_total = getCartTotal(request)
-    #             if coupon.discount > cart_total:
-    #                 coupon_bal = coupon.discount - cart_total
-    #                 cart_total = 0
-    #                 coupon.user = request.user
-    #                 coupon.discount = coupon_bal
-    #             else:
-    #                 cart_total -= coupon.discount
-    #                 coupon.user = request.user
-    #                 coupon.is_used = True
-    #             coupon.save()
-    #             messages.info(request, "Your cart balance updated successfully.")
-    #         return redirect(url)
-    # except Coupon.DoesNotExist:
-    #     messages.info(request, "The coupon code you entered is invalid.")
-    #     return redirect(url)
-    # except Exception as e:
-    #     print(e)
-    #     return redirect("cart")
+    code = request.session.get(coupons.SESSION_KEY)
+    if not code or not request.user.is_authenticated:
+        return None, 0
+    try:
+        coupon = coupons.get_coupon(code, request.user)
+    except ValidationError as e:
+        request.session.pop(coupons.SESSION_KEY)
+        messages.error(request, e.messages[0])
+        return None, 0
+    return coupon, coupon.discount_for(total)
 
 
 @login_required
 def checkout(request):
     user = request.user
-    if request.session.get("cart"):
-        cart_courses, cart_total = getCartTotal(request)
-
-        for course in cart_courses:
-            if EnrolledCourse.objects.filter(student=user, course=course).exists():
-                request.session.get("cart").pop(str(course.pk))
-                request.session.save()
-                messages.info(
-                    request,
-                    f"{course.title } removed. You are enrolled for the course already!",
-                )
-                return redirect("checkout")
+    cart = get_cart(request)
+    cart_courses, cart_total = cart.lines()
+    if cart_courses:
+        owned = set(
+            EnrolledCourse.objects.filter(
+                student=user, course__in=cart_courses
+            ).values_list("course_id", flat=True)
+        )
+        if owned:
+            cart.remove(*owned)
+            for course in cart_courses:
+                if course.pk in owned:
+                    messages.info(
+                        request,
+                        f"{course.title } removed. You are enrolled for the course already!",
+                    )
+            return redirect("checkout")
         if request.method == "POST":
             phone = request.POST.get("phone")  # Use for M-Pesa integration.
-            enrollCourses(cart_courses, cart_total, user)
-            request.session["cart"] = {}
-            messages.success(request, "Enrollment successful. Thank you!")
+            try:
+                enrolled = enrollCourses(
+                    cart_courses,
+                    cart_total,
+                    user,
+                    coupon_code=request.session.get(coupons.SESSION_KEY),
+                )
+            except ValidationError as e:
+                request.session.pop(coupons.SESSION_KEY, None)
+                messages.error(request, e.messages[0])
+                return redirect("checkout")
+            if enrolled:
+                messages.success(request, "Enrollment successful. Thank you!")
+            else:
+                messages.info(request, "You are enrolled for these courses already!")
+            cart.clear()
+            request.session.pop(coupons.SESSION_KEY, None)
             return redirect("my_courses")
 
+        coupon, discount = couponDiscount(request, cart_total)
         return render(
             request,
             "checkout.html",
@@ -110,6 +124,9 @@ def checkout(request):
                 "page_title": "Checkout",
                 "cart_courses": cart_courses,
                 "cart_total": cart_total,
+                "coupon": coupon,
+                "discount": discount,
+                "amount_due": cart_total - discount,
             },
         )
     else:
@@ -117,13 +134,47 @@ def checkout(request):
         return redirect("courses")
 
 
-def enrollCourses(cart_courses, total, user):
-    enrollment = Enrollment(student=user, amount=total)
-    enrollment.save()
-    for course in cart_courses:
-        EnrolledCourse.objects.create(
-            enrollment=enrollment, student=user, course=course
+def enrollCourses(courses, total, user, coupon_code=None):
+    """
+    Enroll `user` in `courses` in one transaction and return the ids of the
+    courses actually enrolled. Courses the user already owns (e.g. from a
+    concurrent or repeated submit) are skipped by the unique constraint and
+    not charged; if nothing is left the enrollment is rolled back. A coupon
+    is redeemed against the amount charged, a ValidationError from it rolls
+    everything back.
+    """
+    with transaction.atomic():
+        enrollment = Enrollment.objects.create(student=user, amount=total)
+        EnrolledCourse.objects.bulk_create(
+            [
+                EnrolledCourse(enrollment=enrollment, student=user, course=course)
+                for course in courses
+            ],
+            ignore_conflicts=True,
+        )
+        enrolled = set(
+            EnrolledCourse.objects.filter(enrollment=enrollment).values_list(
+                "course_id", flat=True
+            )
         )
+        if not enrolled:
+            transaction.set_rollback(True)
+            return []
+        amount = total - sum(
+            course.price for course in courses if course.pk not in enrolled
+        )
+
+        # bulk_create doesn't send post_save
+        CourseStats.add_students(enrolled)
+        TeacherStats.queue_refresh(TeacherStats.teachers_of(enrolled))
+        queue_refresh(user.pk, sorted(enrolled))
+
+        if coupon_code:
+            # redeemed last, the coupon row stays locked until the commit
+            amount -= coupons.redeem(coupon_code, user, amount, enrollment).amount
+        if amount != total:
+            Enrollment.objects.filter(pk=enrollment.pk).update(amount=amount)
+    return sorted(enrolled)
 
 
 @login_required
@@ -131,16 +182,10 @@ def directCourseEnroll(request, course_slug):
     course = get_object_or_404(Course, slug=course_slug)
     user = request.user
     if request.method == 'POST':
-        # check if user is already enrolled in the course
-        if not EnrolledCourse.objects.filter(student=user, course=course).exists():
-            phone = request.POST['phone']
-            enrollment = Enrollment.objects.create(
-                student=user, amount=course.price)
-            EnrolledCourse.objects.create(
-                enrollment=enrollment, student=user, course=course)
+        phone = request.POST['phone']
+        if enrollCourses([course], course.price, user):
             messages.success(
                 request, 'You have successfully enrolled in the course.')
-            return redirect("my_courses")
         else:
             messages.info(request, 'You are already enrolled in this course.')
 
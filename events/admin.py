@@ -1,10 +1,27 @@
 from django.contrib import admin
 
-from .models import Event, EventObjective, EventTag, EventTicket, Objective, Sponsor
+from .models import (
+    Event,
+    EventInventory,
+    EventObjective,
+    EventTag,
+    EventTicket,
+    Objective,
+    Sponsor,
+    TicketHold,
+    WaitlistEntry,
+)
 
 
 class EventAdmin(admin.ModelAdmin):
-    list_display = ["title", "organiser", "start_date", "end_date", "created"]
+    list_display = [
+        "title",
+        "organiser",
+        "start_date",
+        "end_date",
+        "capacity",
+        "created",
+    ]
     search_fields = ["title"]
     prepopulated_fields = {"slug": ("title",)}
 
@@ -15,3 +32,6 @@ admin.site.register(Objective)
 admin.site.register(EventTag)
 admin.site.register(Sponsor)
 admin.site.register(EventTicket)
+admin.site.register(EventInventory)
+admin.site.register(TicketHold)
+admin.site.register(WaitlistEntry)
@@ -0,0 +1,155 @@
+"""
+Ticket check-in at the door.
+
+A valid ticket costs a single conditional UPDATE on its unique `ticket_id`.
+When the cache is shared by every process (see `utils.cache`), scans are
+also validated against a cached set of the event's ticket ids, so unknown or
+foreign tickets are turned away without a query, and the organiser of an
+event is cached by slug. Both are invalidated on commit by `events.signals`.
+Without a shared cache a deleted key would only be gone from one process,
+so nothing is cached and unknown tickets are looked up in the database.
+
+For venues with poor connectivity organisers download a manifest (the
+event's sorted 16-byte ticket ids), scan against it offline with a binary
+search and upload the check-ins afterwards to `sync_check_ins`.
+"""
+import base64
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from utils.cache import is_shared
+
+from .models import Event, EventTicket
+
+CHECKED_IN = "checked_in"
+ALREADY_CHECKED_IN = "already_checked_in"
+INVALID = "invalid"
+
+
+def event_key(slug):
+    return f"checkin:event:{slug}"
+
+
+def tickets_key(event_id):
+    return f"checkin:tickets:{event_id}"
+
+
+def get_event(slug):
+    """
+    (id, organiser id) of the event with `slug`, or None.
+    """
+    shared = is_shared()
+    event = cache.get(event_key(slug)) if shared else None
+    if event is None:
+        event = (
+            Event.objects.filter(slug=slug).values_list("pk", "organiser_id").first()
+        )
+        if event is None:
+            return None
+        if shared:
+            cache.set(event_key(slug), event, settings.CHECK_IN_CACHE_TIMEOUT)
+    return event
+
+
+def invalidate_events(*slugs):
+    transaction.on_commit(lambda: cache.delete_many([event_key(s) for s in slugs]))
+
+
+def ticket_ids(event_id):
+    """
+    The `ticket_id.bytes` of every ticket of the event, or None unless the
+    cache is shared.
+    """
+    if not is_shared():
+        return None
+    ids = cache.get(tickets_key(event_id))
+    if ids is None:
+        ids = frozenset(
+            ticket_id.bytes
+            for ticket_id in EventTicket.objects.filter(event_id=event_id).values_list(
+                "ticket_id", flat=True
+            )
+        )
+        cache.set(tickets_key(event_id), ids, settings.CHECK_IN_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_ticket_ids(event_id):
+    transaction.on_commit(lambda: cache.delete(tickets_key(event_id)))
+
+
+def check_in(event_id, ticket_id):
+    """
+    Check a ticket in. Returns the status and the time of the check-in.
+    """
+    known = ticket_ids(event_id)
+    if known is not None and ticket_id.bytes not in known:
+        return INVALID, None
+    now = timezone.now()
+    tickets = EventTicket.objects.filter(event_id=event_id, ticket_id=ticket_id)
+    if tickets.filter(checked_in__isnull=True).update(checked_in=now):
+        return CHECKED_IN, now
+    checked_in = tickets.values_list("checked_in", flat=True).first()
+    if checked_in is None:
+        return INVALID, None
+    return ALREADY_CHECKED_IN, checked_in
+
+
+def sync_check_ins(event_id, check_ins):
+    """
+    Record check-ins made offline, given as {ticket_id: time}. Tickets that
+    were already checked in keep their first check-in.
+    """
+    known = ticket_ids(event_id)
+    if known is None:
+        known = {
+            ticket_id.bytes
+            for ticket_id in EventTicket.objects.filter(
+                event_id=event_id, ticket_id__in=check_ins
+            ).values_list("ticket_id", flat=True)
+        }
+    valid = {
+        ticket_id: at for ticket_id, at in check_ins.items() if ticket_id.bytes in known
+    }
+    with transaction.atomic():
+        tickets = list(
+            EventTicket.objects.select_for_update()
+            .filter(ticket_id__in=valid, checked_in__isnull=True)
+            .only("pk", "ticket_id")
+        )
+        for ticket in tickets:
+            ticket.checked_in = valid[ticket.ticket_id]
+        EventTicket.objects.bulk_update(tickets, ["checked_in"], batch_size=500)
+    checked_in = {ticket.ticket_id for ticket in tickets}
+    return {
+        CHECKED_IN: len(checked_in),
+        ALREADY_CHECKED_IN: sorted(str(t) for t in valid.keys() - checked_in),
+        INVALID: sorted(str(t) for t in check_ins.keys() - valid.keys()),
+    }
+
+
+def encode(ids):
+    return base64.b64encode(b"".join(sorted(ids))).decode()
+
+
+def manifest(event_id):
+    """
+    The event's ticket ids and the ones checked in so far, each as the
+    base64 of the sorted, concatenated 16-byte ids.
+    """
+    tickets, checked_in = [], []
+    for ticket_id, at in EventTicket.objects.filter(event_id=event_id).values_list(
+        "ticket_id", "checked_in"
+    ):
+        tickets.append(ticket_id.bytes)
+        if at is not None:
+            checked_in.append(ticket_id.bytes)
+    return {
+        "count": len(tickets),
+        "generated": timezone.now().isoformat(),
+        "ticket_ids": encode(tickets),
+        "checked_in": encode(checked_in),
+    }
@@ -0,0 +1,153 @@
+"""
+Calendar feeds of upcoming events, as iCalendar and JSON.
+
+Feeds are cursor-paginated (`EVENT_FEED_PAGE_SIZE` events per page, with a
+`Link: rel="next"` header) and streamed while they are serialised. Their
+ETag is derived from today's date, the page asked for and a fingerprint of
+the upcoming events (count and last update), cached for
+`EVENT_FEED_ETAG_TIMEOUT` seconds, so a calendar client polling an unchanged
+feed gets a 304 without a query most of the time.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Event
+
+FINGERPRINT_KEY = "events:feed:fingerprint"
+
+
+def fingerprint():
+    """
+    Changes whenever an upcoming event is added, edited, hidden or deleted.
+    """
+    key = f"{FINGERPRINT_KEY}:{timezone.localdate()}"
+    value = cache.get(key)
+    if value is None:
+        stats = Event.upcoming().aggregate(count=Count("pk"), updated=Max("updated"))
+        value = f"{stats['count']}:{stats['updated'] and stats['updated'].timestamp()}"
+        cache.set(key, value, settings.EVENT_FEED_ETAG_TIMEOUT)
+    return value
+
+
+def feed_etag(request, format):
+    key = ":".join(
+        [
+            format,
+            fingerprint(),
+            request.GET.get("cursor", ""),
+            request.GET.get("page", ""),
+        ]
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def event_times(event):
+    """
+    Start and end as iCalendar values: UTC date-times, or dates for events
+    without times (the end date of an all-day event is exclusive).
+    """
+    if event.start_time is None or event.end_time is None:
+        return (
+            f";VALUE=DATE:{event.start_date:%Y%m%d}",
+            f";VALUE=DATE:{event.end_date + timedelta(days=1):%Y%m%d}",
+        )
+    start, end = (
+        timezone.make_aware(datetime.combine(date, time)).astimezone(dt_timezone.utc)
+        for date, time in (
+            (event.start_date, event.start_time),
+            (event.end_date, event.end_time),
+        )
+    )
+    return f":{start:%Y%m%dT%H%M%SZ}", f":{end:%Y%m%dT%H%M%SZ}"
+
+
+def escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """
+    Split a content line into chunks of at most 75 octets (RFC 5545 3.1).
+    """
+    chunks, chunk, size = [], "", 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            chunks.append(chunk)
+            chunk, size = " ", 1
+        chunk += char
+        size += width
+    chunks.append(chunk)
+    return "\r\n".join(chunks) + "\r\n"
+
+
+def ics_lines(events, request):
+    host = request.get_host().split(":")[0]
+    stamp = f"{timezone.now().astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield f"PRODID:-//{host}//Events//EN"
+    yield "CALSCALE:GREGORIAN"
+    for event in events:
+        start, end = event_times(event)
+        yield "BEGIN:VEVENT"
+        yield f"UID:event-{event.pk}@{host}"
+        yield f"DTSTAMP:{stamp}"
+        yield f"DTSTART{start}"
+        yield f"DTEND{end}"
+        yield f"SUMMARY:{escape(event.title)}"
+        yield f"LOCATION:{escape(event.venue)}"
+        yield f"DESCRIPTION:{escape(strip_tags(event.description))}"
+        yield f"URL:{request.build_absolute_uri(event.get_absolute_url())}"
+        yield "END:VEVENT"
+    yield "END:VCALENDAR"
+
+
+def ics_stream(events, request, next_url):
+    for line in ics_lines(events, request):
+        yield fold(line)
+
+
+def event_json(event, request):
+    return {
+        "id": event.pk,
+        "title": event.title,
+        "url": request.build_absolute_uri(event.get_absolute_url()),
+        "venue": event.venue,
+        "start_date": event.start_date,
+        "start_time": event.start_time,
+        "end_date": event.end_date,
+        "end_time": event.end_time,
+        "price": event.price,
+    }
+
+
+def json_stream(events, request, next_url):
+    yield '{"events": ['
+    for i, event in enumerate(events):
+        yield ("," if i else "") + json.dumps(
+            event_json(event, request), cls=DjangoJSONEncoder
+        )
+    yield f'], "next": {json.dumps(next_url)}}}'
+
+
+# format: (content type, stream)
+FORMATS = {
+    "ics": ("text/calendar; charset=utf-8", ics_stream),
+    "json": ("application/json", json_stream),
+}
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0002_ticket_inventory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="eventticket",
+            name="checked_in",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
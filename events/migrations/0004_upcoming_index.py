@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_ticket_check_in"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["start_date"],
+                name="events_upcoming_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.2 on 2026-10-17 05:09
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def remove_duplicate_tickets(apps, schema_editor):
+    """
+    Keep one ticket per user and event, a checked in one if any, and put the
+    others back in the inventory of limited events.
+    """
+    EventInventory = apps.get_model("events", "EventInventory")
+    EventTicket = apps.get_model("events", "EventTicket")
+    duplicates = (
+        EventTicket.objects.values("user_id", "event_id")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        tickets = EventTicket.objects.filter(
+            user_id=row["user_id"], event_id=row["event_id"]
+        )
+        kept = tickets.order_by(F("checked_in").asc(nulls_last=True), "pk").first()
+        extra = tickets.exclude(pk=kept.pk)
+        removed = extra.count()
+        extra.delete()
+        EventInventory.objects.filter(event_id=row["event_id"]).update(
+            available=F("available") + removed
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0004_upcoming_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tickets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="eventticket",
+            constraint=models.UniqueConstraint(
+                fields=("user", "event"), name="event_tickets_user_event"
+            ),
+        ),
+    ]
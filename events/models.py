@@ -4,13 +4,14 @@ from datetime import datetime
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django_resized import ResizedImageField
 
 from courses.models import Category, Tag, TimeStampedModel
-from utils.utils import slug_generator
+from utils.utils import SlugMixin
 
 
-class Event(TimeStampedModel):
+class Event(SlugMixin, TimeStampedModel):
     organiser = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     slug = models.SlugField(max_length=150, unique=True)
@@ -26,16 +27,30 @@ class Event(TimeStampedModel):
     old_price = models.DecimalField(decimal_places=2, max_digits=9, default=0.0)
     price = models.DecimalField(decimal_places=2, max_digits=9)
     venue = models.CharField(max_length=200)
+    # tickets on sale, unlimited when empty (see events.tickets)
+    capacity = models.PositiveIntegerField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
     class Meta:
         db_table = "events"
+        indexes = [
+            models.Index(
+                fields=["start_date"],
+                condition=models.Q(is_active=True),
+                name="events_upcoming_idx",
+            )
+        ]
+
+    @classmethod
+    def upcoming(cls):
+        """
+        Active events starting today or later, by the date of the request
+        rather than the date the process started.
+        """
+        return cls.objects.filter(is_active=True, start_date__gte=timezone.localdate())
 
     def save(self, *args, **kwargs):
-        if self.slug is None or self.slug == "":
-            self.slug = slug_generator(self)
-        else:
-            self.slug = slug_generator(self, new_slug=self.slug)
+        self.allocate_slug()
         try:
             self.validate_event_time()
         except Exception as e:
@@ -123,9 +138,83 @@ class EventTicket(TimeStampedModel):
     )
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     amount = models.FloatField(default=0)
+    checked_in = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         db_table = "event_tickets"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "event"], name="event_tickets_user_event"
+            )
+        ]
 
     def __str__(self):
         return f"{self.ticket_id} : {self.event}"
+
+
+class EventInventory(models.Model):
+    """
+    Tickets of a limited event that are neither sold nor held. Reservations
+    take one with a conditional UPDATE on this row.
+    """
+
+    event = models.OneToOneField(
+        Event, on_delete=models.CASCADE, primary_key=True, related_name="inventory"
+    )
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "event_inventory"
+        verbose_name_plural = "Event inventories"
+
+    def __str__(self):
+        return f"{self.available} tickets left for {self.event}"
+
+
+class TicketHold(models.Model):
+    """
+    A ticket set aside for a user until `expires`, while they pay.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="ticket_holds"
+    )
+    expires = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "event_ticket_holds"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "user"], name="event_ticket_holds_event_user"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.event} held for {self.user} until {self.expires}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A user waiting for a sold out event. Entries are served in `id` order.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="waitlist")
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="waitlisted_events"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "event_waitlist"
+        ordering = ["id"]
+        verbose_name_plural = "Waitlist entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "user"], name="event_waitlist_event_user"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} waiting for {self.event}"
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .checkin import invalidate_events, invalidate_ticket_ids
+from .models import Event, EventTicket
+from .tickets import sync_inventory
+
+
+@receiver(post_save, sender=Event)
+def update_inventory(sender, instance, created, update_fields=None, **kwargs):
+    if created and instance.capacity is None:
+        return
+    if update_fields is None or "capacity" in update_fields:
+        sync_inventory(instance)
+
+
+@receiver(pre_save, sender=Event)
+def forget_event(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old_slug = Event.objects.filter(pk=instance.pk).values_list("slug", flat=True)
+    invalidate_events(instance.slug, *old_slug)
+
+
+@receiver(post_delete, sender=Event)
+def forget_deleted_event(sender, instance, **kwargs):
+    invalidate_events(instance.slug)
+
+
+@receiver(post_save, sender=EventTicket)
+def add_ticket_id(sender, instance, created, **kwargs):
+    if created:
+        invalidate_ticket_ids(instance.event_id)
+
+
+@receiver(post_delete, sender=EventTicket)
+def remove_ticket_id(sender, instance, **kwargs):
+    invalidate_ticket_ids(instance.event_id)
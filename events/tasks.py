@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from events.tickets import release_expired
+
+
+@shared_task
+def release_expired_ticket_holds():
+    return release_expired()
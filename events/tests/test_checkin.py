@@ -0,0 +1,202 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Category
+from events import checkin
+from events.models import Event, EventTicket
+
+User = get_user_model()
+now = datetime.now()
+evnt_end = now + timedelta(days=1)
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organiser = User.objects.create_user(
+            name="organiser",
+            email="organiser@mail.com",
+            username="organiser",
+            password="secret",
+        )
+        self.attendee = User.objects.create_user(
+            name="attendee",
+            email="attendee@mail.com",
+            username="attendee",
+            password="secret",
+        )
+        self.event = Event.objects.create(
+            organiser=self.organiser,
+            title="Test Event",
+            description="This is a test event",
+            banner="events/banners/default.jpg",
+            category=Category.objects.create(title="Category"),
+            start_date=now.date(),
+            end_date=evnt_end.date(),
+            start_time=now.time(),
+            end_time=evnt_end.time(),
+            old_price=100.00,
+            price=50.00,
+            venue="Test Venue",
+        )
+        attendees = [self.attendee] + [
+            User.objects.create_user(
+                name=f"attendee{i}",
+                email=f"attendee{i}@mail.com",
+                username=f"attendee{i}",
+                password="secret",
+            )
+            for i in range(1, 3)
+        ]
+        self.tickets = [
+            EventTicket.objects.create(user=attendee, event=self.event, amount=50)
+            for attendee in attendees
+        ]
+        self.client.force_login(self.organiser)
+
+    def scan(self, ticket_id):
+        return self.client.post(
+            reverse(
+                "check_in_ticket",
+                kwargs={"event_slug": self.event.slug, "ticket_id": ticket_id},
+            )
+        )
+
+    def test_scan_checks_a_ticket_in_once(self):
+        ticket = self.tickets[0]
+        response = self.scan(ticket.ticket_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], checkin.CHECKED_IN)
+        ticket.refresh_from_db()
+        self.assertIsNotNone(ticket.checked_in)
+
+        response = self.scan(ticket.ticket_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["status"], checkin.ALREADY_CHECKED_IN)
+
+    @mock.patch("events.checkin.is_shared", return_value=True)
+    def test_unknown_tickets_are_rejected_without_a_query(self, is_shared):
+        checkin.ticket_ids(self.event.pk)
+        with self.assertNumQueries(0):
+            status, _ = checkin.check_in(self.event.pk, uuid.uuid4())
+        self.assertEqual(status, checkin.INVALID)
+        with self.assertNumQueries(1):
+            status, _ = checkin.check_in(self.event.pk, self.tickets[0].ticket_id)
+        self.assertEqual(status, checkin.CHECKED_IN)
+        self.assertEqual(self.scan(uuid.uuid4()).status_code, 404)
+
+    @mock.patch("events.checkin.is_shared", return_value=True)
+    def test_new_tickets_are_added_to_the_cached_set(self, is_shared):
+        checkin.ticket_ids(self.event.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = EventTicket.objects.create(
+                user=self.organiser, event=self.event, amount=50
+            )
+        self.assertEqual(self.scan(ticket.ticket_id).status_code, 200)
+
+    def test_tickets_are_looked_up_without_a_shared_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tickets[0].delete()
+        self.assertEqual(self.scan(self.tickets[0].ticket_id).status_code, 404)
+        ticket = EventTicket.objects.create(
+            user=self.attendee, event=self.event, amount=50
+        )
+        self.assertEqual(self.scan(ticket.ticket_id).status_code, 200)
+        self.assertIsNone(cache.get(checkin.tickets_key(self.event.pk)))
+        self.assertIsNone(cache.get(checkin.event_key(self.event.slug)))
+
+    def test_tickets_of_other_events_are_rejected(self):
+        other = Event.objects.get(pk=self.event.pk)
+        other.pk = None
+        other.slug = "other-event"
+        other.save()
+        status, _ = checkin.check_in(other.pk, self.tickets[0].ticket_id)
+        self.assertEqual(status, checkin.INVALID)
+
+    @mock.patch("events.checkin.is_shared", return_value=True)
+    def test_cached_event_is_forgotten_when_the_organiser_changes(self, is_shared):
+        self.assertEqual(self.scan(self.tickets[0].ticket_id).status_code, 200)
+        old_slug = self.event.slug
+        self.event.organiser = self.attendee
+        self.event.slug = "renamed-event"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertIsNone(cache.get(checkin.event_key(old_slug)))
+        response = self.client.post(
+            reverse(
+                "check_in_ticket",
+                kwargs={
+                    "event_slug": old_slug,
+                    "ticket_id": self.tickets[1].ticket_id,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.scan(self.tickets[1].ticket_id).status_code, 403)
+
+    def test_only_organisers_can_scan(self):
+        self.client.force_login(self.attendee)
+        self.assertEqual(self.scan(self.tickets[0].ticket_id).status_code, 403)
+        response = self.client.get(
+            reverse("ticket_manifest", kwargs={"event_slug": self.event.slug})
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_manifest_lists_sorted_ticket_ids(self):
+        self.scan(self.tickets[1].ticket_id)
+        response = self.client.get(
+            reverse("ticket_manifest", kwargs={"event_slug": self.event.slug})
+        )
+        manifest = response.json()
+        self.assertEqual(manifest["count"], 3)
+        ids = base64.b64decode(manifest["ticket_ids"])
+        self.assertEqual(
+            [ids[i : i + 16] for i in range(0, len(ids), 16)],
+            sorted(ticket.ticket_id.bytes for ticket in self.tickets),
+        )
+        self.assertEqual(
+            base64.b64decode(manifest["checked_in"]), self.tickets[1].ticket_id.bytes
+        )
+
+    def test_sync_records_offline_check_ins(self):
+        self.scan(self.tickets[0].ticket_id)
+        unknown = uuid.uuid4()
+        response = self.client.post(
+            reverse("sync_check_ins", kwargs={"event_slug": self.event.slug}),
+            json.dumps(
+                {
+                    "check_ins": [
+                        {"ticket_id": str(ticket.ticket_id), "at": "2030-01-01T09:00"}
+                        for ticket in self.tickets[:2]
+                    ]
+                    + [{"ticket_id": str(unknown)}]
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                checkin.CHECKED_IN: 1,
+                checkin.ALREADY_CHECKED_IN: [str(self.tickets[0].ticket_id)],
+                checkin.INVALID: [str(unknown)],
+            },
+        )
+        self.tickets[1].refresh_from_db()
+        self.assertEqual(self.tickets[1].checked_in.year, 2030)
+
+    def test_sync_rejects_malformed_payloads(self):
+        response = self.client.post(
+            reverse("sync_check_ins", kwargs={"event_slug": self.event.slug}),
+            json.dumps({"check_ins": [{"ticket_id": "nope"}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Category
+from events.feeds import fold
+from events.models import Event
+
+User = get_user_model()
+now = datetime.now()
+evnt_end = now + timedelta(days=1)
+
+
+class EventFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            name="testuser",
+            email="testuser@mail.com",
+            username="testuser",
+            password="secret",
+        )
+        self.category = Category.objects.create(title="Category")
+        self.events = [self.create_event(f"Test Event {i}") for i in range(3)]
+
+    def create_event(self, title, **kwargs):
+        fields = {
+            "organiser": self.user,
+            "title": title,
+            "description": "<p>A test event; with, punctuation</p>",
+            "banner": "events/banners/default.jpg",
+            "category": self.category,
+            "start_date": now.date(),
+            "end_date": evnt_end.date(),
+            "start_time": time(9),
+            "end_time": time(17),
+            "old_price": 100.00,
+            "price": 50.00,
+            "venue": "Test Venue",
+        }
+        fields.update(kwargs)
+        return Event.objects.create(**fields)
+
+    def test_ics_feed(self):
+        response = self.client.get(reverse("events_ics_feed"))
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 3)
+        self.assertIn(f"UID:event-{self.events[0].pk}@testserver", body)
+        # 09:00 in Nairobi (UTC+3)
+        self.assertIn(f"DTSTART:{now:%Y%m%d}T060000Z", body)
+        self.assertIn("DESCRIPTION:A test event\\; with\\, punctuation", body)
+
+    def test_all_day_events(self):
+        Event.objects.filter(pk=self.events[0].pk).update(start_time=None)
+        response = self.client.get(reverse("events_ics_feed"))
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn(f"DTSTART;VALUE=DATE:{now:%Y%m%d}", body)
+        self.assertIn(f"DTEND;VALUE=DATE:{evnt_end + timedelta(days=1):%Y%m%d}", body)
+
+    def test_long_lines_are_folded(self):
+        line = "DESCRIPTION:" + "é" * 100
+        folded = fold(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split("\r\n")))
+        self.assertEqual(folded.replace("\r\n ", "").rstrip("\r\n"), line)
+
+    def test_json_feed_is_paginated(self):
+        with self.settings(EVENT_FEED_PAGE_SIZE=2):
+            response = self.client.get(reverse("events_json_feed"))
+            data = json.loads(b"".join(response.streaming_content))
+            self.assertEqual(
+                [e["id"] for e in data["events"]], [e.pk for e in self.events[:2]]
+            )
+            self.assertEqual(response["Link"], f'<{data["next"]}>; rel="next"')
+
+            response = self.client.get(data["next"])
+            data = json.loads(b"".join(response.streaming_content))
+            self.assertEqual([e["id"] for e in data["events"]], [self.events[2].pk])
+            self.assertIsNone(data["next"])
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get(reverse("events_ics_feed"))
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse("events_ics_feed"), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        self.create_event("Another Event")
+        cache.clear()
+        response = self.client.get(reverse("events_ics_feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_past_and_inactive_events_are_left_out(self):
+        self.create_event("Hidden Event", is_active=False)
+        Event.objects.filter(pk=self.events[0].pk).update(
+            start_date=now.date() - timedelta(days=1)
+        )
+        response = self.client.get(reverse("events_json_feed"))
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [e["id"] for e in data["events"]], [e.pk for e in self.events[1:]]
+        )
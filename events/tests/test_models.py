@@ -215,6 +215,12 @@ class EventTicketModelTests(TestCase):
             username="testuser",
             password="secret",
         )
+        self.other_user = User.objects.create_user(
+            name="otheruser",
+            email="otheruser@mail.com",
+            username="otheruser",
+            password="secret",
+        )
         self.category = Category.objects.create(title="Category")
         self.event = Event.objects.create(
             organiser=self.user,
@@ -234,7 +240,7 @@ class EventTicketModelTests(TestCase):
             user=self.user, event=self.event, amount=50
         )
         self.ticket2 = EventTicket.objects.create(
-            user=self.user, event=self.event, amount=100
+            user=self.other_user, event=self.event, amount=100
         )
 
     def test_event_ticket_creation(self):
@@ -249,7 +255,7 @@ class EventTicketModelTests(TestCase):
 
     def test_event_ticket_user_relationship(self):
         self.assertEqual(self.ticket1.user, self.user)
-        self.assertEqual(self.ticket2.user, self.user)
+        self.assertEqual(self.ticket2.user, self.other_user)
 
     def test_event_ticket_event_relationship(self):
         self.assertEqual(self.ticket1.event, self.event)
@@ -257,11 +263,25 @@ class EventTicketModelTests(TestCase):
 
     def test_event_ticket_unique_ticket_id(self):
         ticket_id = self.ticket1.ticket_id
+        user = User.objects.create_user(
+            name="thirduser",
+            email="thirduser@mail.com",
+            username="thirduser",
+            password="secret",
+        )
         with self.assertRaises(IntegrityError) as cm:
             EventTicket.objects.create(
-                user=self.user, event=self.event, amount=150, ticket_id=ticket_id
+                user=user,
+                event=self.event,
+                amount=150,
+                ticket_id=ticket_id,
             )
         self.assertEqual(
             str(cm.exception),
             f'duplicate key value violates unique constraint "event_tickets_ticket_id_key"\nDETAIL:  Key (ticket_id)=({ticket_id}) already exists.\n',
         )
+
+    def test_event_ticket_unique_user_and_event(self):
+        with self.assertRaises(IntegrityError) as cm:
+            EventTicket.objects.create(user=self.user, event=self.event, amount=50)
+        self.assertIn('"event_tickets_user_event"', str(cm.exception))
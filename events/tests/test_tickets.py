@@ -0,0 +1,225 @@
+import threading
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Category
+from events import tickets
+from events.models import (
+    Event,
+    EventInventory,
+    EventTicket,
+    TicketHold,
+    WaitlistEntry,
+)
+from events.tasks import release_expired_ticket_holds
+
+User = get_user_model()
+now = datetime.now()
+evnt_end = now + timedelta(days=1)
+
+
+def create_event(capacity, **kwargs):
+    organiser = User.objects.create_user(
+        name="organiser",
+        email="organiser@mail.com",
+        username="organiser",
+        password="secret",
+    )
+    return Event.objects.create(
+        organiser=organiser,
+        title="Test Event",
+        description="This is a test event",
+        banner="events/banners/default.jpg",
+        category=Category.objects.create(title="Category"),
+        start_date=now.date(),
+        end_date=evnt_end.date(),
+        # enrollEvent only sells tickets to events starting later in the day
+        start_time=time(23, 59, 59),
+        end_time=evnt_end.time(),
+        old_price=100.00,
+        price=50.00,
+        venue="Test Venue",
+        capacity=capacity,
+        **kwargs,
+    )
+
+
+def create_users(count):
+    return [
+        User.objects.create_user(
+            name=f"user {i}",
+            email=f"user{i}@mail.com",
+            username=f"user{i}",
+            password="secret",
+        )
+        for i in range(count)
+    ]
+
+
+def expire(*holds):
+    TicketHold.objects.filter(pk__in=[hold.pk for hold in holds]).update(
+        expires=timezone.now() - timedelta(seconds=1)
+    )
+
+
+class TicketInventoryTests(TestCase):
+    def setUp(self):
+        self.event = create_event(capacity=2)
+        self.users = create_users(4)
+
+    def test_unlimited_event_has_no_inventory(self):
+        self.event.capacity = None
+        self.event.save()
+        self.assertIsNone(tickets.tickets_left(self.event))
+        self.assertIsNotNone(tickets.reserve(self.event, self.users[0]))
+
+    def test_reserve_until_sold_out_then_waitlist(self):
+        first = tickets.reserve(self.event, self.users[0])
+        self.assertEqual(tickets.reserve(self.event, self.users[0]), first)
+        self.assertIsNotNone(tickets.reserve(self.event, self.users[1]))
+        self.assertEqual(tickets.tickets_left(self.event), 0)
+        self.assertIsNone(tickets.reserve(self.event, self.users[2]))
+        self.assertIsNone(tickets.reserve(self.event, self.users[2]))
+        self.assertEqual(
+            list(WaitlistEntry.objects.values_list("user", flat=True)),
+            [self.users[2].pk],
+        )
+
+    def test_confirm_turns_a_live_hold_into_a_ticket(self):
+        hold = tickets.reserve(self.event, self.users[0])
+        ticket = tickets.confirm(hold, 50)
+        self.assertEqual((ticket.user, ticket.event), (self.users[0], self.event))
+        self.assertFalse(TicketHold.objects.exists())
+        expired = tickets.reserve(self.event, self.users[1])
+        expire(expired)
+        self.assertIsNone(tickets.confirm(expired, 50))
+
+    def test_second_ticket_of_a_user_goes_back_on_sale(self):
+        ticket = tickets.confirm(tickets.reserve(self.event, self.users[0]), 50)
+        # a concurrent submit that got past the view's check
+        hold = tickets.reserve(self.event, self.users[0])
+        self.assertEqual(tickets.tickets_left(self.event), 0)
+        self.assertEqual(tickets.confirm(hold, 50), ticket)
+        self.assertEqual(EventTicket.objects.count(), 1)
+        self.assertFalse(TicketHold.objects.exists())
+        self.assertEqual(tickets.tickets_left(self.event), 1)
+
+    def test_lapsed_holds_go_to_the_waitlist_in_order(self):
+        holds = [tickets.reserve(self.event, user) for user in self.users[:2]]
+        for user in self.users[2:]:
+            tickets.reserve(self.event, user)
+        expire(holds[0])
+        self.assertEqual(release_expired_ticket_holds(), 0)
+        self.assertEqual(
+            set(TicketHold.objects.values_list("user", flat=True)),
+            {self.users[1].pk, self.users[2].pk},
+        )
+        expire(holds[1])
+        tickets.release_expired()
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(tickets.tickets_left(self.event), 0)
+
+    def test_hold_removes_the_waitlist_entry(self):
+        for user in self.users[:3]:
+            tickets.reserve(self.event, user)
+        EventInventory.objects.filter(event=self.event).update(available=1)
+        self.assertIsNotNone(tickets.reserve(self.event, self.users[2]))
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_release_skips_waitlisted_holders(self):
+        holds = [tickets.reserve(self.event, user) for user in self.users[:2]]
+        for user in self.users[2:]:
+            tickets.reserve(self.event, user)
+        # holding or owning a ticket, however it happened
+        EventTicket.objects.create(user=self.users[2], event=self.event, amount=50)
+        TicketHold.objects.create(
+            user=self.users[3], event=self.event, expires=tickets.hold_expiry()
+        )
+        expire(holds[0])
+        self.assertEqual(tickets.release_expired(), 1)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(tickets.tickets_left(self.event), 1)
+
+    def test_lapsed_holds_go_back_on_sale(self):
+        hold = tickets.reserve(self.event, self.users[0])
+        tickets.reserve(self.event, self.users[1])
+        expire(hold)
+        # released on the spot instead of waitlisting the buyer
+        self.assertIsNotNone(tickets.reserve(self.event, self.users[2]))
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_capacity_change_recounts_and_promotes(self):
+        tickets.confirm(tickets.reserve(self.event, self.users[0]), 50)
+        tickets.reserve(self.event, self.users[1])
+        tickets.reserve(self.event, self.users[2])
+        self.event.capacity = 4
+        self.event.save()
+        self.assertTrue(TicketHold.objects.filter(user=self.users[2]).exists())
+        self.assertEqual(tickets.tickets_left(self.event), 1)
+
+    def test_sold_out_event_page_offers_the_waitlist(self):
+        for user in self.users[:2]:
+            tickets.reserve(self.event, user)
+        self.client.force_login(self.users[2])
+        response = self.client.post(
+            reverse("buy_event_ticket", kwargs={"event_slug": self.event.slug})
+        )
+        self.assertRedirects(response, self.event.get_absolute_url())
+        self.assertFalse(EventTicket.objects.exists())
+        response = self.client.get(self.event.get_absolute_url())
+        self.assertTrue(response.context["waitlisted"])
+        self.assertEqual(response.context["tickets_left"], 0)
+
+
+class TicketConcurrencyTests(TransactionTestCase):
+    def test_concurrent_buyers_never_oversell(self):
+        event = create_event(capacity=5)
+        users = create_users(20)
+        barrier = threading.Barrier(len(users))
+
+        def buy(user):
+            try:
+                barrier.wait()
+                hold = tickets.reserve(event, user)
+                if hold is not None:
+                    tickets.confirm(hold, 50)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(EventTicket.objects.filter(event=event).count(), 5)
+        self.assertEqual(WaitlistEntry.objects.filter(event=event).count(), 15)
+        self.assertEqual(tickets.tickets_left(event), 0)
+
+    def test_concurrent_submits_of_a_user_buy_one_ticket(self):
+        event = create_event(capacity=5)
+        [user] = create_users(1)
+        barrier = threading.Barrier(8)
+
+        def buy():
+            try:
+                barrier.wait()
+                hold = tickets.reserve(event, user)
+                if hold is not None:
+                    tickets.confirm(hold, 50)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(EventTicket.objects.filter(event=event).count(), 1)
+        self.assertEqual(tickets.tickets_left(event), 4)
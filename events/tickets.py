@@ -0,0 +1,207 @@
+"""
+Event ticket inventory.
+
+A limited event (one with a `capacity`) keeps its unsold, unheld tickets in
+an `EventInventory` counter row. `reserve` takes one with
+
+    UPDATE event_inventory SET available = available - 1
+    WHERE event_id = ... AND available > 0
+
+which either takes a ticket or matches nothing, and records a `TicketHold`
+in the same transaction. Concurrent buyers only wait on that row for the
+length of one statement, nothing is locked table-wide. When nothing is left
+the buyer joins the event's waitlist.
+
+A hold becomes a ticket through `confirm`, or lapses after
+EVENT_TICKET_HOLD_MINUTES. `release_expired` gives lapsed tickets to the
+head of the waitlist as new holds and puts the rest back in the inventory.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Event, EventInventory, EventTicket, TicketHold, WaitlistEntry
+
+
+def hold_expiry():
+    return timezone.now() + timezone.timedelta(
+        minutes=settings.EVENT_TICKET_HOLD_MINUTES
+    )
+
+
+def take(event):
+    """
+    Take one ticket from the inventory; always succeeds for unlimited events.
+    """
+    if event.capacity is None:
+        return True
+    return bool(
+        EventInventory.objects.filter(event=event, available__gt=0).update(
+            available=F("available") - 1
+        )
+    )
+
+
+def reserve(event, user):
+    """
+    Hold a ticket of `event` for `user`. Returns the hold, or None when the
+    event is sold out and the user was put on its waitlist.
+    """
+    hold = TicketHold.objects.filter(event=event, user=user).first()
+    if hold is not None:
+        if hold.expires > timezone.now():
+            return hold
+        release_expired(event.pk)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                if take(event):
+                    WaitlistEntry.objects.filter(event=event, user=user).delete()
+                    return TicketHold.objects.create(
+                        event=event, user=user, expires=hold_expiry()
+                    )
+        except IntegrityError:
+            # a concurrent request of the same user got a hold first
+            return TicketHold.objects.get(event=event, user=user)
+        # sold out, unless lapsed holds are waiting to be released
+        if attempt or not release_expired(event.pk):
+            break
+    WaitlistEntry.objects.bulk_create(
+        [WaitlistEntry(event=event, user=user)], ignore_conflicts=True
+    )
+    return None
+
+
+def confirm(hold, amount):
+    """
+    Turn a live hold into a ticket. Returns None if the hold lapsed, and the
+    ticket the user already has if a concurrent request bought one first.
+    """
+    try:
+        with transaction.atomic():
+            deleted, _ = TicketHold.objects.filter(
+                pk=hold.pk, expires__gt=timezone.now()
+            ).delete()
+            if not deleted:
+                return None
+            return EventTicket.objects.create(
+                user_id=hold.user_id, event_id=hold.event_id, amount=amount
+            )
+    except IntegrityError:
+        # one ticket per user: hand the held one on, locking the inventory
+        # first like `reserve` does
+        with transaction.atomic():
+            list(
+                EventInventory.objects.select_for_update().filter(
+                    event_id=hold.event_id
+                )
+            )
+            freed, _ = TicketHold.objects.filter(pk=hold.pk).delete()
+            if freed:
+                release(hold.event_id, freed)
+        return EventTicket.objects.get(user_id=hold.user_id, event_id=hold.event_id)
+
+
+def release(event_id, count):
+    """
+    Hold `count` freed tickets for the head of the waitlist and put the rest
+    back in the inventory. Returns how many went back to the inventory.
+    """
+    with transaction.atomic():
+        entries = WaitlistEntry.objects.select_for_update(skip_locked=True).filter(
+            event_id=event_id
+        )
+        # users who got a hold or a ticket since they joined need no other
+        entries.filter(
+            Q(user__ticket_holds__event_id=event_id)
+            | Q(user__enrolled_events__event_id=event_id)
+        ).delete()
+        waiting = list(entries.order_by("pk")[:count])
+        expires = hold_expiry()
+        TicketHold.objects.bulk_create(
+            [
+                TicketHold(event_id=event_id, user_id=entry.user_id, expires=expires)
+                for entry in waiting
+            ],
+            # a hold taken meanwhile by a concurrent reserve wins
+            ignore_conflicts=True,
+        )
+        WaitlistEntry.objects.filter(pk__in=[entry.pk for entry in waiting]).delete()
+        granted = TicketHold.objects.filter(
+            event_id=event_id,
+            user_id__in=[entry.user_id for entry in waiting],
+            expires=expires,
+        ).count()
+        rest = count - granted
+        if rest:
+            EventInventory.objects.filter(event_id=event_id).update(
+                available=F("available") + rest
+            )
+    return rest
+
+
+def release_expired(event_id=None):
+    """
+    Release lapsed holds, of one event or of all. Returns the number of
+    tickets put back in the inventory.
+    """
+    expired = TicketHold.objects.filter(expires__lte=timezone.now())
+    if event_id is not None:
+        expired = expired.filter(event_id=event_id)
+    returned = 0
+    for event_id in set(expired.values_list("event_id", flat=True)):
+        with transaction.atomic():
+            # only the rows this DELETE removed are ours to hand out, a
+            # concurrent confirm or release gets the others
+            freed, _ = expired.filter(event_id=event_id).delete()
+            if freed:
+                returned += release(event_id, freed)
+    return returned
+
+
+def count_of(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(event=OuterRef("pk"))
+            .order_by()
+            .values("event")
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def sync_inventory(event):
+    """
+    Recount the inventory of `event` after its capacity was set or changed.
+    """
+    if event.capacity is None:
+        EventInventory.objects.filter(event=event).delete()
+        return
+    with transaction.atomic():
+        inventory, _ = EventInventory.objects.select_for_update().get_or_create(
+            event=event
+        )
+        # one statement, so a hold turning into a ticket is counted once
+        sold, held = (
+            Event.objects.filter(pk=event.pk)
+            .annotate(
+                sold=count_of(EventTicket.objects), held=count_of(TicketHold.objects)
+            )
+            .values_list("sold", "held")
+            .get()
+        )
+        inventory.available = 0
+        inventory.save(update_fields=["available"])
+        release(event.pk, max(event.capacity - sold - held, 0))
+
+
+def tickets_left(event):
+    if event.capacity is None:
+        return None
+    inventory = EventInventory.objects.filter(event=event).first()
+    return inventory.available if inventory else 0
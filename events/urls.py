@@ -1,9 +1,26 @@
 from django.urls import path
 
-from .views import enrollEvent, eventDetail, eventsList
+from .views import (
+    checkInTicket,
+    enrollEvent,
+    eventDetail,
+    eventsFeed,
+    eventsList,
+    syncCheckIns,
+    ticketManifest,
+)
 
 urlpatterns = [
     path("", eventsList, name="events"),
+    path("feed.ics", eventsFeed, {"format": "ics"}, name="events_ics_feed"),
+    path("feed.json", eventsFeed, {"format": "json"}, name="events_json_feed"),
     path("<slug:event_slug>/", eventDetail, name="event_detail"),
     path("buy-event-ticket/<slug:event_slug>/", enrollEvent, name="buy_event_ticket"),
+    path("<slug:event_slug>/tickets/manifest/", ticketManifest, name="ticket_manifest"),
+    path("<slug:event_slug>/check-in/sync/", syncCheckIns, name="sync_check_ins"),
+    path(
+        "<slug:event_slug>/check-in/<uuid:ticket_id>/",
+        checkInTicket,
+        name="check_in_ticket",
+    ),
 ]
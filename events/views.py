@@ -1,24 +1,33 @@
-from datetime import datetime
+import json
+import uuid
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_POST
 
 from courses.models import Course
+from utils.pagination import paginate
 
-from .models import Event, EventTicket
+from . import checkin, feeds, tickets
+from .models import Event
 
 User = get_user_model()
-today = datetime.now()
 
 
 def eventsList(request):
     try:
-        events = (
-            Event.objects.select_related("organiser")
-            .filter(start_date__gte=today.date(), is_active=True)
-            .order_by("start_date")
+        events = paginate(
+            request,
+            Event.upcoming().select_related("organiser"),
+            10,
+            ["start_date", "pk"],
         )
         course_teachers = Course.objects.only("owner")[:4]
         return render(
@@ -36,39 +45,132 @@ def eventsList(request):
 
 
 def eventDetail(request, event_slug):
-    event = get_object_or_404(
-        Event, slug=event_slug, is_active=True, start_date__gte=today.date()
-    )
-    return render(
+    event = get_object_or_404(Event.upcoming(), slug=event_slug)
+    context = {
+        "page_title": event.title,
+        "event": event,
+        "tickets_left": tickets.tickets_left(event),
+    }
+    if request.user.is_authenticated:
+        context["ticket_hold"] = request.user.ticket_holds.filter(
+            event=event, expires__gt=timezone.now()
+        ).first()
+        context["waitlisted"] = request.user.waitlisted_events.filter(
+            event=event
+        ).exists()
+    return render(request, "event-details.html", context)
+
+
+@condition(etag_func=lambda request, format: feeds.feed_etag(request, format))
+def eventsFeed(request, format):
+    """
+    A page of upcoming events as iCalendar or JSON, streamed.
+    """
+    events = paginate(
         request,
-        "event-details.html",
-        {
-            "page_title": event.title,
-            "event": event,
-        },
+        Event.upcoming(),
+        settings.EVENT_FEED_PAGE_SIZE,
+        ["start_date", "pk"],
+    )
+    next_url = (
+        request.build_absolute_uri("?" + urlencode({"cursor": events.next_cursor}))
+        if events.has_next()
+        else None
     )
+    content_type, stream = feeds.FORMATS[format]
+    response = StreamingHttpResponse(
+        stream(events, request, next_url), content_type=content_type
+    )
+    if next_url:
+        response["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 @login_required
 def enrollEvent(request, event_slug):
     try:
-        event = get_object_or_404(
-            Event,
-            slug=event_slug,
-            start_date__gte=today.date(),
-            start_time__gte=today.time(),
-        )
+        event = get_object_or_404(Event.upcoming(), slug=event_slug)
         if request.method == "POST":
             user = request.user
             phone = request.POST.get("phone")  # Use for M-Pesa integration.
-            # if user.is_authenticated and user.enrolled_events.filter(event=event).exists():
-            #     messages.info(request, "You have already bought a ticket to this event.")
-            #     return redirect(event)
+            if user.enrolled_events.filter(event=event).exists():
+                messages.info(
+                    request, "You have already bought a ticket to this event."
+                )
+                return redirect(event)
 
-            EventTicket.objects.create(user=user, event=event, amount=event.price)
-            messages.success(request, "Ticket purchase successful, thank you.")
+            hold = tickets.reserve(event, user)
+            if hold is None:
+                messages.info(
+                    request,
+                    "This event is sold out. You are on the waitlist and a ticket "
+                    "will be held for you if one frees up.",
+                )
+                return redirect(event)
+            # With M-Pesa the hold is confirmed by the payment callback.
+            if tickets.confirm(hold, event.price):
+                messages.success(request, "Ticket purchase successful, thank you.")
+            else:
+                messages.error(request, "Your ticket hold expired, please try again.")
             return redirect(event)
         return redirect(event)
     except Exception as e:
         print(e)
         return redirect("events")
+
+
+def organisedEvent(request, event_slug):
+    """
+    The cached id of an event organised by the user, or a JSON error.
+    """
+    event = checkin.get_event(event_slug)
+    if event is None:
+        return None, JsonResponse({"error": "Event not found."}, status=404)
+    event_id, organiser_id = event
+    if organiser_id != request.user.pk and not request.user.is_staff:
+        return None, JsonResponse({"error": "Not an organiser."}, status=403)
+    return event_id, None
+
+
+@login_required
+@require_POST
+def checkInTicket(request, event_slug, ticket_id):
+    event_id, error = organisedEvent(request, event_slug)
+    if error:
+        return error
+    status, at = checkin.check_in(event_id, ticket_id)
+    return JsonResponse(
+        {"status": status, "checked_in": at},
+        status={checkin.CHECKED_IN: 200, checkin.ALREADY_CHECKED_IN: 409}.get(
+            status, 404
+        ),
+    )
+
+
+@login_required
+def ticketManifest(request, event_slug):
+    event_id, error = organisedEvent(request, event_slug)
+    if error:
+        return error
+    return JsonResponse(checkin.manifest(event_id))
+
+
+@login_required
+@require_POST
+def syncCheckIns(request, event_slug):
+    """
+    Upload offline check-ins: {"check_ins": [{"ticket_id": ..., "at": ...}]}.
+    """
+    event_id, error = organisedEvent(request, event_slug)
+    if error:
+        return error
+    try:
+        check_ins = {}
+        for item in json.loads(request.body)["check_ins"]:
+            at = parse_datetime(item.get("at") or "") or timezone.now()
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+            check_ins[uuid.UUID(item["ticket_id"])] = at
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Malformed check-ins."}, status=400)
+    return JsonResponse(checkin.sync_check_ins(event_id, check_ins))
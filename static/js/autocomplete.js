@@ -0,0 +1,26 @@
+$(function() {
+
+	// Search box suggestions from the autocomplete endpoint.
+	var input = $('input[data-autocomplete-url]');
+	var list = $('#' + input.attr('list'));
+	var timer = null;
+
+	input.on('input', function() {
+		clearTimeout(timer);
+		var prefix = $.trim(input.val());
+		if (prefix.length < 2) {
+			list.empty();
+			return;
+		}
+		timer = setTimeout(function() {
+			$.getJSON(input.data('autocomplete-url'), { q: prefix })
+			.done(function(response) {
+				list.empty();
+				$.each(response.suggestions, function(i, suggestion) {
+					$('<option>').val(suggestion.text).text(suggestion.kind).appendTo(list);
+				});
+			});
+		}, 150);
+	});
+
+});
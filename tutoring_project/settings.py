@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 import os
 from pathlib import Path
 
-from decouple import config
+from celery.schedules import crontab
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'accounts',
     'courses',
     'enroll',
@@ -49,7 +51,6 @@ INSTALLED_APPS = [
 
     'tinymce',
     'crispy_forms',
-    'django_user_agents'
 ]
 
 MIDDLEWARE = [
@@ -60,7 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django_user_agents.middleware.UserAgentMiddleware',
+    'utils.user_agents.UserAgentMiddleware',
 ]
 
 ROOT_URLCONF = 'tutoring_project.urls'
@@ -77,6 +78,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'courses.context_processor.global_context_renderer',
+                'enroll.context_processor.cart_renderer',
             ],
         },
     },
@@ -104,6 +106,24 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/ref/settings/#caches
+# Set CACHE_URL (e.g. redis://localhost:6379/1) in production so that every
+# process sees the same cache. Without it each process has its own memory
+# cache, and state that must agree across processes (carts, coupon codes,
+# check-in sets, curricula, counters) is read from the database instead
+# (see utils.cache.is_shared).
+
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -154,6 +174,11 @@ PAGE_TITLE = 'Online Course & Education'
 META_DESCRIPTION = 'Africode is an online education platform that offers a range of educational services'
 META_KEYWORDS = 'Computer programming, online courses, online tutoring, online engineering, programming tutorials'
 
+# Course ratings are shrunk towards COURSE_RATING_PRIOR_MEAN as if every
+# course had COURSE_RATING_PRIOR_WEIGHT extra reviews of that value.
+COURSE_RATING_PRIOR_MEAN = 3.0
+COURSE_RATING_PRIOR_WEIGHT = 5
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_USE_TLS = True
 EMAIL_HOST = config('EMAIL_HOST', default='localhost')
@@ -175,4 +200,124 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TIMEZONE = 'Africa/Nairobi'
 CELERY_ENABLE_UTC = False
+CELERY_BEAT_SCHEDULE = {
+    'drain-hit-buffer': {
+        'task': 'courses.tasks.drain_hit_buffer',
+        'schedule': 10.0,
+    },
+    'rollup-and-purge-hits': {
+        'task': 'courses.tasks.rollup_and_purge_hits',
+        'schedule': crontab(minute=10),
+    },
+    'rebuild-related-courses': {
+        'task': 'courses.tasks.rebuild_related_courses',
+        'schedule': crontab(minute=30, hour='*/6'),
+    },
+    'rebuild-recommendations': {
+        'task': 'courses.tasks.rebuild_recommendations',
+        'schedule': crontab(minute=0, hour=3),
+    },
+    'rebuild-teacher-stats': {
+        'task': 'courses.tasks.rebuild_teacher_stats',
+        'schedule': crontab(minute=15),
+    },
+    'purge-stale-carts': {
+        'task': 'enroll.tasks.purge_stale_carts',
+        'schedule': crontab(minute=45, hour=4),
+    },
+    'release-expired-ticket-holds': {
+        'task': 'events.tasks.release_expired_ticket_holds',
+        'schedule': 60.0,
+    },
+}
 
+# Course/article hits are buffered and written in batches (see courses.hits).
+# 'memory' buffers per process and queues a batch once it holds
+# HIT_BUFFER_MAX_SIZE hits or is HIT_BUFFER_MAX_AGE seconds old; 'redis'
+# shares one buffer across processes, drained by courses.tasks.drain_hit_buffer.
+# Crawler hits are counted per day on the HIT_BUFFER_REDIS_URL server.
+HIT_BUFFER_BACKEND = config('HIT_BUFFER_BACKEND', default='memory')
+HIT_BUFFER_REDIS_URL = config('HIT_BUFFER_REDIS_URL', default=CELERY_BROKER_URL)
+HIT_BUFFER_MAX_SIZE = 100
+HIT_BUFFER_MAX_AGE = 30
+HIT_FLUSH_BATCH_SIZE = 1000
+
+# A view is counted once per visitor and course/article per
+# HIT_UNIQUE_VIEW_WINDOW seconds (None: once ever, 0: every view). Repeat
+# views are recognised by a rotating Bloom filter (see utils.bloom) of
+# HIT_VIEW_FILTER_GENERATIONS slices, sized for HIT_VIEW_FILTER_CAPACITY views
+# per window. 'memory' keeps it per worker process, 'redis' shares it.
+HIT_UNIQUE_VIEW_WINDOW = 60 * 60 * 24
+HIT_VIEW_FILTER_BACKEND = config('HIT_VIEW_FILTER_BACKEND', default='memory')
+HIT_VIEW_FILTER_REDIS_URL = config('HIT_VIEW_FILTER_REDIS_URL', default=CELERY_BROKER_URL)
+HIT_VIEW_FILTER_GENERATIONS = 8
+HIT_VIEW_FILTER_CAPACITY = 1_000_000
+HIT_VIEW_FILTER_ERROR_RATE = 0.001
+
+# Crawlers are not recorded as hits (see courses.hits.is_bot): requests
+# without a user agent, with one matching these patterns or parsed as a bot,
+# or from these networks.
+HIT_BOT_USER_AGENTS = [
+    r'bot\b', 'crawl', 'spider', 'slurp', 'archiver', 'facebookexternalhit',
+    'headless', 'lighthouse', 'curl/', 'wget/', 'python-requests', 'httpx',
+    'go-http-client', 'okhttp', 'java/', 'libwww-perl', 'scrapy',
+]
+HIT_BOT_IP_RANGES = config('HIT_BOT_IP_RANGES', default='', cast=Csv())
+
+# Hits are rolled up hourly and daily (see courses.rollups) once an hour is
+# HIT_ROLLUP_LAG_MINUTES old; raw rows are kept HIT_RETENTION_DAYS, and always
+# until their whole day is rolled up (daily rollups are recomputed from them).
+HIT_ROLLUP_LAG_MINUTES = 5
+HIT_RETENTION_DAYS = config('HIT_RETENTION_DAYS', default=30, cast=int)
+HIT_PURGE_CHUNK_SIZE = 5000
+# When set, raw hits are archived to compressed files here before being
+# purged (see courses.archive).
+HIT_ARCHIVE_DIR = config('HIT_ARCHIVE_DIR', default='')
+
+# Parsed user agents are memoized per process (see utils.user_agents),
+# optionally backed by a shared cache alias from CACHES.
+USER_AGENT_CACHE_SIZE = 1000
+USER_AGENT_SHARED_CACHE = None
+USER_AGENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Search box suggestions, cached per normalized prefix.
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_MAX_LENGTH = 50
+AUTOCOMPLETE_LIMIT = 5
+AUTOCOMPLETE_CACHE_TIMEOUT = 60 * 5
+
+# Compiled course curricula (see courses.curriculum), cached per version of
+# the course.
+CURRICULUM_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Related courses (see courses.similarity): tag/category Jaccard blended with
+# co-enrollment cosine similarity, top RELATED_COURSES_LIMIT per course.
+RELATED_COURSES_LIMIT = 8
+RELATED_COURSES_TAG_WEIGHT = 0.6
+RELATED_COURSES_ENROLLMENT_WEIGHT = 0.4
+
+# Co-enrollment recommendations (see courses.recommendations): courses and
+# students are shown RECOMMENDATIONS_LIMIT recommendations; each course keeps
+# RECOMMENDATIONS_NEIGHBOURS neighbours, by rebuilds and refreshes alike, to
+# score students from.
+RECOMMENDATIONS_LIMIT = 6
+RECOMMENDATIONS_NEIGHBOURS = 20
+
+# Carts (see enroll.cart): course id sets and totals are cached per cart when
+# the cache is shared. Checkout always reads the cart from the database.
+CART_CACHE_TIMEOUT = 60 * 60
+
+# With a shared cache, live coupon codes are cached so invalid codes are
+# rejected without a query (see enroll.coupons).
+COUPON_CACHE_TIMEOUT = 5 * 60
+
+# Event tickets are held this long for payment before going back on sale.
+EVENT_TICKET_HOLD_MINUTES = 10
+
+# Ticket ids and organisers checked at the door are cached per event when
+# the cache is shared (see events.checkin).
+CHECK_IN_CACHE_TIMEOUT = 60 * 60 * 12
+
+# Calendar feeds of upcoming events (see events.feeds).
+EVENT_FEED_PAGE_SIZE = 200
+EVENT_FEED_ETAG_TIMEOUT = 60
@@ -0,0 +1,159 @@
+"""
+Bloom filters, and rotating Bloom filters remembering keys over a sliding
+window of time.
+
+A Bloom filter of m bits and k hash functions answers "possibly seen" or
+"definitely not seen" in constant memory. For n keys at a false-positive
+rate p, m = -n ln p / (ln 2)^2 and k = m / n ln 2. The k bit positions of a
+key are derived from a single blake2b digest by double hashing.
+
+A rotating filter splits its window into `generations` filters of
+window / generations seconds. Keys are added to the current generation and
+looked up in all of them, and whole generations expire, so a key is
+remembered for between (generations - 1) / generations of the window and the
+whole window. Each generation is sized for capacity / generations keys at
+error_rate / generations, which keeps the overall rate around error_rate.
+"""
+import hashlib
+import math
+import threading
+import time
+
+import redis
+
+
+def optimal_size(capacity, error_rate):
+    """
+    Bits and hash functions of a filter for `capacity` keys at `error_rate`.
+    """
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def bit_positions(key, bits, hashes):
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.bits, self.hashes = optimal_size(capacity, error_rate)
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def add(self, key):
+        """
+        Add `key`. Returns whether it was (possibly) there already.
+        """
+        present = True
+        for position in bit_positions(key, self.bits, self.hashes):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.array[byte] & mask:
+                present = False
+                self.array[byte] |= mask
+        return present
+
+    def __contains__(self, key):
+        return all(
+            self.array[position >> 3] & 1 << (position & 7)
+            for position in bit_positions(key, self.bits, self.hashes)
+        )
+
+
+class RotatingBloomFilter:
+    """
+    Rotating filter held in process memory.
+    """
+
+    def __init__(self, window, generations, capacity, error_rate):
+        self.window = window
+        self.generations = generations
+        self.span = window / generations
+        self.capacity = math.ceil(capacity / generations)
+        self.error_rate = error_rate / generations
+        self.filters = {}
+        self.lock = threading.Lock()
+
+    def generation(self, now):
+        return int((time.time() if now is None else now) // self.span)
+
+    def seen(self, keys, now=None):
+        """
+        Whether each of `keys` was seen within the window. Unseen keys are
+        added, so the window starts at a key's first sighting.
+        """
+        current = self.generation(now)
+        with self.lock:
+            for number in [n for n in self.filters if n <= current - self.generations]:
+                del self.filters[number]
+            if current not in self.filters:
+                self.filters[current] = BloomFilter(self.capacity, self.error_rate)
+            older = [f for n, f in self.filters.items() if n != current]
+            return [
+                any(key in f for f in older) or self.filters[current].add(key)
+                for key in keys
+            ]
+
+    def __contains__(self, key):
+        """
+        Look `key` up without adding it, e.g. to measure false positives.
+        """
+        with self.lock:
+            return any(key in f for f in self.filters.values())
+
+    @property
+    def size(self):
+        """
+        Bytes used by the bit arrays.
+        """
+        return sum(len(f.array) for f in self.filters.values())
+
+
+class RedisRotatingBloomFilter(RotatingBloomFilter):
+    """
+    Rotating filter shared by all processes: one Redis bitmap per generation,
+    expiring with it. A batch of keys is checked in two round trips.
+    """
+
+    def __init__(self, url, window, generations, capacity, error_rate, prefix):
+        super().__init__(window, generations, capacity, error_rate)
+        self.bits, self.hashes = optimal_size(self.capacity, self.error_rate)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def seen(self, keys, now=None):
+        current = self.generation(now)
+        older = range(current - self.generations + 1, current)
+        positions = [bit_positions(key, self.bits, self.hashes) for key in keys]
+        with self.client.pipeline(transaction=False) as pipe:
+            for key_positions in positions:
+                get_bits = [arg for p in key_positions for arg in ("GET", "u1", p)]
+                for number in older:
+                    pipe.execute_command(
+                        "BITFIELD", f"{self.prefix}:{number}", *get_bits
+                    )
+            replies = pipe.execute()
+        seen = [
+            any(all(bits) for bits in replies[i * len(older) : (i + 1) * len(older)])
+            for i in range(len(keys))
+        ]
+
+        new = [i for i, repeat in enumerate(seen) if not repeat]
+        if new:
+            key = f"{self.prefix}:{current}"
+            with self.client.pipeline(transaction=False) as pipe:
+                for i in new:
+                    # SET returns the previous bits, catching keys added since
+                    set_bits = [
+                        arg for p in positions[i] for arg in ("SET", "u1", p, 1)
+                    ]
+                    pipe.execute_command("BITFIELD", key, *set_bits)
+                pipe.expire(key, math.ceil(self.window + self.span))
+                for i, bits in zip(new, pipe.execute()):
+                    seen[i] = all(bits)
+        return seen
+
+    @property
+    def size(self):
+        return math.ceil(self.bits / 8) * self.generations
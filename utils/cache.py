@@ -0,0 +1,15 @@
+"""
+Whether the cache is shared by every process.
+
+Deleting a key only invalidates it everywhere when all web and worker
+processes use the same cache server. The per-process memory cache Django
+falls back to without CACHES (see CACHE_URL in settings) is not, so state
+that must agree across processes is only cached when `is_shared()`.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias="default"):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,157 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with `WHERE (ordering keys) > (last row's keys) LIMIT n + 1`
+instead of `OFFSET`, so deep pages cost the same as the first one. The next
+and previous cursors are signed tokens holding the boundary row's keys.
+"""
+import datetime
+import decimal
+from functools import reduce
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+SALT = "utils.pagination"
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+class CursorPaginator:
+    """
+    Paginate `queryset` by `ordering`, a list of field names with an optional
+    "-" prefix that ends with a unique key such as "pk".
+    `count` runs only when read, and is free for single-page results.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.per_page = per_page
+        self.ordering = [
+            (field.lstrip("-"), field.startswith("-")) for field in ordering
+        ]
+        self.queryset = queryset.order_by(*ordering)
+
+    @cached_property
+    def count(self):
+        return self.queryset.count()
+
+    def encode_cursor(self, obj, direction):
+        values = [encode_value(getattr(obj, field)) for field, _ in self.ordering]
+        return signing.dumps({"d": direction, "v": values}, salt=SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        """
+        (direction, values) of a cursor, or None for a missing or invalid one.
+        """
+        try:
+            data = signing.loads(cursor, salt=SALT)
+            direction, values = data["d"], data["v"]
+        except (signing.BadSignature, KeyError, TypeError):
+            return None
+        if direction not in ("next", "prev") or len(values) != len(self.ordering):
+            return None
+        return direction, values
+
+    def keyset_filter(self, values, forward):
+        """
+        Rows strictly after (or before) `values` in the listing's ordering.
+        """
+        conditions = []
+        for i, (field, descending) in enumerate(self.ordering):
+            lookup = "lt" if descending == forward else "gt"
+            equal = {f: v for (f, _), v in zip(self.ordering[:i], values[:i])}
+            conditions.append(Q(**equal, **{f"{field}__{lookup}": values[i]}))
+        return reduce(lambda a, b: a | b, conditions)
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            objects = list(self.queryset[: self.per_page + 1])
+            has_more = len(objects) > self.per_page
+            objects = objects[: self.per_page]
+            if not has_more:
+                self.count = len(objects)
+            return CursorPage(objects, self, has_next=has_more, has_previous=False)
+
+        direction, values = decoded
+        forward = direction == "next"
+        queryset = self.queryset.filter(self.keyset_filter(values, forward))
+        if not forward:
+            queryset = queryset.reverse()
+        objects = list(queryset[: self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[: self.per_page]
+        if forward:
+            return CursorPage(objects, self, has_next=has_more, has_previous=True)
+        return CursorPage(objects[::-1], self, has_next=True, has_previous=has_more)
+
+    def page_number(self, number):
+        """
+        Serve an old `?page=N` link with one OFFSET query; its next and previous
+        links are cursors again.
+        """
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        objects = list(self.queryset[offset : offset + self.per_page + 1])
+        if not objects and number > 1:
+            return self.page()
+        has_more = len(objects) > self.per_page
+        return CursorPage(
+            objects[: self.per_page], self, has_next=has_more, has_previous=number > 1
+        )
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.encode_cursor(self.object_list[-1], "next")
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.encode_cursor(self.object_list[0], "prev")
+
+
+def paginate(request, queryset, per_page, ordering):
+    """
+    The page of `queryset` asked for by the `cursor` (or legacy `page`) parameter.
+    """
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    if "page" in request.GET and "cursor" not in request.GET:
+        return paginator.page_number(request.GET["page"])
+    return paginator.page(request.GET.get("cursor"))
@@ -0,0 +1,45 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SEARCH_CONFIG = "english"
+
+# ts_headline does not escape the document, so matches are wrapped in
+# control characters and turned into <mark> after escaping.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+
+def search_query(query):
+    return SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def search_rank(query):
+    # ts_rank returns a real; as a double it survives the round trip through
+    # a pagination cursor and compares equal to itself.
+    return Cast(SearchRank(F("search_vector"), query), FloatField())
+
+
+def search_headline(expression, query, max_words=30, min_words=15):
+    return SearchHeadline(
+        expression,
+        query,
+        config=SEARCH_CONFIG,
+        start_sel=HIGHLIGHT_START,
+        stop_sel=HIGHLIGHT_STOP,
+        max_words=max_words,
+        min_words=min_words,
+    )
+
+
+def highlight(headline):
+    """
+    HTML-escape a headline and mark the matched words.
+    """
+    return mark_safe(
+        escape(headline or "")
+        .replace(HIGHLIGHT_START, "<mark>")
+        .replace(HIGHLIGHT_STOP, "</mark>")
+    )
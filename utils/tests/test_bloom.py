@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+
+from utils.bloom import BloomFilter, RotatingBloomFilter, optimal_size
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_optimal_size(self):
+        bits, hashes = optimal_size(1000, 0.01)
+        self.assertEqual((bits, hashes), (9586, 7))
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(5000, 0.01)
+        keys = [f"key-{i}" for i in range(5000)]
+        self.assertLess(sum(bloom.add(key) for key in keys), 50)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f"other-{i}" in bloom for i in range(20_000))
+        self.assertLess(false_positives / 20_000, 0.02)
+
+
+class RotatingBloomFilterTests(SimpleTestCase):
+    def test_keys_are_remembered_for_the_window(self):
+        views = RotatingBloomFilter(
+            window=100, generations=4, capacity=100, error_rate=0.01
+        )
+        self.assertEqual(views.seen(["a", "b", "a"], now=1000), [False, False, True])
+        self.assertEqual(views.seen(["a", "c"], now=1070), [True, False])
+        # the generation holding "a" and "b" (1000-1024) has expired
+        self.assertEqual(views.seen(["a", "b", "c"], now=1100), [False, False, True])
+        self.assertEqual(len(views.filters), 2)
+
+    def test_false_positive_rate_across_generations(self):
+        views = RotatingBloomFilter(
+            window=80, generations=8, capacity=8000, error_rate=0.01
+        )
+        for now in range(0, 80, 10):
+            views.seen([f"{now}-{i}" for i in range(1000)], now=now)
+        false_positives = sum(f"fresh-{i}" in views for i in range(20_000))
+        self.assertLess(false_positives / 20_000, 0.02)
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase, override_settings
+
+from utils.cache import is_shared
+
+
+class IsSharedTests(SimpleTestCase):
+    def test_per_process_caches_are_not_shared(self):
+        self.assertFalse(is_shared())
+        with override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            }
+        ):
+            self.assertFalse(is_shared())
+
+    def test_cache_servers_are_shared(self):
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://localhost:6379/1",
+                }
+            }
+        ):
+            self.assertTrue(is_shared())
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from blog.models import Article
+from utils.pagination import CursorPaginator, paginate
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.articles = []
+        for i in range(10):
+            article = Article.objects.create(
+                title=f"Article {i}", content=f"The content of article {i}."
+            )
+            # pairs of articles share a timestamp to exercise the pk tie-break
+            Article.objects.filter(pk=article.pk).update(
+                created=now - timedelta(hours=i // 2)
+            )
+            self.articles.append(article)
+        self.queryset = Article.objects.all()
+        self.ordering = ["-created", "-pk"]
+        self.expected = list(Article.objects.order_by(*self.ordering))
+
+    def test_walks_forward_and_back(self):
+        paginator = CursorPaginator(self.queryset, 4, self.ordering)
+        first = paginator.page()
+        self.assertEqual(list(first), self.expected[:4])
+        self.assertFalse(first.has_previous())
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(second), self.expected[4:8])
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(list(third), self.expected[8:])
+        self.assertFalse(third.has_next())
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(list(back), self.expected[4:8])
+        self.assertTrue(back.has_previous())
+        self.assertEqual(list(paginator.page(back.previous_cursor)), self.expected[:4])
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+    def test_deep_page_does_not_count_or_offset(self):
+        paginator = CursorPaginator(self.queryset, 4, self.ordering)
+        cursor = paginator.page(paginator.page().next_cursor).next_cursor
+        with self.assertNumQueries(1) as queries:
+            list(paginator.page(cursor))
+        self.assertNotIn("OFFSET", queries.captured_queries[0]["sql"])
+        self.assertNotIn("COUNT", queries.captured_queries[0]["sql"])
+
+    def test_single_page_count_is_free(self):
+        paginator = CursorPaginator(self.queryset, 20, self.ordering)
+        paginator.page()
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 10)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        paginator = CursorPaginator(self.queryset, 4, self.ordering)
+        cursor = paginator.page().next_cursor
+        page = paginator.page(cursor[:-2] + "xx")
+        self.assertEqual(list(page), self.expected[:4])
+
+    def test_legacy_page_number(self):
+        request = RequestFactory().get("/", {"page": 2})
+        page = paginate(request, self.queryset, 4, self.ordering)
+        self.assertEqual(list(page), self.expected[4:8])
+        self.assertTrue(page.has_previous())
+        paginator = page.paginator
+        self.assertEqual(list(paginator.page(page.next_cursor)), self.expected[8:])
+        request = RequestFactory().get("/", {"page": 50})
+        self.assertEqual(
+            list(paginate(request, self.queryset, 4, self.ordering)), self.expected[:4]
+        )
+
+    def test_listing_links_keep_query_string(self):
+        for i in range(10):
+            Article.objects.create(
+                title=f"Python tips {i}", content="Python everywhere."
+            )
+        response = self.client.get(reverse("article_search"), {"search": "python"})
+        cursor = response.context["articles"].next_cursor
+        query = urlencode({"search": "python", "cursor": cursor})
+        self.assertContains(response, f'href="?{escape(query)}"')
+        response = self.client.get(
+            reverse("article_search"), {"search": "python", "cursor": cursor}
+        )
+        self.assertEqual(len(response.context["articles"]), 4)
+        self.assertFalse(response.context["articles"].has_next())
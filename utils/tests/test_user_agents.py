@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from utils.user_agents import (
+    UserAgentCache,
+    UserAgentDetails,
+    UserAgentMiddleware,
+    get_user_agent_cache,
+)
+
+User = get_user_model()
+
+CHROME = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
+)
+FIREFOX = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/110.0"
+)
+GOOGLEBOT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+
+class UserAgentCacheTests(SimpleTestCase):
+    def test_parses_user_agent_details(self):
+        details = UserAgentCache(maxsize=10).get(CHROME)
+        self.assertIsInstance(details, UserAgentDetails)
+        self.assertEqual(details.browser_type, "Chrome")
+        self.assertEqual(details.os_type, "Linux")
+        self.assertIs(details.is_bot, False)
+        self.assertIs(UserAgentCache(maxsize=10).get(GOOGLEBOT).is_bot, True)
+
+    def test_repeated_user_agents_are_served_from_memory(self):
+        cache = UserAgentCache(maxsize=10)
+        first = cache.get(CHROME)
+        self.assertIs(cache.get(CHROME), first)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UserAgentCache(maxsize=2)
+        cache.get(CHROME)
+        cache.get(FIREFOX)
+        cache.get(CHROME)
+        cache.get(GOOGLEBOT)
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIn(cache.key(CHROME), cache.entries)
+        self.assertNotIn(cache.key(FIREFOX), cache.entries)
+
+    def test_shared_cache_is_used_on_local_miss(self):
+        shared = caches["default"]
+        shared.clear()
+        UserAgentCache(maxsize=10, shared_cache=shared).get(CHROME)
+        cache = UserAgentCache(maxsize=10, shared_cache=shared)
+        self.assertEqual(cache.get(CHROME).browser_type, "Chrome")
+        self.assertEqual(cache.stats()["shared_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 0)
+
+    def test_middleware_parses_lazily(self):
+        request = RequestFactory().get("/", HTTP_USER_AGENT=FIREFOX)
+        UserAgentMiddleware(lambda request: None)(request)
+        cache = get_user_agent_cache()
+        cache.clear()
+        self.assertEqual(cache.stats()["misses"], 0)
+        self.assertEqual(request.user_agent.browser_type, "Firefox")
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class UserAgentCacheStatsViewTests(TestCase):
+    def test_stats_are_staff_only(self):
+        url = reverse("user_agent_cache_stats")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        staff = User.objects.create_user(
+            name="staff",
+            username="staff",
+            email="staff@mail.com",
+            password="secret",
+            is_staff=True,
+        )
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hit_ratio", response.json())
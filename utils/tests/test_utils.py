@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from courses.models import Category, Tag
+from utils.utils import (
+    CROCKFORD_ALPHABET,
+    TimeOrderedIdGenerator,
+    crockford_base32,
+    slug_generator,
+)
+
+
+class CrockfordBase32Tests(SimpleTestCase):
+    def test_encodes_fixed_width(self):
+        self.assertEqual(crockford_base32(0, 4), "0000")
+        self.assertEqual(crockford_base32(31, 2), "0Z")
+        self.assertEqual(crockford_base32(32, 2), "10")
+
+    def test_alphabet_skips_ambiguous_letters(self):
+        self.assertEqual(len(CROCKFORD_ALPHABET), 32)
+        for letter in "ILOU":
+            self.assertNotIn(letter, CROCKFORD_ALPHABET)
+
+
+class TimeOrderedIdGeneratorTests(SimpleTestCase):
+    def setUp(self):
+        self.generate = TimeOrderedIdGenerator()
+
+    def test_ids_are_unique_and_ordered(self):
+        ids = [self.generate() for _ in range(10_000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(len(i) == 16 for i in ids))
+        self.assertTrue(set("".join(ids)) <= set(CROCKFORD_ALPHABET))
+
+    def test_stays_ordered_when_clock_goes_back(self):
+        with mock.patch("utils.utils.time.time_ns", return_value=2_000_000_000):
+            first = self.generate()
+        with mock.patch("utils.utils.time.time_ns", return_value=1_000_000_000):
+            second = self.generate()
+        self.assertLess(first, second)
+
+    def test_counter_overflow_moves_to_next_millisecond(self):
+        with mock.patch("utils.utils.time.time_ns", return_value=5_000_000):
+            self.generate()
+            self.generate.counter = 2**32 - 1
+            last = crockford_base32(5 << 32 | self.generate.counter, 16)
+            following = self.generate()
+        self.assertEqual(self.generate.last_ms, 6)
+        self.assertLess(self.generate.counter, 2**31)
+        self.assertLess(last, following)
+
+
+class SlugGeneratorTests(TestCase):
+    def test_next_free_suffix_in_one_query(self):
+        Tag.objects.create(title="Python")
+        Tag.objects.create(title="Python 10", slug="python-10")
+        Tag.objects.create(title="Python tips")
+        with self.assertNumQueries(1):
+            self.assertEqual(slug_generator(Tag(title="python!")), "python-11")
+
+    def test_similar_titles_get_sequential_slugs(self):
+        Tag.objects.create(title="Django")
+        tags = [Tag.objects.create(title=f"Django{'!' * i}") for i in range(1, 4)]
+        self.assertEqual(
+            [tag.slug for tag in tags], ["django-2", "django-3", "django-4"]
+        )
+
+    def test_slug_is_kept_unique_when_changed(self):
+        Tag.objects.create(title="Flask")
+        tag = Tag.objects.create(title="Web")
+        tag.slug = "flask"
+        tag.save()
+        self.assertEqual(tag.slug, "flask-2")
+
+    def test_unchanged_slug_is_not_checked_again(self):
+        tag = Tag.objects.get(pk=Tag.objects.create(title="Celery").pk)
+        tag.title = "Celery tasks"
+        with mock.patch("utils.utils.slug_generator") as generator:
+            tag.save()
+            Tag.objects.get(pk=tag.pk).save()
+        generator.assert_not_called()
+        self.assertEqual(tag.slug, "celery")
+
+    def test_suffix_fits_max_length(self):
+        title = "x" * 50
+        Category.objects.create(title=title)
+        category = Category.objects.create(title=title.upper())
+        self.assertEqual(category.slug, "x" * 48)
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from user_agents import parse
+
+UserAgentDetails = namedtuple(
+    "UserAgentDetails",
+    [
+        "device_type",
+        "browser_type",
+        "browser_version",
+        "os_type",
+        "os_version",
+        "is_bot",
+    ],
+)
+
+
+def parse_user_agent_string(ua_string):
+    user_agent = parse(ua_string)
+    return UserAgentDetails(
+        device_type=str(user_agent),
+        browser_type=user_agent.browser.family,
+        browser_version=user_agent.browser.version_string,
+        os_type=user_agent.os.family,
+        os_version=user_agent.os.version_string,
+        is_bot=user_agent.is_bot,
+    )
+
+
+class UserAgentCache:
+    """
+    Bounded LRU of parsed user agents keyed by a hash of the UA string.
+    Misses fall through to an optional shared Django cache before running
+    the ua-parser regexes. Counters are per process.
+    """
+
+    def __init__(self, maxsize, shared_cache=None, timeout=None):
+        self.maxsize = maxsize
+        self.shared_cache = shared_cache
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.shared_hits = self.misses = 0
+
+    @staticmethod
+    def key(ua_string):
+        return hashlib.md5(ua_string.encode("utf-8", "ignore")).hexdigest()
+
+    def get(self, ua_string):
+        key = self.key(ua_string)
+        with self.lock:
+            details = self.entries.get(key)
+            if details is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return details
+
+        shared_key = f"ua:{key}"
+        cached = self.shared_cache.get(shared_key) if self.shared_cache else None
+        if cached is not None:
+            details = UserAgentDetails(*cached)
+        else:
+            details = parse_user_agent_string(ua_string)
+            if self.shared_cache:
+                self.shared_cache.set(shared_key, tuple(details), self.timeout)
+
+        with self.lock:
+            if cached is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            self.entries[key] = details
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return details
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+
+_cache = None
+
+
+def get_user_agent_cache():
+    global _cache
+    if _cache is None:
+        alias = settings.USER_AGENT_SHARED_CACHE
+        _cache = UserAgentCache(
+            settings.USER_AGENT_CACHE_SIZE,
+            shared_cache=caches[alias] if alias else None,
+            timeout=settings.USER_AGENT_CACHE_TIMEOUT,
+        )
+    return _cache
+
+
+def parse_user_agent(ua_string):
+    return get_user_agent_cache().get(ua_string or "")
+
+
+class UserAgentMiddleware:
+    """
+    Attach `request.user_agent`, parsed only when a view first reads it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_agent = SimpleLazyObject(
+            lambda: parse_user_agent(request.META.get("HTTP_USER_AGENT", ""))
+        )
+        return self.get_response(request)
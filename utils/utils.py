@@ -1,30 +1,105 @@
-import random
-import string
+import os
+import re
+import secrets
+import threading
+import time
 
 from django.utils.text import slugify
 
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
 
-def random_string_generator(size=5, chars=string.ascii_uppercase + string.digits):
-    return "".join(random.choice(chars) for _ in range(size))
 
-def unique_enroll_id_generator(instance, new_enroll_id=None):
+def crockford_base32(number, length):
     """
-    Generates a unique enrollment ID for every enrollment.
+    Encode a non-negative integer as `length` Crockford base32 characters.
     """
-    enroll_id = new_enroll_id if new_enroll_id is not None else random_string_generator()
-    Klass = instance.__class__
-    if Klass.objects.filter(enrollment_id=enroll_id).exclude(id=instance.id).exists():
-        return unique_enroll_id_generator(instance, new_enroll_id=None)
-    return enroll_id
+    chars = []
+    for _ in range(length):
+        number, index = divmod(number, 32)
+        chars.append(CROCKFORD_ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+class TimeOrderedIdGenerator:
+    """
+    80-bit IDs made of a 48-bit millisecond timestamp and a 32-bit counter,
+    encoded as 16 Crockford base32 characters, so they sort by creation time.
+
+    The counter starts at a random value every millisecond and counts up for
+    IDs issued within that millisecond, so a process never repeats itself and
+    two processes only collide if they draw the same start in the same
+    millisecond. Nothing is read from the database; the unique index on the
+    column is the backstop.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.last_ms = 0
+        self.counter = 0
+
+    def __call__(self):
+        with self.lock:
+            now = time.time_ns() // 1_000_000
+            if now > self.last_ms:
+                self.last_ms = now
+                self.counter = secrets.randbits(31)
+            else:
+                # same millisecond, or the clock went back: stay monotonic
+                self.counter += 1
+                if self.counter >> 32:
+                    self.last_ms += 1
+                    self.counter = secrets.randbits(31)
+            return crockford_base32(self.last_ms << 32 | self.counter, 16)
+
+
+enrollment_id_generator = TimeOrderedIdGenerator()
+if hasattr(os, "register_at_fork"):
+    # forked workers must not continue the parent's sequence
+    os.register_at_fork(after_in_child=enrollment_id_generator.reset)
+
 
 def slug_generator(instance, new_slug=None):
     """
     Generate a unique slug for Course/Article/Category/Tag from their titles.
+    `new_slug` (or the slugified title) is returned as is when it is free,
+    otherwise the next `slug-N` after the highest one in use. Every taken
+    `slug`/`slug-N` is read in one query on the slug index.
     """
-    slug = new_slug if new_slug is not None else slugify(instance.title)
     Klass = instance.__class__
-    if Klass.objects.filter(slug=slug).exclude(id=instance.id).exists():
-        rand_int = random.randint(300_000, 500_000)
-        slug = f"{slug}-{rand_int}"
-        return slug_generator(instance, new_slug=slug)
-    return slug
\ No newline at end of file
+    max_length = Klass._meta.get_field("slug").max_length
+    slug = (new_slug or slugify(instance.title) or Klass._meta.model_name)[:max_length]
+    taken = set(
+        Klass.objects.filter(
+            slug__startswith=slug, slug__regex=rf"^{re.escape(slug)}(-[0-9]+)?$"
+        )
+        .exclude(pk=instance.pk)
+        .values_list("slug", flat=True)
+    )
+    if slug not in taken:
+        return slug
+    suffix = max((int(s[len(slug) + 1 :]) for s in taken if s != slug), default=1)
+    suffix = f"-{suffix + 1}"
+    if len(slug) + len(suffix) > max_length:
+        return slug_generator(instance, new_slug=slug[: max_length - len(suffix)])
+    return slug + suffix
+
+
+class SlugMixin:
+    """
+    Model mixin allocating `slug` from `title` on save. An existing slug is
+    only checked again when it was changed since the row was loaded.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_slug = instance.__dict__.get("slug")
+        return instance
+
+    def allocate_slug(self):
+        if not self.slug or self.slug != getattr(self, "_loaded_slug", None):
+            self.slug = slug_generator(self, new_slug=self.slug)
+            self._loaded_slug = self.slug